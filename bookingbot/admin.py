@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Resource, Booking
+from .models import Customer, Resource, Booking, OutboundMessage
 from django.utils.text import slugify
 
 # =======================================================
@@ -13,12 +13,12 @@ class ResourceAdmin(admin.ModelAdmin):
     Permite a administração dos Recursos (Salas/Estúdios)
     e garante que o slug seja preenchido automaticamente.
     """
-    list_display = ('name', 'price_per_hour', 'slug')
+    list_display = ('name', 'price_per_hour', 'opens_at', 'closes_at', 'slug')
     search_fields = ('name',)
 
     prepopulated_fields = {'slug': ('name',)}
 
-    fields = ('name', 'slug', 'price_per_hour', 'description')
+    fields = ('name', 'slug', 'price_per_hour', 'opens_at', 'closes_at', 'calendar_id', 'description')
 
     def save_model(self, request, obj, form, change):
         if not obj.slug:
@@ -43,9 +43,10 @@ class BookingAdmin(admin.ModelAdmin):
         'status'
     )
     list_filter = ('status', 'resource', 'date')
+    list_select_related = ('customer', 'resource')
     search_fields = ('customer__phone', 'customer__name', 'resource__name')
     date_hierarchy = 'date'
-    readonly_fields = ('google_event_id', 'created_at')
+    readonly_fields = ('google_event_id', 'google_sync_attempts', 'google_sync_retry_at', 'google_sync_error', 'created_at')
 
     def customer_phone(self, obj):
         return obj.customer.phone
@@ -64,6 +65,9 @@ class BookingInline(admin.TabularInline):
     readonly_fields = ('date', 'start_time', 'end_time', 'resource')
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('resource')
+
 
 # =======================================================
 #  Configuração do Cliente
@@ -79,3 +83,18 @@ class CustomerAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
     inlines = [BookingInline]
+
+
+# =======================================================
+#  Outbox de mensagens do WhatsApp
+# =======================================================
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    """
+    Acompanha a fila de envio (pendentes, falhas e tentativas).
+    """
+    list_display = ('phone', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('phone', 'body')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
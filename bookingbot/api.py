@@ -1,7 +1,6 @@
 import re
-import spacy
 
-nlp = spacy.load("pt_core_news_sm")
+from .services.spacy_nlp import get_nlp
 
 
 def interpretar_mensagem(msg):
@@ -14,8 +13,9 @@ def interpretar_mensagem(msg):
     else:
         intent = "desconhecido"
 
-    doc = nlp(msg)
-    datas = [ent.text for ent in doc.ents if ent.label_ == "DATE"]
+    nlp = get_nlp()
+    doc = nlp(msg) if nlp else None
+    datas = [ent.text for ent in doc.ents if ent.label_ == "DATE"] if doc else []
     horas = re.findall(r'\d{1,2}:\d{2}', msg)
 
     return {
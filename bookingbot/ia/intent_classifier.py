@@ -1,40 +1,163 @@
 import re
+import json
+import time
 import pickle
+import logging
+import threading
 from pathlib import Path
-import spacy
 
-# === Carrega SpaCy ===
-nlp = spacy.load("pt_core_news_sm")
+import joblib
+from sklearn.pipeline import Pipeline
+
+# === SpaCy compartilhado (carregado sob demanda, só com o NER) ===
+from bookingbot.services.memo import CacheMemo
+from bookingbot.services.spacy_nlp import get_nlp, pipe
 
 # Caminhos dos arquivos do modelo
 BASE_DIR = Path(__file__).resolve().parent
+ARTIFACT_PATH = BASE_DIR / "model.joblib"
+MANIFEST_PATH = BASE_DIR / "model_manifest.json"
+# par antigo (model.pkl/vectorizer.pkl), usado enquanto não houver model.joblib
 MODEL_PATH = BASE_DIR / "model.pkl"
 VECTORIZER_PATH = BASE_DIR / "vectorizer.pkl"
 
+logger = logging.getLogger(__name__)
+
 
 # ======================================================
-# 1️⃣ Carregar modelo treinado (TF-IDF + LogisticRegression)
+# 1️⃣ Carregar modelo treinado (Pipeline de train_model.py)
 # ======================================================
 def load_trained_model():
-    if not MODEL_PATH.exists() or not VECTORIZER_PATH.exists():
-        return None, None  # modelo ainda não treinado
-    model = pickle.load(open(MODEL_PATH, "rb"))
-    vectorizer = pickle.load(open(VECTORIZER_PATH, "rb"))
-    return model, vectorizer
+    """Pipeline (vetorizador + classificador) ou None se o modelo ainda não foi treinado."""
+    return registry.get()
+
+
+class ModelRegistry:
+    """
+    Mantém o modelo (um Pipeline com predict/predict_proba sobre textos)
+    residente em memória no processo.
+
+    Usa o artefato model.joblib de train_model.py quando existe e, senão, o
+    par antigo model.pkl/vectorizer.pkl. Os arquivos só são lidos de novo
+    quando o mtime/tamanho muda, e a troca é feita de uma vez, então um
+    modelo re-treinado entra em uso sem reiniciar o servidor.
+    """
+
+    def __init__(self, artifact_path, model_path=None, vectorizer_path=None,
+                 manifest_path=None, check_interval=2.0):
+        self.artifact_path = Path(artifact_path)
+        self.model_path = Path(model_path) if model_path else None
+        self.vectorizer_path = Path(vectorizer_path) if vectorizer_path else None
+        self.manifest_path = Path(manifest_path) if manifest_path else None
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # (assinatura, modelo)
+        self._state = (None, None)
+        self._next_check = 0.0
+
+    def _signature(self):
+        try:
+            a = self.artifact_path.stat()
+            return ("joblib", a.st_mtime_ns, a.st_size)
+        except FileNotFoundError:
+            pass
+        if self.model_path is None:
+            return None
+        try:
+            m = self.model_path.stat()
+            v = self.vectorizer_path.stat()
+        except FileNotFoundError:
+            return None
+        return ("pickle", m.st_mtime_ns, m.st_size, v.st_mtime_ns, v.st_size)
+
+    def _mmap_mode(self):
+        # só artefatos sem compressão podem ser mapeados em memória
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return "r" if json.load(f).get("compressao") == 0 else None
+        except (TypeError, OSError, ValueError):
+            return None
+
+    def _load(self, sig):
+        if sig[0] == "joblib":
+            return joblib.load(self.artifact_path, mmap_mode=self._mmap_mode())
+        with open(self.model_path, "rb") as f:
+            model = pickle.load(f)
+        with open(self.vectorizer_path, "rb") as f:
+            vectorizer = pickle.load(f)
+        return Pipeline([("vetorizador", vectorizer), ("classificador", model)])
+
+    def get(self):
+        """Retorna o modelo ou None se não houver modelo."""
+        return self.get_com_assinatura()[1]
+
+    def get_com_assinatura(self):
+        """
+        (assinatura, modelo) lidos juntos: a assinatura identifica o modelo
+        carregado (muda quando um re-treino entra em uso) e serve de chave
+        para caches de previsões.
+        """
+        state = self._state
+        now = time.monotonic()
+        if now < self._next_check:
+            return state
+
+        sig = self._signature()
+        if sig == state[0]:
+            self._next_check = now + self.check_interval
+            return state
+
+        with self._lock:
+            state = self._state
+            if sig != state[0]:
+                if sig is None:
+                    state = (None, None)
+                else:
+                    try:
+                        state = (sig, self._load(sig))
+                    except Exception:
+                        # arquivo sendo reescrito pelo treino (ou corrompido): mantém o modelo atual
+                        logger.exception("Erro ao carregar o modelo de intenção de %s", self.artifact_path)
+                self._state = state
+            self._next_check = time.monotonic() + self.check_interval
+        return state
+
+    def reset(self):
+        with self._lock:
+            self._state = (None, None)
+            self._next_check = 0.0
+
+
+registry = ModelRegistry(ARTIFACT_PATH, MODEL_PATH, VECTORIZER_PATH, MANIFEST_PATH)
 
 
 # ======================================================
 # 2️⃣ Extrair dados estruturados (datas e horários)
 # ======================================================
-def extract_datetime(text):
-    doc = nlp(text)
+def _datas_do_doc(doc):
+    if doc is None:
+        return []
+    return [ent.text for ent in doc.ents if ent.label_ == "DATE"]
+
 
-    datas = [ent.text for ent in doc.ents if ent.label_ == "DATE"]
+def extract_datetime(text):
+    nlp = get_nlp()
+    datas = _datas_do_doc(nlp(text) if nlp else None)
     horas = re.findall(r"\d{1,2}:\d{2}", text)
 
     return datas, horas
 
 
+def extract_datetimes(texts, batch_size=64, n_process=1):
+    """Versão em lote de extract_datetime, usando nlp.pipe."""
+    texts = list(texts)
+    docs = pipe(texts, batch_size=batch_size, n_process=n_process)
+    return [
+        (_datas_do_doc(doc), re.findall(r"\d{1,2}:\d{2}", text))
+        for text, doc in zip(texts, docs)
+    ]
+
+
 # ======================================================
 # 3️⃣ Classificação de intenção (treinado ou fallback)
 # ======================================================
@@ -56,16 +179,37 @@ def keyword_fallback(text):
 
 
 def classify_intent(text):
-    model, vectorizer = load_trained_model()
+    return classify_intents([text])[0]
+
+
+# intenção por (modelo carregado, texto normalizado)
+cache_intencoes = CacheMemo("classificador")
+
+
+def classify_intents(texts):
+    """
+    Classifica vários textos com uma única chamada predict para os que não
+    estão no cache.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    assinatura, model = registry.get_com_assinatura()
 
     # Se não existe modelo treinado → usa fallback
     if model is None:
-        return keyword_fallback(text)
+        return [keyword_fallback(t) for t in texts]
 
-    # Usa o modelo treinado
-    X = vectorizer.transform([text])
-    prediction = model.predict(X)[0]
-    return prediction
+    # Usa o modelo treinado (os vetorizadores já ignoram caixa e espaços nas pontas)
+    chaves = [(assinatura, t.lower().strip()) for t in texts]
+    intents = [cache_intencoes.buscar(chave, None) for chave in chaves]
+    faltando = [i for i, intent in enumerate(intents) if intent is None]
+    if faltando:
+        for i, intent in zip(faltando, model.predict([texts[i] for i in faltando])):
+            intents[i] = str(intent)
+            cache_intencoes.guardar(chaves[i], intents[i])
+    return intents
 
 
 # ======================================================
@@ -85,6 +229,22 @@ def interpretar_mensagem(text):
     }
 
 
+def interpretar_mensagens(texts, batch_size=64, n_process=1):
+    """Versão em lote de interpretar_mensagem (um predict e um nlp.pipe)."""
+    texts = list(texts)
+    intents = classify_intents(texts)
+    resultados = []
+    for intent, (datas, horas) in zip(intents, extract_datetimes(texts, batch_size, n_process)):
+        if intent == "desconhecido" and (datas or horas):
+            intent = "criar_reserva"
+        resultados.append({
+            "intent": intent,
+            "datas": datas,
+            "horas": horas,
+        })
+    return resultados
+
+
 # Teste rápido
 if __name__ == "__main__":
     print(interpretar_mensagem("Quero reservar a sala 2 amanhã às 14:00"))
@@ -1,41 +1,228 @@
 # bookingbot/ia/train_model.py
+"""
+Treino do classificador de intenção.
+
+Gera um único artefato (Pipeline vetorizador + classificador) salvo com
+joblib em model.joblib e um manifesto versionado (model_manifest.json) com
+hash dos dados, parâmetros, métricas de validação cruzada e tempos.
+
+Dois modelos:
+- "logreg": TF-IDF de n-gramas de caracteres (robusto a erros de digitação
+  e flexões; limitado por max_features/min_df) + LogisticRegression;
+- "sgd": HashingVectorizer de n-gramas de caracteres (sem vocabulário, tamanho
+  fixo) + SGDClassifier, que aceita treino incremental (partial_fit) com
+  conversas rotuladas novas.
+"""
+import hashlib
 import json
-import pickle
+import os
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+
+import joblib
+import sklearn
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import StratifiedKFold, cross_validate
+from sklearn.pipeline import Pipeline
 
 BASE_DIR = Path(__file__).resolve().parent
+DATASET_PATH = BASE_DIR / "training_data.json"
+ARTIFACT_PATH = BASE_DIR / "model.joblib"
+MANIFEST_PATH = BASE_DIR / "model_manifest.json"
+
+PADROES = {
+    "modelo": "logreg",
+    "max_features": 20000,
+    "min_df": 1,
+    "char_ngram": (2, 5),
+    "folds": 5,
+    "seed": 42,
+    "compressao": 3,
+}
 
-def load_dataset():
-    dataset_file = BASE_DIR / "training_data.json"
+
+def load_dataset(dataset_file=DATASET_PATH):
+    """(textos, rótulos) de um JSON com lista de {"text", "label"} ou de um JSONL."""
+    dataset_file = Path(dataset_file)
     if not dataset_file.exists():
         raise FileNotFoundError(f"Arquivo não encontrado: {dataset_file}")
     with open(dataset_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+        conteudo = f.read()
+    if conteudo.lstrip().startswith("["):
+        data = json.loads(conteudo)
+    else:
+        data = [json.loads(linha) for linha in conteudo.splitlines() if linha.strip()]
     texts = [item["text"] for item in data]
     labels = [item["label"] for item in data]
     return texts, labels
 
-def train():
-    print("📘 Carregando dataset...")
-    texts, labels = load_dataset()
 
-    print(f"⚙️  Exemplos no dataset: {len(texts)}")
-    print("🔧 Vetorizando texto...")
-    vectorizer = TfidfVectorizer()
-    X = vectorizer.fit_transform(texts)
+def hash_dados(texts, labels):
+    h = hashlib.sha256()
+    for text, label in zip(texts, labels):
+        h.update(json.dumps([text, label], ensure_ascii=False).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def construir_pipeline(modelo="logreg", max_features=20000, min_df=1, char_ngram=(2, 5), seed=42):
+    if modelo == "sgd":
+        return Pipeline([
+            ("vetorizador", HashingVectorizer(
+                analyzer="char_wb", ngram_range=tuple(char_ngram),
+                n_features=max_features, alternate_sign=False, norm=None,
+            )),
+            ("tfidf", TfidfTransformer(sublinear_tf=True)),
+            ("classificador", SGDClassifier(loss="log_loss", alpha=1e-4, random_state=seed)),
+        ])
+    if modelo != "logreg":
+        raise ValueError(f"modelo desconhecido: {modelo}")
+    return Pipeline([
+        ("vetorizador", TfidfVectorizer(
+            analyzer="char_wb", ngram_range=tuple(char_ngram), min_df=min_df,
+            max_features=max_features, sublinear_tf=True,
+        )),
+        ("classificador", LogisticRegression(C=10, max_iter=1000)),
+    ])
+
+
+def validar(pipeline, texts, labels, folds=5, n_jobs=None, seed=42):
+    """Validação cruzada estratificada (folds limitados pela menor classe)."""
+    menor_classe = min(labels.count(rotulo) for rotulo in set(labels))
+    folds = max(2, min(folds, menor_classe))
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    r = cross_validate(pipeline, texts, labels, cv=cv, scoring=("accuracy", "f1_macro"), n_jobs=n_jobs)
+    return {
+        "folds": folds,
+        "acuracia": round(float(r["test_accuracy"].mean()), 4),
+        "acuracia_desvio": round(float(r["test_accuracy"].std()), 4),
+        "f1_macro": round(float(r["test_f1_macro"].mean()), 4),
+        "f1_macro_desvio": round(float(r["test_f1_macro"].std()), 4),
+    }
+
+
+def ler_manifesto(manifest_path=MANIFEST_PATH):
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _gravar_atomico(caminho, escrever):
+    # o registry (intent_classifier) nunca vê um arquivo pela metade
+    caminho = Path(caminho)
+    temporario = caminho.with_name(f".{caminho.name}.tmp")
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+def salvar(pipeline, manifesto, artifact_path=ARTIFACT_PATH, manifest_path=MANIFEST_PATH, compressao=3):
+    """
+    Grava o artefato e depois o manifesto. Com compressao=0 o artefato pode
+    ser aberto com mmap (os arrays do modelo não são copiados para cada
+    processo); comprimido ele fica menor em disco.
+    """
+    inicio = time.perf_counter()
+    _gravar_atomico(artifact_path, lambda p: joblib.dump(pipeline, p, compress=compressao))
+    manifesto["compressao"] = compressao
+    manifesto["tamanho_bytes"] = Path(artifact_path).stat().st_size
+    manifesto["tempo_s"]["salvar"] = round(time.perf_counter() - inicio, 3)
+
+    def escrever(p):
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    _gravar_atomico(manifest_path, escrever)
+    return manifesto
+
+
+def train(dataset_file=DATASET_PATH, artifact_path=ARTIFACT_PATH, manifest_path=MANIFEST_PATH,
+          n_jobs=None, validar_modelo=True, **opcoes):
+    """Treina do zero, valida e salva artefato + manifesto. Retorna o manifesto."""
+    params = {**PADROES, **{k: v for k, v in opcoes.items() if v is not None}}
+    params["char_ngram"] = list(params["char_ngram"])
+    texts, labels = load_dataset(dataset_file)
+    pipeline = construir_pipeline(
+        params["modelo"], params["max_features"], params["min_df"], params["char_ngram"], params["seed"])
+
+    tempos = {}
+    metricas = None
+    if validar_modelo:
+        inicio = time.perf_counter()
+        metricas = validar(pipeline, texts, labels, params["folds"], n_jobs, params["seed"])
+        tempos["validacao"] = round(time.perf_counter() - inicio, 3)
+
+    inicio = time.perf_counter()
+    pipeline.fit(texts, labels)
+    tempos["treino"] = round(time.perf_counter() - inicio, 3)
+
+    anterior = ler_manifesto(manifest_path)
+    manifesto = {
+        "versao": (anterior or {}).get("versao", 0) + 1,
+        "criado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sklearn": sklearn.__version__,
+        "dados": {"arquivo": Path(dataset_file).name, "sha256": hash_dados(texts, labels), "exemplos": len(texts)},
+        "rotulos": sorted(set(labels)),
+        "parametros": {k: v for k, v in params.items() if k != "compressao"},
+        "n_features": _n_features(pipeline),
+        "validacao": metricas,
+        "tempo_s": tempos,
+        "incremental": [],
+    }
+    return salvar(pipeline, manifesto, artifact_path, manifest_path, params["compressao"])
+
+
+def train_incremental(dataset_file, artifact_path=ARTIFACT_PATH, manifest_path=MANIFEST_PATH, compressao=None):
+    """
+    Atualiza o modelo "sgd" atual com exemplos novos (partial_fit), sem
+    re-treinar do zero. A acurácia nos exemplos novos é medida antes da
+    atualização (o modelo ainda não os viu).
+    """
+    manifesto = ler_manifesto(manifest_path)
+    if manifesto is None or manifesto["parametros"]["modelo"] != "sgd":
+        raise ValueError("treino incremental exige um modelo atual treinado com modelo='sgd'")
+    pipeline = joblib.load(artifact_path)
+    texts, labels = load_dataset(dataset_file)
+
+    novos = sorted(set(labels) - set(manifesto["rotulos"]))
+    if novos:
+        raise ValueError(f"rótulos fora do modelo (re-treine do zero): {novos}")
+
+    inicio = time.perf_counter()
+    X = pipeline[:-1].transform(texts)
+    classificador = pipeline[-1]
+    acuracia_antes = float((classificador.predict(X) == labels).mean())
+    classificador.partial_fit(X, labels)
+    duracao = round(time.perf_counter() - inicio, 3)
 
-    print("🤖 Treinando modelo (LogisticRegression)...")
-    model = LogisticRegression(max_iter=400)
-    model.fit(X, labels)
+    manifesto["incremental"].append({
+        "versao": manifesto["versao"] + 1,
+        "criado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "arquivo": Path(dataset_file).name,
+        "sha256": hash_dados(texts, labels),
+        "exemplos": len(texts),
+        "acuracia_antes": round(acuracia_antes, 4),
+        "tempo_s": duracao,
+    })
+    manifesto["versao"] += 1
+    manifesto["tempo_s"] = {"partial_fit": duracao}
+    compressao = manifesto.get("compressao", PADROES["compressao"]) if compressao is None else compressao
+    return salvar(pipeline, manifesto, artifact_path, manifest_path, compressao)
 
-    print("💾 Salvando arquivos (model.pkl / vectorizer.pkl)...")
-    pickle.dump(model, open(BASE_DIR / "model.pkl", "wb"))
-    pickle.dump(vectorizer, open(BASE_DIR / "vectorizer.pkl", "wb"))
 
-    print("✔ Treinamento concluído com sucesso! Modelos salvos em:", BASE_DIR)
+def _n_features(pipeline):
+    vetorizador = pipeline.named_steps["vetorizador"]
+    if isinstance(vetorizador, HashingVectorizer):
+        return vetorizador.n_features
+    return len(vetorizador.vocabulary_)
 
 
 if __name__ == "__main__":
-    train()
+    print("📘 Treinando a partir de", DATASET_PATH)
+    manifesto = train()
+    print(f"✔ Modelo v{manifesto['versao']} salvo em {ARTIFACT_PATH} ({manifesto['tamanho_bytes']} bytes)")
+    print("   validação:", manifesto["validacao"])
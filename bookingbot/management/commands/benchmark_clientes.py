@@ -0,0 +1,77 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from bookingbot.models import Customer, OutboundMessage
+from bookingbot.services import clientes
+from bookingbot.views import whatsapp_webhook
+
+
+# DDD 00 não existe: os clientes do benchmark não colidem com clientes reais
+PREFIXO = "+55009"
+
+MENSAGENS = (
+    "oi",
+    "ajuda",
+    "horários disponíveis amanhã",
+    "ver disponibilidade dia {d}",
+)
+
+
+def consultas_em(tabela, queries):
+    return sum(tabela in q["sql"] for q in queries)
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduz mensagens do webhook (poucos clientes escrevendo várias vezes) e "
+        "mostra quantas consultas ao banco cada mensagem faz para achar o cliente: "
+        "get_or_create (caminho antigo) contra cache + upsert (services/clientes.py), "
+        "e o total de consultas por mensagem do webhook. Grava e depois apaga "
+        f"clientes {PREFIXO}... no banco configurado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mensagens", type=int, default=2000)
+        parser.add_argument("--telefones", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        random.seed(opts["seed"])
+        sequencia = [random.randrange(opts["telefones"]) for _ in range(opts["mensagens"])]
+        tabela = Customer._meta.db_table
+        clientes.cache.limpar()
+
+        try:
+            with CaptureQueriesContext(connection) as antes:
+                for i in sequencia:
+                    Customer.objects.get_or_create(phone=f"{PREFIXO}1{i:05d}")
+            with CaptureQueriesContext(connection) as depois:
+                for i in sequencia:
+                    clientes.obter_cliente(f"{PREFIXO}2{i:05d}")
+
+            clientes.cache.limpar()
+            factory = APIRequestFactory()
+            with CaptureQueriesContext(connection) as webhook:
+                for i in sequencia:
+                    texto = random.choice(MENSAGENS).format(d=random.randint(1, 28))
+                    request = factory.post("/webhook/", {"from": f"{PREFIXO}3{i:05d}", "body": texto}, format="json")
+                    whatsapp_webhook(request)
+        finally:
+            OutboundMessage.objects.filter(phone__startswith=PREFIXO).delete()
+            Customer.objects.filter(phone__startswith=PREFIXO).delete()
+            clientes.cache.limpar()
+
+        n = len(sequencia)
+        por_msg_antes = consultas_em(tabela, antes.captured_queries) / n
+        por_msg_depois = consultas_em(tabela, depois.captured_queries) / n
+        self.stdout.write(f"Banco: {connection.vendor}; {n} mensagens de {len(set(sequencia))} telefones")
+        self.stdout.write(f"get_or_create:   {por_msg_antes:.3f} consultas de cliente/mensagem")
+        self.stdout.write(f"cache + upsert:  {por_msg_depois:.3f} consultas de cliente/mensagem")
+        self.stdout.write(f"economia:        {por_msg_antes - por_msg_depois:.3f} consultas/mensagem")
+        self.stdout.write(
+            f"webhook:         {len(webhook.captured_queries) / n:.3f} consultas/mensagem "
+            f"({consultas_em(tabela, webhook.captured_queries) / n:.3f} de cliente)")
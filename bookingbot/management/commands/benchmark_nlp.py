@@ -0,0 +1,205 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookingbot.ia import intent_classifier
+from bookingbot.services import memo, nlp, nlp_v2
+
+
+DATASETS = {
+    "treino": settings.BASE_DIR / "bookingbot" / "ia" / "training_data.json",
+    "holdout": settings.BASE_DIR / "bookingbot" / "ia" / "holdout.json",
+}
+
+# Frases de clientes rotuladas com a intenção real (benchmark_nlp_v2 e test_intents)
+FRASES_NLP_V2 = settings.BASE_DIR / "bookingbot" / "ia" / "frases_nlp_v2.json"
+
+# Cada extrator tem o seu vocabulário de intenções; estes mapas levam as
+# respostas para os rótulos de training_data.json antes de medir acerto.
+EXTRATORES = {
+    "nlp": (nlp.interpretar_mensagem, {
+        "reservar": "criar_reserva",
+        "cancelar": "cancelar_reserva",
+    }),
+    "nlp_v2": (nlp_v2.interpretar_mensagem, {
+        "listar_disponibilidade": "consultar_disponibilidade",
+        "remarcar_reserva": "reagendar_reserva",
+    }),
+    "nlp_v2_sequencial": (nlp_v2.interpretar_mensagem_sequencial, {
+        "listar_disponibilidade": "consultar_disponibilidade",
+        "remarcar_reserva": "reagendar_reserva",
+    }),
+    "intent_classifier": (intent_classifier.interpretar_mensagem, {}),
+}
+
+# Limites de --comparar: o que conta como regressão contra a linha de base
+TOLERANCIA_VAZAO = 0.20  # queda relativa de msg/s
+TOLERANCIA_F1 = 0.01  # queda absoluta de F1 macro
+PISO_LATENCIA_MS = 0.05  # abaixo disso, variação de p95 é ruído do sistema
+
+
+def carregar_dataset(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return [(item["text"], item["label"]) for item in json.load(f)]
+
+
+def percentis(amostras_ns):
+    pontos = statistics.quantiles(amostras_ns, n=100, method="inclusive")
+    ms = lambda ns: round(ns / 1e6, 4)
+    return {
+        "p50": ms(pontos[49]),
+        "p95": ms(pontos[94]),
+        "p99": ms(pontos[98]),
+        "max": ms(max(amostras_ns)),
+        "media": ms(statistics.fmean(amostras_ns)),
+    }
+
+
+def acuracia_f1(esperados, previstos):
+    """Acurácia e F1 macro (média do F1 de cada rótulo esperado ou previsto)."""
+    acertos = sum(e == p for e, p in zip(esperados, previstos))
+    f1s = []
+    for rotulo in set(esperados) | set(previstos):
+        vp = sum(e == p == rotulo for e, p in zip(esperados, previstos))
+        fp = sum(p == rotulo != e for e, p in zip(esperados, previstos))
+        fn = sum(e == rotulo != p for e, p in zip(esperados, previstos))
+        f1s.append(2 * vp / (2 * vp + fp + fn) if vp else 0.0)
+    return {
+        "n": len(esperados),
+        "acuracia": round(acertos / len(esperados), 4),
+        "f1_macro": round(statistics.fmean(f1s), 4),
+    }
+
+
+def medir(func, mapa, datasets, repeticoes):
+    # a primeira chamada carrega modelo/spaCy: medida à parte
+    tracemalloc.start()
+    t = time.perf_counter_ns()
+    func("aquecimento")
+    carga_ms = (time.perf_counter_ns() - t) / 1e6
+    carga_kb = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    textos = [texto for exemplos in datasets.values() for texto, _ in exemplos]
+    amostras = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for texto in textos:
+            t = time.perf_counter_ns()
+            func(texto)
+            amostras.append(time.perf_counter_ns() - t)
+    duracao = time.perf_counter() - inicio
+
+    # memória de pico só do processamento (sem contar o overhead do tracemalloc no tempo)
+    tracemalloc.start()
+    for texto in textos:
+        func(texto)
+    pico_kb = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    qualidade = {}
+    for nome, exemplos in datasets.items():
+        previstos = [str(func(texto)["intent"]) for texto, _ in exemplos]
+        previstos = [mapa.get(p, p) for p in previstos]
+        qualidade[nome] = acuracia_f1([rotulo for _, rotulo in exemplos], previstos)
+
+    return {
+        "latencia_ms": percentis(amostras),
+        "msg_s": round(len(amostras) / duracao, 1),
+        "carga_ms": round(carga_ms, 2),
+        "memoria_carga_kb": round(carga_kb, 1),
+        "memoria_pico_kb": round(pico_kb, 1),
+        "qualidade": qualidade,
+    }
+
+
+def regressoes(base, atual, tolerancia_vazao=TOLERANCIA_VAZAO, tolerancia_f1=TOLERANCIA_F1):
+    """Lista de (extrator, descrição) do que piorou além das tolerâncias."""
+    problemas = []
+    for nome, novo in atual["extratores"].items():
+        antigo = base.get("extratores", {}).get(nome)
+        if antigo is None:
+            continue
+        if novo["msg_s"] < antigo["msg_s"] * (1 - tolerancia_vazao):
+            problemas.append((nome, f"vazão {antigo['msg_s']} → {novo['msg_s']} msg/s"))
+        p95, p95_antigo = novo["latencia_ms"]["p95"], antigo["latencia_ms"]["p95"]
+        if p95 > p95_antigo * (1 + tolerancia_vazao) and p95 - p95_antigo > PISO_LATENCIA_MS:
+            problemas.append((nome, f"p95 {p95_antigo} → {p95} ms"))
+        for dataset, q in novo["qualidade"].items():
+            q_antiga = antigo["qualidade"].get(dataset)
+            if q_antiga and q["f1_macro"] < q_antiga["f1_macro"] - tolerancia_f1:
+                problemas.append((nome, f"F1 {dataset} {q_antiga['f1_macro']} → {q['f1_macro']}"))
+    return problemas
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de regressão do NLP (services/nlp.py, services/nlp_v2.py e "
+        "ia/intent_classifier.py): latência por mensagem (p50/p95/p99), msg/s, memória "
+        "de pico e acurácia/F1 em training_data.json e holdout.json. Grava um JSON "
+        "para comparar entre commits (--comparar)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--saida", default="benchmark_nlp.json", help="JSON com os resultados ('-' = só imprime).")
+        parser.add_argument("--repeticoes", type=int, default=20)
+        parser.add_argument("--extrator", action="append", choices=sorted(EXTRATORES),
+                            help="Mede só estes extratores (pode repetir).")
+        parser.add_argument("--comparar", help="JSON de uma execução anterior: falha se houver regressão.")
+        parser.add_argument("--tolerancia-vazao", type=float, default=TOLERANCIA_VAZAO)
+        parser.add_argument("--tolerancia-f1", type=float, default=TOLERANCIA_F1)
+
+    def handle(self, *args, **opts):
+        datasets = {nome: carregar_dataset(caminho) for nome, caminho in DATASETS.items()}
+        resultado = {
+            "commit": _commit(),
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "repeticoes": opts["repeticoes"],
+            "extratores": {},
+        }
+
+        for nome in opts["extrator"] or EXTRATORES:
+            func, mapa = EXTRATORES[nome]
+            # mede o parser/modelo, não o cache de mensagens repetidas
+            with memo.desligados():
+                r = medir(func, mapa, datasets, opts["repeticoes"])
+            resultado["extratores"][nome] = r
+            lat = r["latencia_ms"]
+            self.stdout.write(
+                f"{nome:<18} p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms "
+                f"{r['msg_s']:.0f} msg/s pico={r['memoria_pico_kb']:.0f}KB "
+                + " ".join(f"{d}: acc={q['acuracia']} f1={q['f1_macro']}" for d, q in r["qualidade"].items())
+            )
+
+        if opts["saida"] != "-":
+            with open(opts["saida"], "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resultados em {opts['saida']}")
+
+        if opts["comparar"]:
+            with open(opts["comparar"], encoding="utf-8") as f:
+                base = json.load(f)
+            problemas = regressoes(base, resultado, opts["tolerancia_vazao"], opts["tolerancia_f1"])
+            for nome, descricao in problemas:
+                self.stderr.write(f"[regressão] {nome}: {descricao}")
+            if problemas:
+                raise CommandError(f"{len(problemas)} regressão(ões) contra {base.get('commit') or opts['comparar']}")
+            self.stdout.write(f"Sem regressões contra {base.get('commit') or opts['comparar']}")
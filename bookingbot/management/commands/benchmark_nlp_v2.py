@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookingbot.services import memo
+from bookingbot.services.nlp_v2 import interpretar_mensagem, interpretar_mensagem_sequencial
+
+from .benchmark_nlp import FRASES_NLP_V2, carregar_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark do nlp_v2: mensagens/segundo do extrator pré-compilado "
+        "contra a implementação sequencial, usando as frases de ia/frases_nlp_v2.json."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=500)
+        parser.add_argument("--rodadas", type=int, default=5)
+
+    def medir(self, func, frases, repeticoes, rodadas):
+        # melhor de N rodadas, para reduzir ruído do sistema
+        melhor = float("inf")
+        for _ in range(rodadas):
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                for frase in frases:
+                    func(frase)
+            melhor = min(melhor, time.perf_counter() - inicio)
+        return repeticoes * len(frases) / melhor
+
+    def handle(self, *args, **opts):
+        frases = [texto for texto, _ in carregar_dataset(FRASES_NLP_V2)]
+        # mede o parser, não o cache de mensagens repetidas
+        with memo.desligados():
+            antes = self.medir(interpretar_mensagem_sequencial, frases, opts["repeticoes"], opts["rodadas"])
+            depois = self.medir(interpretar_mensagem, frases, opts["repeticoes"], opts["rodadas"])
+
+        self.stdout.write(f"Frases: {len(frases)} x {opts['repeticoes']} repetições")
+        self.stdout.write(f"sequencial (antes):     {antes:10.0f} msg/s")
+        self.stdout.write(f"pré-compilado (depois): {depois:10.0f} msg/s")
+        self.stdout.write(f"ganho: {depois / antes:.2f}x")
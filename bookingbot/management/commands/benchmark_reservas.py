@@ -0,0 +1,167 @@
+import random
+import statistics
+import time
+from datetime import date, time as dtime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bookingbot.models import Booking, Customer, Resource
+from bookingbot.services.reservas import conflitos, reservas_confirmadas_do_dia
+
+
+BENCH_PREFIX = "bench-"
+STATUS_PESOS = (("confirmed", 80), ("canceled", 15), ("pending", 5))
+
+# Índices em comparação (os das consultas medidas). Os demais, como o
+# booking_keyset_idx da paginação, ficam no lugar durante a medição.
+INDICES_COMPARADOS = ("booking_conf_slot_idx", "booking_conf_date_idx")
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o banco com reservas sintéticas e mostra plano de execução e "
+        "tempo das consultas de conflito/disponibilidade, com e sem os índices. "
+        "Use um banco descartável (DATABASE_URL) — SQLite ou PostgreSQL: o "
+        "comando apaga e recria índices e se recusa a rodar num banco com "
+        "clientes ou reservas de verdade, a menos que receba --i-know."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reservas", type=int, default=1_000_000)
+        parser.add_argument("--recursos", type=int, default=5)
+        parser.add_argument("--clientes", type=int, default=1000)
+        parser.add_argument("--repeticoes", type=int, default=200)
+        parser.add_argument("--lote", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--sem-popular", action="store_true",
+            help="Reaproveita os dados de uma execução anterior.")
+        parser.add_argument(
+            "--i-know", action="store_true",
+            help="Roda mesmo num banco com dados reais (os índices somem durante a medição).")
+
+    def handle(self, *args, **opts):
+        random.seed(opts["seed"])
+        self.stdout.write(f"Banco: {connection.vendor} ({connection.settings_dict['NAME']})")
+        if not opts["i_know"] and not self.descartavel():
+            raise CommandError(
+                "O banco tem clientes ou reservas fora do benchmark. Aponte DATABASE_URL "
+                "para um banco descartável ou passe --i-know.")
+
+        if not opts["sem_popular"]:
+            self.popular(opts)
+
+        resources = list(Resource.objects.filter(slug__startswith=BENCH_PREFIX))
+        if not resources:
+            raise CommandError("Nenhum dado de benchmark. Rode sem --sem-popular.")
+        ultimo = Booking.objects.filter(resource__in=resources).order_by("-date").values_list("date", flat=True).first()
+        dias = (ultimo - date(2000, 1, 1)).days + 1
+
+        amostras = [
+            (random.choice(resources), date(2000, 1, 1) + timedelta(days=random.randrange(dias)), random.randrange(8, 21))
+            for _ in range(opts["repeticoes"])
+        ]
+
+        indices = [index for index in Booking._meta.indexes if index.name in INDICES_COMPARADOS]
+        self.stdout.write("\n=== COM ÍNDICES ===")
+        com = self.medir(amostras)
+
+        with connection.schema_editor() as editor:
+            for index in indices:
+                editor.remove_index(Booking, index)
+        try:
+            self.analisar()
+            self.stdout.write("\n=== SEM ÍNDICES ===")
+            sem = self.medir(amostras)
+        finally:
+            with connection.schema_editor() as editor:
+                for index in indices:
+                    editor.add_index(Booking, index)
+            self.analisar()
+
+        self.stdout.write("\n=== RESUMO (mediana, ms) ===")
+        for nome in com:
+            self.stdout.write(f"{nome:<16} com índices: {com[nome]:8.3f}   sem índices: {sem[nome]:8.3f}")
+
+    def descartavel(self):
+        """Banco sem clientes nem reservas além dos criados pelo benchmark."""
+        return not (
+            Customer.objects.exclude(phone__startswith=BENCH_PREFIX).exists()
+            or Booking.objects.exclude(resource__slug__startswith=BENCH_PREFIX).exists()
+        )
+
+    def popular(self, opts):
+        Booking.objects.filter(resource__slug__startswith=BENCH_PREFIX).delete()
+        Resource.objects.filter(slug__startswith=BENCH_PREFIX).delete()
+        Customer.objects.filter(phone__startswith=BENCH_PREFIX).delete()
+
+        resources = Resource.objects.bulk_create([
+            Resource(name=f"Bench Sala {i}", slug=f"{BENCH_PREFIX}sala-{i}")
+            for i in range(opts["recursos"])
+        ])
+        customers = Customer.objects.bulk_create([
+            Customer(phone=f"{BENCH_PREFIX}{i}") for i in range(opts["clientes"])
+        ])
+        # recarrega para ter os pk em qualquer banco
+        resources = list(Resource.objects.filter(slug__startswith=BENCH_PREFIX))
+        customers = list(Customer.objects.filter(phone__startswith=BENCH_PREFIX))
+
+        status, pesos = zip(*STATUS_PESOS)
+        total = opts["reservas"]
+        # ~10 reservas por recurso por dia, como numa agenda cheia
+        inicio = time.perf_counter()
+        lote = []
+        for n in range(total):
+            slot = n // len(resources)
+            d = date(2000, 1, 1) + timedelta(days=slot // 10)
+            h = 8 + slot % 10
+            lote.append(Booking(
+                customer=random.choice(customers),
+                resource=resources[n % len(resources)],
+                date=d,
+                start_time=dtime(h),
+                end_time=dtime(h + 1),
+                status=random.choices(status, pesos)[0],
+            ))
+            if len(lote) >= opts["lote"]:
+                Booking.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            Booking.objects.bulk_create(lote)
+        self.analisar()
+        self.stdout.write(f"Populado: {total} reservas em {time.perf_counter() - inicio:.1f}s")
+
+    def analisar(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def consultas(self, resource, d, h):
+        ini, fim = dtime(h), dtime(h + 1)
+        return {
+            "conflito": lambda: conflitos(resource, d, ini, fim).exists(),
+            "disponibilidade": lambda: list(reservas_confirmadas_do_dia(d).order_by("resource_id", "start_time")),
+        }
+
+    def medir(self, amostras):
+        resource, d, h = amostras[0]
+        self.stdout.write("\n-- plano: conflito")
+        self.stdout.write(conflitos(resource, d, dtime(h), dtime(h + 1)).explain())
+        self.stdout.write("\n-- plano: disponibilidade")
+        self.stdout.write(reservas_confirmadas_do_dia(d).order_by("resource_id", "start_time").explain())
+
+        tempos = {}
+        for resource, d, h in amostras:
+            for nome, consulta in self.consultas(resource, d, h).items():
+                t = time.perf_counter()
+                consulta()
+                tempos.setdefault(nome, []).append((time.perf_counter() - t) * 1000)
+
+        resultado = {}
+        self.stdout.write("")
+        for nome, valores in tempos.items():
+            valores.sort()
+            resultado[nome] = statistics.median(valores)
+            p95 = valores[int(len(valores) * 0.95) - 1]
+            self.stdout.write(f"{nome:<16} mediana={resultado[nome]:.3f}ms p95={p95:.3f}ms")
+        return resultado
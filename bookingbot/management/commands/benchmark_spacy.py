@@ -0,0 +1,73 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Roda num processo novo para medir o custo real de um worker.
+SCRIPT = r"""
+import json, resource, sys, time
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+modo = sys.argv[1]
+rss_inicial = rss_mb()
+t = time.perf_counter()
+import bookingbot.api, bookingbot.services.nlp
+sys.path.insert(0, "bookingbot/ia")
+import intent_classifier
+importacao = time.perf_counter() - t
+
+from bookingbot.services import spacy_nlp
+t = time.perf_counter()
+if modo == "completo":
+    nlp = spacy_nlp.carregar(excluir=[])
+else:
+    nlp = spacy_nlp.get_nlp()
+carga = time.perf_counter() - t
+
+t = time.perf_counter()
+if nlp is not None:
+    list(nlp.pipe(["Quero reservar a sala A amanhã às 14h"] * 200, batch_size=64))
+pipe_200 = time.perf_counter() - t
+
+print(json.dumps({
+    "modo": modo,
+    "modelo_disponivel": nlp is not None,
+    "componentes": list(nlp.pipe_names) if nlp is not None else [],
+    "importacao_s": round(importacao, 3),
+    "carga_s": round(carga, 3),
+    "pipe_200_s": round(pipe_200, 3),
+    "rss_inicial_mb": round(rss_inicial, 1),
+    "rss_final_mb": round(rss_mb(), 1),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede, em processos separados (como um worker do gunicorn), o tempo de "
+        "import/carga e a memória (RSS) do spaCy completo contra o pipeline só com NER."
+    )
+
+    def handle(self, *args, **opts):
+        for modo in ("completo", "ner"):
+            saida = subprocess.run(
+                [sys.executable, "-c", SCRIPT, modo],
+                cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+            linhas = saida.stdout.strip().splitlines()
+            if saida.returncode != 0 or not linhas:
+                self.stderr.write(f"[{modo}] falhou:\n{saida.stderr}")
+                continue
+            r = json.loads(linhas[-1])
+            self.stdout.write(
+                f"{r['modo']:<9} import={r['importacao_s']}s carga={r['carga_s']}s "
+                f"pipe(200)={r['pipe_200_s']}s RSS={r['rss_inicial_mb']}→{r['rss_final_mb']}MB "
+                f"componentes={r['componentes'] or '-'}"
+                + ("" if r["modelo_disponivel"] else " (modelo não instalado)")
+            )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookingbot.services.carga import GatewayFalso
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe um gateway de WhatsApp falso (services/carga.py) com latência e taxa "
+        "de erro configuráveis. Aponte WHATSAPP_API_URL para <url>/send (e, se "
+        "quiser o envio em lote, WHATSAPP_API_BATCH_URL para <url>/batch)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--porta", type=int, default=8900)
+        parser.add_argument("--latencia-ms", type=float, default=150)
+        parser.add_argument("--variacao-ms", type=float, default=50)
+        parser.add_argument("--erro", type=float, default=0.0, help="Fração das chamadas que falham com 503.")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        gateway = GatewayFalso(
+            latencia_ms=opts["latencia_ms"], variacao_ms=opts["variacao_ms"], taxa_erro=opts["erro"],
+            host=opts["host"], porta=opts["porta"], seed=opts["seed"])
+        self.stdout.write(f"Gateway falso em {gateway.url} (Ctrl+C para sair)")
+        with gateway:
+            try:
+                while True:
+                    time.sleep(10)
+                    self.stdout.write(f"[gateway] {gateway.snapshot()}")
+            except KeyboardInterrupt:
+                pass
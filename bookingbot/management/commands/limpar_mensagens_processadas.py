@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bookingbot.services.dedupe import limpar_mensagens_antigas
+
+
+class Command(BaseCommand):
+    help = "Apaga os ids de mensagens do webhook mais antigos que WEBHOOK_DEDUPE_TTL (rodar via cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl", type=int, default=settings.WEBHOOK_DEDUPE_TTL,
+            help="Idade máxima, em segundos, dos ids mantidos.")
+
+    def handle(self, *args, **options):
+        apagados = limpar_mensagens_antigas(options["ttl"])
+        self.stdout.write(f"[dedupe] apagados={apagados}")
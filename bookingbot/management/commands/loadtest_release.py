@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookingbot.services import carga
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _servidor(alvo, porta, workers):
+    """Linha de comando do servidor e caminho do webhook de cada alvo."""
+    endereco = f"127.0.0.1:{porta}"
+    if alvo == "wsgi":
+        return [sys.executable, "-m", "gunicorn", "core.wsgi:application", "--bind", endereco,
+                "--workers", str(workers), "--threads", "4", "--log-level", "warning"], "/webhook/"
+    return [sys.executable, "-m", "uvicorn", "core.asgi:application", "--host", "127.0.0.1",
+            "--port", str(porta), "--workers", str(workers), "--log-level", "warning"], "/webhook/"
+
+
+ALVOS = ("wsgi", "asgi")
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga do release: sobe o gateway de WhatsApp falso, o worker do "
+        "outbox e, para cada alvo (gunicorn/WSGI ou uvicorn/ASGI, ambos em "
+        "/webhook/), o servidor; dispara mensagens realistas "
+        "(services/carga.py) e mede req/s, p50/p95/p99 e taxa de erro. Sem "
+        "--database-url, cada alvo roda num SQLite temporário. Falha se passar "
+        "dos limites --max-p95-ms / --max-erros."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alvos", default=",".join(ALVOS), help=f"Entre {', '.join(ALVOS)}.")
+        parser.add_argument("--requisicoes", type=int, default=2000)
+        parser.add_argument("--concorrencia", type=int, default=100)
+        parser.add_argument("--telefones", type=int, default=500)
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--workers", type=int, default=2, help="Processos do gunicorn/uvicorn.")
+        parser.add_argument("--gateway-latencia-ms", type=float, default=150)
+        parser.add_argument("--gateway-variacao-ms", type=float, default=50)
+        parser.add_argument("--gateway-erro", type=float, default=0.0)
+        parser.add_argument("--database-url", help="Banco dos servidores (padrão: SQLite temporário por alvo).")
+        parser.add_argument("--drenar", type=float, default=30,
+                            help="Segundos esperando o worker esvaziar o outbox depois da carga.")
+        parser.add_argument("--max-p95-ms", type=float)
+        parser.add_argument("--max-erros", type=float, default=0.01, help="Taxa de erro máxima (0.01 = 1%%).")
+        parser.add_argument("--saida", help="Grava os resultados em JSON neste arquivo.")
+
+    def handle(self, *args, **opts):
+        alvos = [a.strip() for a in opts["alvos"].split(",") if a.strip()]
+        desconhecidos = set(alvos) - set(ALVOS)
+        if desconhecidos:
+            raise CommandError(f"Alvos desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+        payloads, tipos = carga.gerar_mensagens(opts["requisicoes"], telefones=opts["telefones"], seed=opts["seed"])
+        self.stdout.write(f"Mensagens: {len(payloads)} {dict(sorted(Counter(tipos).items()))}")
+
+        resultados = {}
+        gateway = carga.GatewayFalso(
+            opts["gateway_latencia_ms"], opts["gateway_variacao_ms"], opts["gateway_erro"], seed=opts["seed"])
+        with gateway, tempfile.TemporaryDirectory() as tmp:
+            for alvo in alvos:
+                url_banco = opts["database_url"] or f"sqlite:///{Path(tmp) / f'{alvo}.sqlite3'}"
+                antes = gateway.snapshot()
+                resumo = self.rodar(alvo, url_banco, gateway, payloads, opts)
+                depois = gateway.snapshot()
+                resumo["gateway"] = {k: depois[k] - antes[k] for k in depois}
+                resultados[alvo] = resumo
+                self.linha(alvo, resumo)
+
+        if opts["saida"]:
+            with open(opts["saida"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2)
+        self.verificar(resultados, opts)
+
+    def ambiente(self, url_banco, gateway):
+        return {
+            **os.environ,
+            "DATABASE_URL": url_banco,
+            "ALLOWED_HOSTS": "127.0.0.1,localhost",
+            "DEBUG": "False",
+            "USE_GOOGLE_CALENDAR": "False",
+            "WHATSAPP_API_URL": f"{gateway.url}/send",
+            "WHATSAPP_API_BATCH_URL": f"{gateway.url}/batch",
+            "PROFILING_SAMPLE_RATE": "0",
+            "PYTHONUNBUFFERED": "1",
+        }
+
+    def manage(self, env, *args):
+        subprocess.run([sys.executable, str(settings.BASE_DIR / "manage.py"), *args],
+                       env=env, cwd=settings.BASE_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    def rodar(self, alvo, url_banco, gateway, payloads, opts):
+        env = self.ambiente(url_banco, gateway)
+        self.stdout.write(f"[{alvo}] preparando o banco...")
+        self.manage(env, "migrate", "--no-input")
+        self.manage(env, "shell", "-c", "from bookingbot.services import carga; carga.preparar_banco()")
+
+        porta = _porta_livre()
+        comando, caminho = _servidor(alvo, porta, opts["workers"])
+        processos = [
+            subprocess.Popen(comando, env=env, cwd=settings.BASE_DIR),
+            subprocess.Popen([sys.executable, str(settings.BASE_DIR / "manage.py"), "processar_outbox",
+                              "--intervalo", "0.2"], env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL),
+        ]
+        try:
+            self.esperar_porta(porta, processos[0])
+            resumo = carga.resumir(*asyncio.run(carga.disparar(
+                f"http://127.0.0.1:{porta}{caminho}", payloads, opts["concorrencia"], opts["timeout"])))
+            resumo["outbox"] = self.drenar(env, opts["drenar"])
+        finally:
+            for p in processos:
+                p.terminate()
+            for p in processos:
+                try:
+                    p.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    p.kill()
+        return resumo
+
+    def esperar_porta(self, porta, processo, limite=30):
+        fim = time.monotonic() + limite
+        while time.monotonic() < fim:
+            if processo.poll() is not None:
+                raise CommandError(f"O servidor saiu com código {processo.returncode}.")
+            try:
+                with socket.create_connection(("127.0.0.1", porta), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"O servidor não abriu a porta {porta} em {limite}s.")
+
+    def drenar(self, env, limite):
+        """Espera o worker enviar o outbox (até `limite` segundos) e retorna a contagem por status."""
+        fim = time.monotonic() + limite
+        while True:
+            saida = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / "manage.py"), "shell", "-c",
+                 "import json; from bookingbot.services import carga; print(json.dumps(carga.estado_outbox()))"],
+                env=env, cwd=settings.BASE_DIR, check=True, capture_output=True, text=True).stdout
+            estado = json.loads(saida.strip().splitlines()[-1])
+            if not (estado.get("pending") or estado.get("sending")) or time.monotonic() >= fim:
+                return estado
+            time.sleep(1)
+
+    def linha(self, alvo, resumo):
+        lat = resumo["latencia_ms"]
+        self.stdout.write(
+            f"[{alvo}] {resumo['req_s']:.1f} req/s  erros={resumo['taxa_erro']:.2%}  "
+            f"p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms  "
+            f"outbox={resumo['outbox']}  gateway={resumo['gateway']}")
+
+    def verificar(self, resultados, opts):
+        problemas = []
+        for alvo, resumo in resultados.items():
+            if resumo["taxa_erro"] > opts["max_erros"]:
+                problemas.append(f"{alvo}: taxa de erro {resumo['taxa_erro']:.2%} > {opts['max_erros']:.2%}")
+            if opts["max_p95_ms"] is not None and resumo["latencia_ms"]["p95"] > opts["max_p95_ms"]:
+                problemas.append(f"{alvo}: p95 {resumo['latencia_ms']['p95']}ms > {opts['max_p95_ms']}ms")
+        if problemas:
+            raise CommandError("Limites estourados: " + "; ".join(problemas))
+        self.stdout.write(self.style.SUCCESS("Dentro dos limites."))
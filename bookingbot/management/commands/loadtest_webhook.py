@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+from bookingbot.services import carga
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispara POSTs concorrentes contra um webhook e mostra vazão e latência. "
+        "Serve para comparar o deploy WSGI (gunicorn) com o ASGI (uvicorn), "
+        "ambos em /webhook/. Para a rodada completa antes do release, "
+        "com os servidores e o gateway falso, use loadtest_release."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Ex.: http://localhost:8000/webhook/")
+        parser.add_argument("--requisicoes", type=int, default=2000)
+        parser.add_argument("--concorrencia", type=int, default=200)
+        parser.add_argument("--telefones", type=int, default=500)
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--saida", help="Grava o resumo em JSON neste arquivo.")
+
+    def handle(self, *args, **opts):
+        payloads, _ = carga.gerar_mensagens(opts["requisicoes"], telefones=opts["telefones"], seed=opts["seed"])
+        resumo = carga.resumir(*asyncio.run(
+            carga.disparar(opts["url"], payloads, opts["concorrencia"], opts["timeout"])))
+        self.relatorio(resumo)
+        if opts["saida"]:
+            with open(opts["saida"], "w", encoding="utf-8") as f:
+                json.dump(resumo, f, indent=2)
+
+    def relatorio(self, resumo):
+        lat = resumo["latencia_ms"]
+        self.stdout.write(
+            f"Requisições: {resumo['requisicoes']} em {resumo['duracao_s']:.2f}s ({resumo['req_s']:.1f} req/s)")
+        self.stdout.write(f"Erros: {resumo['erros']} ({resumo['taxa_erro']:.2%})  Status: {resumo['status']}")
+        self.stdout.write(f"Latência (ms): p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} max={lat['max']}")
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bookingbot.services.outbox import processar_outbox, processar_outbox_async
+from bookingbot.services.whatsapp import AsyncWhatsAppGateway
+
+
+class Command(BaseCommand):
+    help = "Envia as mensagens pendentes do outbox de WhatsApp (worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=settings.WHATSAPP_OUTBOX_WORKERS,
+            help="Número de threads de envio (telefones em paralelo).")
+        parser.add_argument(
+            "--limite", type=int, default=100,
+            help="Máximo de destinatários por ciclo.")
+        parser.add_argument(
+            "--intervalo", type=float, default=1.0,
+            help="Segundos de espera quando a fila está vazia.")
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Executa um único ciclo e sai.")
+        parser.add_argument(
+            "--asyncio", action="store_true",
+            help="Usa asyncio + cliente httpx em vez do pool de threads "
+                 "(--workers vira o número de envios simultâneos).")
+
+    def relatar(self, enviadas, falhas):
+        if enviadas or falhas:
+            self.stdout.write(f"[outbox] enviadas={enviadas} falhas={falhas}")
+
+    def handle(self, *args, **options):
+        if options["asyncio"]:
+            asyncio.run(self.loop_async(options))
+            return
+
+        while True:
+            enviadas, falhas = processar_outbox(
+                workers=options["workers"], limite=options["limite"])
+            self.relatar(enviadas, falhas)
+            if options["once"]:
+                break
+            if not enviadas and not falhas:
+                time.sleep(options["intervalo"])
+
+    async def loop_async(self, options):
+        gateway = AsyncWhatsAppGateway.from_settings()
+        try:
+            while True:
+                enviadas, falhas = await processar_outbox_async(
+                    gateway, concorrencia=options["workers"], limite=options["limite"])
+                self.relatar(enviadas, falhas)
+                if options["once"]:
+                    break
+                if not enviadas and not falhas:
+                    await asyncio.sleep(options["intervalo"])
+        finally:
+            await gateway.aclose()
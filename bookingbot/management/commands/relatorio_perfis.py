@@ -0,0 +1,125 @@
+import json
+import pstats
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookingbot.services import perfil
+
+
+_SITE_PACKAGES = re.compile(r"^.*[/\\]site-packages[/\\]")
+
+
+def nome_curto(funcao):
+    """arquivo:linha(função) sem o caminho do projeto ou do site-packages."""
+    base = str(settings.BASE_DIR)
+    if funcao.startswith(base):
+        funcao = funcao[len(base):].lstrip("/\\")
+    return _SITE_PACKAGES.sub("", funcao)
+
+
+def agregar_cprofile(arquivos):
+    """{função: [chamadas, tottime, cumtime]} somando os dumps do cProfile."""
+    stats = pstats.Stats(*map(str, arquivos))
+    resultado = {}
+    for (arquivo, linha, nome), (_, chamadas, tottime, cumtime, _) in stats.stats.items():
+        resultado[nome_curto(f"{arquivo}:{linha}({nome})")] = [chamadas, tottime, cumtime]
+    return resultado
+
+
+def agregar_pilhas(arquivos):
+    """(amostras próprias, amostras inclusivas, total) somando as pilhas amostradas."""
+    proprias, inclusivas, total = Counter(), Counter(), 0
+    for arquivo in arquivos:
+        with open(arquivo, encoding="utf-8") as f:
+            for linha in f:
+                pilha, _, n = linha.rstrip("\n").rpartition(" ")
+                if not pilha:
+                    continue
+                n = int(n)
+                funcoes = [nome_curto(p) for p in pilha.split(";")]
+                total += n
+                proprias[funcoes[-1]] += n
+                for funcao in set(funcoes):
+                    inclusivas[funcao] += n
+    return proprias, inclusivas, total
+
+
+def agregar_consultas(arquivos):
+    """Tempo das requisições e consultas agrupadas pelo SQL (sem os parâmetros)."""
+    requisicoes, ms_total, n_consultas = 0, 0.0, 0
+    por_sql = defaultdict(lambda: {"n": 0, "ms": 0.0, "max_ms": 0.0, "explain": None})
+    for arquivo in arquivos:
+        with open(arquivo, encoding="utf-8") as f:
+            dados = json.load(f)
+        requisicoes += 1
+        ms_total += dados["ms"]
+        for consulta in dados["consultas"]:
+            n_consultas += 1
+            item = por_sql[consulta["sql"]]
+            item["n"] += 1
+            item["ms"] += consulta["ms"]
+            item["max_ms"] = max(item["max_ms"], consulta["ms"])
+            item["explain"] = consulta.get("explain") or item["explain"]
+    return requisicoes, ms_total, n_consultas, por_sql
+
+
+class Command(BaseCommand):
+    help = (
+        "Soma os perfis gravados pelo PerfilMiddleware (PROFILING_DIR) e mostra as "
+        "funções mais caras (cProfile e/ou amostragem) e as consultas que mais "
+        "somaram tempo, com o EXPLAIN das lentas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Diretório dos perfis (padrão: PROFILING_DIR).")
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument("--ordem", choices=("tottime", "cumtime"), default="tottime",
+                            help="Ordenação das funções do cProfile.")
+        parser.add_argument("--view", help="Só os perfis desta view (nome da rota, ex.: whatsapp_webhook).")
+
+    def handle(self, *args, **opts):
+        diretorio = Path(opts["dir"]) if opts["dir"] else perfil.diretorio()
+        if not diretorio.is_dir():
+            raise CommandError(f"Diretório não encontrado: {diretorio}")
+
+        def arquivos(extensao):
+            encontrados = sorted(diretorio.glob(f"*{extensao}"))
+            if opts["view"]:
+                encontrados = [p for p in encontrados if p.name.split(".", 1)[0].endswith(f"-{opts['view']}")]
+            return encontrados
+
+        profs, pilhas, sqls = arquivos(".prof"), arquivos(".stacks"), arquivos(".sql.json")
+        if not (profs or pilhas or sqls):
+            raise CommandError(f"Nenhum perfil em {diretorio}")
+        top = opts["top"]
+
+        if profs:
+            funcoes = agregar_cprofile(profs)
+            coluna = 1 if opts["ordem"] == "tottime" else 2
+            self.stdout.write(f"=== cProfile: {len(profs)} requisições, top {top} por {opts['ordem']} ===")
+            self.stdout.write(f"{'tottime(s)':>11} {'cumtime(s)':>11} {'chamadas':>9}  função")
+            for nome, (chamadas, tottime, cumtime) in sorted(
+                    funcoes.items(), key=lambda item: item[1][coluna], reverse=True)[:top]:
+                self.stdout.write(f"{tottime:>11.4f} {cumtime:>11.4f} {chamadas:>9}  {nome}")
+
+        if pilhas:
+            proprias, inclusivas, total = agregar_pilhas(pilhas)
+            self.stdout.write(f"\n=== Amostragem: {len(pilhas)} requisições, {total} amostras ===")
+            self.stdout.write(f"{'próprio':>8} {'inclusivo':>10}  função")
+            for nome, n in proprias.most_common(top):
+                self.stdout.write(f"{n / total:>8.1%} {inclusivas[nome] / total:>10.1%}  {nome}")
+
+        if sqls:
+            requisicoes, ms_total, n_consultas, por_sql = agregar_consultas(sqls)
+            self.stdout.write(
+                f"\n=== Consultas: {requisicoes} requisições, média {ms_total / requisicoes:.1f} ms e "
+                f"{n_consultas / requisicoes:.1f} consultas por requisição ===")
+            self.stdout.write(f"{'total(ms)':>10} {'n':>6} {'max(ms)':>8}  sql")
+            for sql, item in sorted(por_sql.items(), key=lambda kv: kv[1]["ms"], reverse=True)[:top]:
+                self.stdout.write(f"{item['ms']:>10.2f} {item['n']:>6} {item['max_ms']:>8.2f}  {sql[:160]}")
+                for linha in item["explain"] or ():
+                    self.stdout.write(f"{'':>28}EXPLAIN {linha}")
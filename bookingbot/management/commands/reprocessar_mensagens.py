@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookingbot.services.reprocessamento import LinhasPuladas, formato_do_arquivo, ler_mensagens, reprocessar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reprocessa um arquivo de mensagens (JSONL ou CSV) pelo nlp_v2 e pelo classificador "
+        "de intenção e grava um JSON por mensagem (intenção e entidades), em streaming."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="JSONL/CSV com as mensagens ('-' lê da entrada padrão).")
+        parser.add_argument("--formato", choices=("jsonl", "csv"), help="Padrão: pela extensão do arquivo.")
+        parser.add_argument("--campo", help="Campo com o texto (padrão: body ou text).")
+        parser.add_argument(
+            "--campo-data",
+            help="Campo com a data de envio, referência de 'hoje'/'amanhã' (padrão: timestamp, "
+                 "created_at, sent_at ou date; sem ele, a data de hoje).")
+        parser.add_argument("--saida", default="-", help="Arquivo JSONL de saída ('-' = saída padrão).")
+        parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--bloco", type=int, default=1000, help="Mensagens por tarefa do pool.")
+        parser.add_argument("--batch-size", type=int, default=64, help="Lote do nlp.pipe.")
+
+    def handle(self, *args, **opts):
+        formato = opts["formato"] or formato_do_arquivo(opts["arquivo"])
+        try:
+            entrada = sys.stdin if opts["arquivo"] == "-" else open(opts["arquivo"], encoding="utf-8", newline="")
+        except OSError as e:
+            raise CommandError(e)
+        saida = self.stdout if opts["saida"] == "-" else open(opts["saida"], "w", encoding="utf-8")
+
+        invalidas = LinhasPuladas()
+        total = 0
+        inicio = time.perf_counter()
+        try:
+            mensagens = ler_mensagens(entrada, formato, opts["campo"], invalidas, opts["campo_data"])
+            for resultado in reprocessar(mensagens, opts["processos"], opts["bloco"], opts["batch_size"]):
+                saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                total += 1
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+            if saida is not self.stdout:
+                saida.close()
+
+        duracao = time.perf_counter() - inicio
+        self.stderr.write(
+            f"[reprocessar] mensagens={total} puladas={invalidas.total} "
+            f"tempo={duracao:.1f}s vazao={total / duracao if duracao else 0:.0f} msg/s"
+        )
+        if invalidas.total:
+            self.stderr.write(f"[reprocessar] linhas puladas (primeiras): {invalidas.primeiras}")
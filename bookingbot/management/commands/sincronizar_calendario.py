@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookingbot.services.calendar import get_client, sincronizar_reservas
+
+
+class Command(BaseCommand):
+    help = (
+        "Sincroniza as reservas com o Google Calendar em lote (worker): cria os "
+        "eventos das reservas confirmadas e remove os das canceladas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limite", type=int, default=200,
+            help="Máximo de reservas de cada tipo por ciclo.")
+        parser.add_argument(
+            "--intervalo", type=float, default=5.0,
+            help="Segundos de espera quando não há nada para sincronizar.")
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Executa um único ciclo e sai.")
+
+    def handle(self, *args, **options):
+        if not settings.USE_GOOGLE_CALENDAR:
+            raise CommandError("USE_GOOGLE_CALENDAR está desligado.")
+        client = get_client()
+
+        while True:
+            inseridos, cancelados, falhas = sincronizar_reservas(client, limite=options["limite"])
+            if inseridos or cancelados or falhas:
+                self.stdout.write(f"[calendar] inseridos={inseridos} cancelados={cancelados} falhas={falhas}")
+            if options["once"]:
+                break
+            if not inseridos and not cancelados:
+                time.sleep(options["intervalo"])
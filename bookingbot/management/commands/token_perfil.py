@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookingbot.services import perfil
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera o valor do cabeçalho que pede o perfil de uma requisição "
+        "(PROFILING_HEADER, assinado com PROFILING_SECRET e válido por "
+        "PROFILING_TOKEN_MAX_AGE segundos)."
+    )
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "PROFILING_SECRET", None):
+            raise CommandError("Defina PROFILING_SECRET (no servidor e aqui).")
+        self.stdout.write(f"{settings.PROFILING_HEADER}: {perfil.gerar_token()}")
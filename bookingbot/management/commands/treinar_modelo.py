@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookingbot.ia import train_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Treina o classificador de intenção e grava um único artefato (Pipeline em "
+        "model.joblib) com manifesto versionado (hash dos dados, métricas e tempos). "
+        "Com --incremental, atualiza o modelo 'sgd' atual com conversas rotuladas novas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dados", default=str(train_model.DATASET_PATH),
+                            help="JSON/JSONL com {\"text\", \"label\"}.")
+        parser.add_argument("--modelo", choices=("logreg", "sgd"), default=train_model.PADROES["modelo"])
+        parser.add_argument("--max-features", type=int, default=train_model.PADROES["max_features"],
+                            help="Limite de colunas do vetorizador (tamanho do modelo).")
+        parser.add_argument("--min-df", type=int, default=train_model.PADROES["min_df"])
+        parser.add_argument("--char-ngram", type=int, nargs=2, metavar=("MIN", "MAX"),
+                            default=train_model.PADROES["char_ngram"])
+        parser.add_argument("--folds", type=int, default=train_model.PADROES["folds"])
+        parser.add_argument("--n-jobs", type=int, default=-1, help="Processos da validação cruzada.")
+        parser.add_argument("--sem-validacao", action="store_true")
+        parser.add_argument("--seed", type=int, default=train_model.PADROES["seed"])
+        parser.add_argument("--compressao", type=int, choices=range(10), metavar="0-9",
+                            help="Nível do joblib (padrão 3, ou o do artefato atual com --incremental); "
+                                 "0 grava sem compressão (carregado com mmap).")
+        parser.add_argument("--incremental", metavar="ARQUIVO",
+                            help="Exemplos novos para partial_fit no modelo 'sgd' atual.")
+        parser.add_argument("--artefato", default=str(train_model.ARTIFACT_PATH))
+        parser.add_argument("--manifesto", default=str(train_model.MANIFEST_PATH))
+
+    def handle(self, *args, **opts):
+        try:
+            if opts["incremental"]:
+                manifesto = train_model.train_incremental(
+                    opts["incremental"], opts["artefato"], opts["manifesto"], opts["compressao"])
+                passo = manifesto["incremental"][-1]
+                self.stdout.write(
+                    f"[treino] v{manifesto['versao']} incremental: {passo['exemplos']} exemplos "
+                    f"(acurácia antes={passo['acuracia_antes']}) em {passo['tempo_s']}s")
+            else:
+                manifesto = train_model.train(
+                    opts["dados"], opts["artefato"], opts["manifesto"],
+                    n_jobs=opts["n_jobs"], validar_modelo=not opts["sem_validacao"],
+                    modelo=opts["modelo"], max_features=opts["max_features"], min_df=opts["min_df"],
+                    char_ngram=opts["char_ngram"], folds=opts["folds"], seed=opts["seed"],
+                    compressao=opts["compressao"],
+                )
+                self.stdout.write(
+                    f"[treino] v{manifesto['versao']} {manifesto['parametros']['modelo']}: "
+                    f"{manifesto['dados']['exemplos']} exemplos, {manifesto['n_features']} features, "
+                    f"tempos={manifesto['tempo_s']}")
+                if manifesto["validacao"]:
+                    self.stdout.write(f"[treino] validação: {manifesto['validacao']}")
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(e)
+
+        self.stdout.write(f"[treino] {opts['artefato']} ({manifesto['tamanho_bytes']} bytes)")
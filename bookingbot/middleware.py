@@ -0,0 +1,116 @@
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .services import metricas, perfil
+
+
+class MetricasMiddleware:
+    """
+    Duração e consultas ao banco de cada requisição, por view
+    (services/metricas.py). Funciona nas views síncronas e assíncronas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not metricas.ativo():
+            return self.get_response(request)
+        coleta = metricas.ColetaConsultas()
+        token = metricas.coleta_atual.set(coleta)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.coleta_atual.reset(token)
+        self._registrar(request, response, time.perf_counter() - inicio, coleta)
+        return response
+
+    async def __acall__(self, request):
+        if not metricas.ativo():
+            return await self.get_response(request)
+        coleta = metricas.ColetaConsultas()
+        token = metricas.coleta_atual.set(coleta)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.coleta_atual.reset(token)
+        self._registrar(request, response, time.perf_counter() - inicio, coleta)
+        return response
+
+    def _registrar(self, request, response, segundos, coleta):
+        # nome da rota, não o caminho: não cria uma série por id na URL
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "nao_encontrada"
+        metricas.registrar_requisicao(view, response.status_code, segundos, coleta)
+
+
+class PerfilMiddleware:
+    """
+    Perfil sob demanda das requisições (services/perfil.py): sorteadas por
+    PROFILING_SAMPLE_RATE ou pedidas com o cabeçalho assinado. Sem nenhum
+    dos dois configurado, fica fora da cadeia de middlewares. O id do perfil
+    volta no cabeçalho X-Profile-Id.
+
+    cProfile e o amostrador só enxergam a thread em que foram ligados. Sob
+    ASGI (uvicorn) a view síncrona roda numa thread do sync_to_async, não no
+    event loop: a requisição perfilada passa então por uma thread própria,
+    que liga o perfil e volta à cadeia com async_to_sync. O sync_to_async da
+    view (thread_sensitive) cai nessa mesma thread, que fica no perfil.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not (getattr(settings, "PROFILING_SAMPLE_RATE", 0) or getattr(settings, "PROFILING_SECRET", None)):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not perfil.deve_perfilar(request) or not perfil.ocupado.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            sessao = perfil.Sessao(request)
+            sessao.iniciar()
+            try:
+                response = self.get_response(request)
+            finally:
+                sessao.parar()
+        finally:
+            perfil.ocupado.release()
+        response["X-Profile-Id"] = sessao.gravar(response)
+        return response
+
+    async def __acall__(self, request):
+        if not perfil.deve_perfilar(request) or not perfil.ocupado.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            sessao = perfil.Sessao(request)
+            response = await sync_to_async(self._perfilar_na_thread)(request, sessao)
+        finally:
+            perfil.ocupado.release()
+        response["X-Profile-Id"] = await sync_to_async(sessao.gravar)(response)
+        return response
+
+    def _perfilar_na_thread(self, request, sessao):
+        sessao.iniciar()
+        try:
+            return async_to_sync(self.get_response)(request)
+        finally:
+            sessao.parar()
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingbot', '0002_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'confirmed')), fields=['resource', 'date', 'start_time'], name='booking_conf_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'confirmed')), fields=['date', 'start_time'], name='booking_conf_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['customer', 'date', 'start_time'], name='booking_customer_slot_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+import logging
+
+from django.db import migrations
+
+
+logger = logging.getLogger(__name__)
+
+# Duas reservas confirmadas do mesmo recurso não podem se sobrepor.
+# As colunas são date + time sem fuso, então o intervalo é um tsrange;
+# reservas que passam da meia-noite terminam no dia seguinte.
+PERIODO = """tsrange(
+            {t}"date" + {t}start_time,
+            CASE WHEN {t}end_time > {t}start_time THEN {t}"date" + {t}end_time
+                 ELSE ({t}"date" + 1) + {t}end_time END,
+            '[)'
+        )"""
+
+CRIAR_CONSTRAINT = f"""
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE bookingbot_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (
+        resource_id WITH =,
+        {PERIODO.format(t="")} WITH &&
+    )
+    WHERE (status = 'confirmed');
+"""
+
+# Pares (anterior, posterior) de reservas confirmadas que se sobrepõem,
+# com a mesma expressão da constraint, na ordem em que foram criadas
+SOBREPOSICOES = f"""
+SELECT a.id, b.id
+FROM bookingbot_booking a
+JOIN bookingbot_booking b
+  ON a.resource_id = b.resource_id
+ AND (a.created_at, a.id) < (b.created_at, b.id)
+ AND {PERIODO.format(t="a.")} && {PERIODO.format(t="b.")}
+WHERE a.status = 'confirmed' AND b.status = 'confirmed'
+ORDER BY b.created_at, b.id, a.created_at, a.id;
+"""
+
+REMOVER_CONSTRAINT = """
+ALTER TABLE bookingbot_booking DROP CONSTRAINT IF EXISTS booking_no_overlap;
+"""
+
+
+def reservas_a_cancelar(pares):
+    """
+    Ids das reservas a cancelar para a constraint caber: percorrendo os
+    pares na ordem de criação do posterior, a reserva mais nova cai se
+    ainda conflita com uma anterior que ficou. Numa cadeia A-B-C em que só
+    vizinhas se sobrepõem, cai só B.
+    """
+    canceladas = []
+    for anterior, posterior in pares:
+        if anterior not in canceladas and posterior not in canceladas:
+            canceladas.append(posterior)
+    return canceladas
+
+
+def resolver_sobreposicoes(apps, schema_editor):
+    """
+    A constraint não entra numa tabela que já tem reservas sobrepostas (o
+    deploy pararia). As duplicadas que já existem são canceladas antes,
+    mantendo a reserva feita primeiro, e os ids ficam no log.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Booking = apps.get_model("bookingbot", "Booking")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SOBREPOSICOES)
+        pares = cursor.fetchall()
+    canceladas = reservas_a_cancelar(pares)
+    if canceladas:
+        Booking.objects.filter(pk__in=canceladas).update(status="canceled")
+        conflitos = ", ".join(f"{posterior}x{anterior}" for anterior, posterior in pares if posterior in canceladas)
+        logger.warning("Reservas sobrepostas canceladas antes da constraint booking_no_overlap: %s (conflitos: %s)",
+                       ", ".join(map(str, canceladas)), conflitos)
+
+
+def criar(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CRIAR_CONSTRAINT)
+
+
+def remover(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(REMOVER_CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingbot', '0003_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolver_sobreposicoes, migrations.RunPython.noop),
+        migrations.RunPython(criar, remover),
+    ]
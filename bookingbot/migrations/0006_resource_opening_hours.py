@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:12
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingbot', '0005_processedmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='closes_at',
+            field=models.TimeField(default=datetime.time(22, 0), verbose_name='Fecha às'),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='opens_at',
+            field=models.TimeField(default=datetime.time(8, 0), verbose_name='Abre às'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingbot', '0006_resource_opening_hours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['date', 'start_time', 'id'], name='booking_keyset_idx'),
+        ),
+    ]
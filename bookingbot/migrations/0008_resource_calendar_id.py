@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingbot', '0007_booking_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='calendar_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Google Calendar ID'),
+        ),
+    ]
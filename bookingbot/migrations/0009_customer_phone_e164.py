@@ -0,0 +1,67 @@
+import re
+
+from django.conf import settings
+from django.db import migrations
+
+
+_NAO_DIGITOS = re.compile(r"\D")
+
+
+def _e164(bruto, ddi):
+    """
+    Cópia congelada de services.clientes.normalizar_telefone (como era nesta
+    migração): mudanças futuras no serviço não alteram o que ela faz.
+    """
+    if bruto is None:
+        return None
+    texto = str(bruto).strip().split("@", 1)[0].split(":", 1)[0]
+    internacional = texto.startswith("+")
+    digitos = _NAO_DIGITOS.sub("", texto)
+    if not internacional and digitos.startswith("00"):
+        digitos, internacional = digitos[2:], True
+    if not internacional:
+        nacional = digitos.lstrip("0")
+        if ddi and (digitos.startswith("0") or len(digitos) in (10, 11)):
+            digitos = ddi + nacional
+    if not 8 <= len(digitos) <= 15 or digitos.startswith("0"):
+        return None
+    return "+" + digitos
+
+
+def normalizar_telefones(apps, schema_editor):
+    """
+    Telefones gravados antes da normalização passam para E.164 (a chave que
+    o webhook usa agora). Se o número normalizado já for de outro cliente,
+    os dois são o mesmo contato: as reservas passam para o cliente que já
+    tem o número e o duplicado é apagado.
+    """
+    Customer = apps.get_model("bookingbot", "Customer")
+    Booking = apps.get_model("bookingbot", "Booking")
+    ddi = getattr(settings, "PHONE_DEFAULT_COUNTRY_CODE", "55")
+
+    clientes = list(Customer.objects.order_by("pk").values_list("pk", "phone", "name"))
+    donos = {phone: pk for pk, phone, _ in clientes}
+    for pk, phone, name in clientes:
+        telefone = _e164(phone, ddi)
+        if telefone is None or telefone == phone:
+            continue
+        dono = donos.get(telefone)
+        if dono is None:
+            Customer.objects.filter(pk=pk).update(phone=telefone)
+            donos[telefone] = pk
+            continue
+        Booking.objects.filter(customer_id=pk).update(customer_id=dono)
+        if name:
+            Customer.objects.filter(pk=dono, name="").update(name=name)
+        Customer.objects.filter(pk=pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingbot', '0008_resource_calendar_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_telefones, migrations.RunPython.noop),
+    ]
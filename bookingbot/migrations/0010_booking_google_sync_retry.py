@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingbot', '0009_customer_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='google_sync_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='google_sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='google_sync_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
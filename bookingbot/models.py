@@ -1,4 +1,7 @@
+from datetime import time
+
 from django.db import models
+from django.utils import timezone
 
 
 class Customer(models.Model):
@@ -6,6 +9,14 @@ class Customer(models.Model):
     phone = models.CharField(max_length=30, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # telefone lido do banco: se mudar, os sinais tiram o antigo do
+        # cache de clientes (services/clientes.py)
+        instance._telefone_carregado = instance.__dict__.get("phone")
+        return instance
+
     def __str__(self):
         return f"{self.name or 'Cliente'} ({self.phone})"
 
@@ -18,6 +29,13 @@ class Resource(models.Model):
         max_digits=6, decimal_places=2, default=50.00)
     description = models.TextField(blank=True, null=True)
 
+    # horário de funcionamento (base dos horários livres, services/disponibilidade.py)
+    opens_at = models.TimeField(default=time(8, 0), verbose_name="Abre às")
+    closes_at = models.TimeField(default=time(22, 0), verbose_name="Fecha às")
+
+    # agenda do Google Calendar da sala (vazio usa GOOGLE_CALENDAR_ID)
+    calendar_id = models.CharField(max_length=255, blank=True, verbose_name="Google Calendar ID")
+
     def __str__(self):
         return self.name
 
@@ -40,10 +58,95 @@ class Booking(models.Model):
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default="pending")
     google_event_id = models.CharField(max_length=200, blank=True, null=True)
+    # fila de sincronização com o Google Calendar (services/calendar.py):
+    # falhas seguidas e quando tentar de novo
+    google_sync_attempts = models.PositiveIntegerField(default=0)
+    google_sync_retry_at = models.DateTimeField(blank=True, null=True)
+    google_sync_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-date", "-start_time"]
+        indexes = [
+            # checagem de conflito: resource + date + sobreposição de horário
+            models.Index(
+                fields=["resource", "date", "start_time"],
+                condition=models.Q(status="confirmed"),
+                name="booking_conf_slot_idx",
+            ),
+            # consulta de disponibilidade do dia (todas as salas)
+            models.Index(
+                fields=["date", "start_time"],
+                condition=models.Q(status="confirmed"),
+                name="booking_conf_date_idx",
+            ),
+            # cancelamento: reserva do cliente na data/horário
+            models.Index(
+                fields=["customer", "date", "start_time"],
+                name="booking_customer_slot_idx",
+            ),
+            # paginação por chave e exportação da API (KeysetPagination)
+            models.Index(
+                fields=["date", "start_time", "id"],
+                name="booking_keyset_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # (recurso, dia) lidos do banco: se a reserva mudar de dia ou de
+        # sala, os sinais invalidam também a agenda antiga
+        instance._posicao_carregada = (instance.__dict__.get("resource_id"), instance.__dict__.get("date"))
+        return instance
 
     def __str__(self):
         return f"{self.customer.phone} — {self.date} {self.start_time}"
+
+
+class OutboundMessage(models.Model):
+    """
+    Outbox de mensagens do WhatsApp. A view apenas grava aqui (na mesma
+    transação da reserva) e o comando `processar_outbox` faz o envio.
+    """
+    STATUS_CHOICES = (
+        ("pending", "Pendente"),
+        ("sending", "Enviando"),
+        ("sent", "Enviada"),
+        ("failed", "Falhou"),
+    )
+
+    phone = models.CharField(max_length=30)
+    body = models.TextField()
+
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["phone", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.phone} — {self.status} (#{self.pk})"
+
+
+class ProcessedMessage(models.Model):
+    """
+    Ids de mensagens do gateway já processadas pelo webhook. A chave única
+    faz a retentativa do gateway cair fora antes de qualquer processamento;
+    registros antigos são apagados por `limpar_mensagens_processadas`.
+    """
+    message_id = models.CharField(max_length=128, unique=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.message_id
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import date, time
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por chave (date, start_time, id): cada página continua de
+    onde a anterior parou com um WHERE sobre a chave, sem OFFSET, então o
+    custo por página é o mesmo no início ou no fim da tabela (índice
+    booking_keyset_idx). O cursor é opaco (base64) e só avança.
+    """
+    ordering = ("date", "start_time", "id")
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 100
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            tamanho = self.page_size
+        return max(1, min(tamanho, self.max_page_size))
+
+    def decode_cursor(self, request):
+        bruto = request.query_params.get(self.cursor_query_param)
+        if not bruto:
+            return None
+        try:
+            d, t, pk = json.loads(base64.urlsafe_b64decode(bruto.encode()))
+            return date.fromisoformat(d), time.fromisoformat(t), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound("Cursor inválido.")
+
+    def encode_cursor(self, obj):
+        chave = [obj.date.isoformat(), obj.start_time.isoformat(), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(chave).encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        tamanho = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decode_cursor(request)
+        if cursor:
+            d, t, pk = cursor
+            queryset = queryset.filter(
+                Q(date__gt=d)
+                | Q(date=d, start_time__gt=t)
+                | Q(date=d, start_time=t, id__gt=pk)
+            )
+
+        # uma linha a mais diz se existe próxima página
+        pagina = list(queryset[:tamanho + 1])
+        self.has_next = len(pagina) > tamanho
+        pagina = pagina[:tamanho]
+        self.next_cursor = self.encode_cursor(pagina[-1]) if self.has_next else None
+        return pagina
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
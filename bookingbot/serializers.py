@@ -12,3 +12,4 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = "__all__"
+        read_only_fields = ("google_sync_attempts", "google_sync_retry_at", "google_sync_error")
@@ -0,0 +1,232 @@
+"""
+Atendimento de uma mensagem do WhatsApp: interpreta o texto e executa a
+ação pedida (reserva, cancelamento ou consulta), enfileirando a resposta
+no outbox. A view (views.whatsapp_webhook) só cuida do HTTP (payload,
+telefone, deduplicação) e devolve o dict retornado aqui como JSON.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+from ..models import Booking, Customer
+from . import clientes, intencao, respostas
+from .clientes import obter_cliente
+from .disponibilidade import (
+    consultar_disponibilidade, datas_ocupadas_no_google, janela_da_pergunta, recursos_livres, sugerir_horario,
+)
+from .nlp_v2 import interpretar_mensagem
+from .outbox import enfileirar_whatsapp
+from .recursos import indice_recursos
+from .reservas import ConflitoDeHorario, criar_reserva, criar_reservas
+
+
+def _responder_ocupado(phone, resource, d, start_dt, end_dt, duration_minutes):
+    sugestao = sugerir_horario(resource, d, duration_minutes, start_dt.time())
+    enfileirar_whatsapp(phone, respostas.reserva_ocupada(resource, d, start_dt, end_dt, sugestao))
+    return {"status": "busy", "next_free": sugestao}
+
+
+def _reservar_datas(phone, customer, resource, datas, start_dt, end_dt, duration_minutes):
+    """
+    Mesmo horário em várias datas ("segunda e quarta", "toda terça por 2
+    meses") na sala citada (ou a padrão): número fixo de consultas, qualquer
+    que seja o número de datas (services/reservas.criar_reservas).
+    """
+    # ocorrências que já passaram (inclusive hoje num horário já passado) ficam de fora
+    agora = timezone.localtime()
+    datas = [d for d in datas if d > agora.date() or (d == agora.date() and start_dt.time() > agora.time())]
+    if not datas:
+        enfileirar_whatsapp(phone, respostas.DATAS_PASSADAS)
+        return {"status": "past_dates"}
+
+    maximo = settings.BOOKING_MAX_OCCURRENCES
+    if len(datas) > maximo:
+        enfileirar_whatsapp(phone, respostas.datas_demais(maximo))
+        return {"status": "too_many_dates", "max": maximo}
+
+    inicio, fim = start_dt.time(), end_dt.time()
+    ocupadas = datas_ocupadas_no_google(resource, datas, inicio, fim)
+    try:
+        with transaction.atomic():
+            reservas, conflitos = criar_reservas(customer, resource, datas, inicio, fim, ocupadas)
+            enfileirar_whatsapp(phone, respostas.reservas_confirmadas(resource, reservas, conflitos, start_dt, end_dt))
+    except ConflitoDeHorario:
+        return _responder_ocupado(phone, resource, datas[0], start_dt, end_dt, duration_minutes)
+
+    status = "confirmed" if not conflitos else "partial" if reservas else "busy"
+    return {"status": status, "booking_ids": [b.id for b in reservas],
+            "conflicts": [str(d) for d in conflitos]}
+
+
+def processar_mensagem(phone, telefone, msg, customer=None):
+    """
+    Interpreta a mensagem e executa a ação pedida (reserva, cancelamento ou
+    consulta). `phone` é o endereço de resposta como o gateway mandou e
+    `telefone` o mesmo número em E.164 (chave do cliente); `customer` já
+    resolvido pode ser passado por quem chama.
+    Retorna o dict da resposta JSON do webhook.
+    """
+    # 1. Preparação: Cliente (cache telefone → id, services/clientes.py) e Interpretação
+    if customer is None:
+        customer = obter_cliente(telefone)
+    try:
+        return _atender(phone, msg, customer)
+    except IntegrityError:
+        # o cliente foi apagado (admin, outro worker) enquanto o id dele estava
+        # no cache deste processo, que só é limpo aqui até CUSTOMER_CACHE_TTL:
+        # a FK da reserva falha no commit. Esquece o id e atende de novo.
+        if Customer.objects.filter(pk=customer.pk).exists():
+            raise
+        clientes.esquecer(customer.pk, telefone)
+        return _atender(phone, msg, obter_cliente(telefone))
+
+
+def _atender(phone, msg, customer):
+    parsed = interpretar_mensagem(msg)
+
+    # regras do nlp_v2 → modelo → pergunta de esclarecimento (services/intencao.py)
+    classificacao = intencao.classificar(msg, parsed.get("intent"))
+    intent = classificacao.intent
+    date_str = parsed.get("date")       # Ex: 2025-12-31
+    time_str = parsed.get("time")       # Ex: 14:00
+    resource_name = parsed.get("resource_name") # Ex: "Sala A"
+    duration = parsed.get("duration_minutes")
+
+    # Duração padrão: 60 minutos (1 hora)
+    duration_minutes = duration if duration is not None and duration > 0 else 60
+
+    # --------------------
+    # 2. Criar reserva (criar_reserva, reservar)
+    # --------------------
+    if intent in ["criar_reserva", "reservar"]:
+
+        # 2a. Lógica de Recurso (índice em memória, sem consulta ao banco)
+        resource = indice_recursos.buscar(msg)
+        if resource is None and resource_name:
+            resource = indice_recursos.por_nome(resource_name)
+            if resource is None:
+                enfileirar_whatsapp(phone, respostas.recurso_nao_encontrado(resource_name))
+                return {"status": "resource_not_found"}
+        sala_citada = resource is not None
+        if resource is None:
+            # Se o usuário não especificou, usa o primeiro recurso como padrão
+            resource = indice_recursos.padrao()
+            if not resource:
+                enfileirar_whatsapp(phone, respostas.SEM_RECURSOS)
+                return {"status": "no_resources"}
+
+        # 2b. Checagem de Dados
+        if not date_str or not time_str:
+            enfileirar_whatsapp(phone, respostas.reserva_sem_dados(resource))
+            return {"status": "missing_info"}
+
+        try:
+            d = parse_date(date_str)
+            t = parse_time(time_str)
+            start_dt = datetime.combine(d, t)
+            end_dt = start_dt + timedelta(minutes=duration_minutes)
+            datas = [parse_date(s) for s in parsed.get("dates") or [date_str]]
+        except Exception:
+            enfileirar_whatsapp(phone, respostas.DATA_HORA_INVALIDA)
+            return {"status": "bad_date_time"}
+
+        # Várias datas (recorrência ou datas listadas com "e"): conflitos numa
+        # consulta e bulk_create. "hoje ou amanhã" segue com a primeira data.
+        if parsed.get("multiple_dates") and len(datas) > 1:
+            return _reservar_datas(phone, customer, resource, datas, start_dt, end_dt, duration_minutes)
+
+        # 2c. Sala livre no horário (reservas no banco + Google Calendar, uma
+        # consulta freebusy para todas as salas). Sem sala citada, usa a primeira livre.
+        candidatas = [resource] if sala_citada else indice_recursos.todos()
+        livres = recursos_livres(candidatas, d, start_dt.time(), end_dt.time())
+        if not livres:
+            return _responder_ocupado(phone, resource, d, start_dt, end_dt, duration_minutes)
+        resource = livres[0]
+
+        # 2d. Criar reserva + confirmação no outbox (mesma transação).
+        # A checagem de conflito roda com o recurso travado (ver criar_reserva).
+        try:
+            with transaction.atomic():
+                booking = criar_reserva(customer, resource, d, start_dt.time(), end_dt.time())
+
+                enfileirar_whatsapp(phone, respostas.reserva_confirmada(resource, d, start_dt, end_dt, duration_minutes))
+        except ConflitoDeHorario:
+            return _responder_ocupado(phone, resource, d, start_dt, end_dt, duration_minutes)
+
+        return {"status": "confirmed", "booking_id": booking.id}
+
+    # --------------------
+    # 3. Cancelar reserva (cancelar_reserva, cancelar)
+    # --------------------
+    elif intent in ["cancelar_reserva", "cancelar"]:
+        if not date_str or not time_str:
+            enfileirar_whatsapp(phone, respostas.CANCELAR_SEM_DADOS)
+            return {"status": "missing_info"}
+
+        try:
+            d = parse_date(date_str)
+            t = parse_time(time_str)
+        except Exception:
+            enfileirar_whatsapp(phone, respostas.CANCELAR_INVALIDO)
+            return {"status": "bad_date_time"}
+
+        # Tenta encontrar e cancelar a reserva
+        try:
+            # Busca a reserva pelo cliente, data, horário e status confirmado
+            booking = Booking.objects.get(
+                customer=customer,
+                date=d,
+                start_time=t,
+                status="confirmed"
+            )
+            # Atualiza o status
+            with transaction.atomic():
+                booking.status = "canceled"
+                booking.save()
+                enfileirar_whatsapp(phone, respostas.reserva_cancelada(d, t))
+            return {"status": "canceled"}
+        except Booking.DoesNotExist:
+            enfileirar_whatsapp(phone, respostas.CANCELAR_NAO_ENCONTRADA)
+            return {"status": "not_found"}
+
+    # --------------------
+    # 4. Consultar disponibilidade (consultar_disponibilidade, listar_disponibilidade)
+    # --------------------
+    elif intent in ["consultar_disponibilidade", "listar_disponibilidade"]:
+        if not date_str:
+            enfileirar_whatsapp(phone, respostas.CONSULTAR_SEM_DATA)
+            return {"status": "missing_date"}
+
+        try:
+            d = parse_date(date_str)
+        except Exception:
+            enfileirar_whatsapp(phone, respostas.CONSULTAR_DATA_INVALIDA)
+            return {"status": "bad_date"}
+
+        # Agendas em memória (services/disponibilidade.py): sala citada e/ou
+        # janela de horários ("entre 14h e 18h") respondem os trechos livres
+        resource = indice_recursos.buscar(msg)
+        recursos = [resource] if resource else indice_recursos.todos()
+        inicio, fim = janela_da_pergunta(parsed.get("times"))
+        texto, payload = consultar_disponibilidade(
+            d, recursos, inicio, fim, so_livres=resource is not None)
+
+        enfileirar_whatsapp(phone, texto)
+        return payload
+
+    # --------------------
+    # 5. Modelo sem confiança suficiente: pergunta em vez de adivinhar
+    # --------------------
+    elif intent == "esclarecer":
+        enfileirar_whatsapp(phone, respostas.esclarecer(classificacao.palpite))
+        return {"status": "clarify", "guess": classificacao.palpite}
+
+    # --------------------
+    # 6. Intent Desconhecida / Falha
+    # --------------------
+    else:
+        enfileirar_whatsapp(phone, respostas.AJUDA)
+        return {"status": "unknown_intent"}
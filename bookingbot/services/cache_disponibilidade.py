@@ -0,0 +1,145 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class CacheStats:
+    """Acertos e falhas do cache de disponibilidade, por tipo de entrada (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = {}
+            self.misses = {}
+
+    def record(self, tipo, hits=0, misses=0):
+        with self._lock:
+            self.hits[tipo] = self.hits.get(tipo, 0) + hits
+            self.misses[tipo] = self.misses.get(tipo, 0) + misses
+
+    def snapshot(self):
+        with self._lock:
+            tipos = sorted(set(self.hits) | set(self.misses))
+            resultado = {}
+            for tipo in tipos:
+                hits, misses = self.hits.get(tipo, 0), self.misses.get(tipo, 0)
+                total = hits + misses
+                resultado[tipo] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": hits / total if total else 0.0,
+                }
+            return resultado
+
+
+stats = CacheStats()
+
+PREFIXO = "disponibilidade"
+
+
+def _cache():
+    return caches[getattr(settings, "AVAILABILITY_CACHE", "default")]
+
+
+def _timeout():
+    # limita o tempo de vida de uma entrada gravada por um leitor que
+    # consultou o banco pouco antes de um commit de outro processo
+    return getattr(settings, "AVAILABILITY_CACHE_TIMEOUT", 600)
+
+
+def chave_agenda(resource_id, d):
+    return f"{PREFIXO}:agenda:{d.isoformat()}:{resource_id}"
+
+
+def chave_resposta(d, escopo):
+    """escopo: id do recurso (horários livres dele) ou "todas" (ocupados de todas as salas)."""
+    return f"{PREFIXO}:resposta:{d.isoformat()}:{escopo}"
+
+
+def ler_agendas(resource_ids, d):
+    """Intervalos ocupados em cache ({resource_id: [(inicio, fim, booking_id)]}) dos recursos que estiverem lá."""
+    chaves = {chave_agenda(rid, d): rid for rid in resource_ids}
+    achados = _cache().get_many(list(chaves))
+    stats.record("agenda", hits=len(achados), misses=len(chaves) - len(achados))
+    return {chaves[chave]: valor for chave, valor in achados.items()}
+
+
+def gravar_agendas(intervalos_por_recurso, d):
+    _cache().set_many(
+        {chave_agenda(rid, d): intervalos for rid, intervalos in intervalos_por_recurso.items()},
+        _timeout(),
+    )
+
+
+def assinatura(recursos):
+    """
+    Identifica o conjunto de recursos e os horários de funcionamento usados
+    numa resposta: se uma sala for criada ou mudar de horário, a resposta
+    guardada deixa de valer sem precisar saber quais dias apagar.
+    """
+    return tuple((r.pk, r.name, r.opens_at, r.closes_at) for r in recursos)
+
+
+def ler_resposta(d, escopo, recursos):
+    """(mensagem, payload) guardados para a pergunta, ou None."""
+    valor = _cache().get(chave_resposta(d, escopo))
+    if valor is not None and valor[0] != assinatura(recursos):
+        valor = None
+    stats.record("resposta", hits=int(valor is not None), misses=int(valor is None))
+    return None if valor is None else valor[1:]
+
+
+def gravar_resposta(d, escopo, recursos, msg, payload, timeout=None):
+    timeout = _timeout() if timeout is None else min(timeout, _timeout())
+    _cache().set(chave_resposta(d, escopo), (assinatura(recursos), msg, payload), timeout)
+
+
+def chave_google(calendar_id, d):
+    return f"{PREFIXO}:google:{d.isoformat()}:{calendar_id}"
+
+
+def ler_ocupacao_google(calendar_ids, d):
+    """Blocos ocupados do Google em cache ({calendar_id: [(inicio, fim)]}) das agendas que estiverem lá."""
+    chaves = {chave_google(cal, d): cal for cal in calendar_ids}
+    achados = _cache().get_many(list(chaves))
+    stats.record("google", hits=len(achados), misses=len(chaves) - len(achados))
+    return {chaves[chave]: valor for chave, valor in achados.items()}
+
+
+def gravar_ocupacao_google(blocos_por_agenda, d):
+    # o Google não avisa alterações feitas fora do bot: vida curta
+    timeout = getattr(settings, "GOOGLE_FREEBUSY_CACHE_TIMEOUT", 60)
+    _cache().set_many({chave_google(cal, d): blocos for cal, blocos in blocos_por_agenda.items()}, timeout)
+
+
+def invalidar_ocupacao_google(calendar_id, d):
+    _cache().delete(chave_google(calendar_id, d))
+
+
+def invalidar(resource_id, d):
+    """Apaga as entradas do recurso no dia e a resposta geral do dia."""
+    _cache().delete_many([
+        chave_agenda(resource_id, d),
+        chave_resposta(d, resource_id),
+        chave_resposta(d, "todas"),
+    ])
+
+
+def invalidar_reserva(booking, posicao_anterior=None):
+    """
+    Invalida os dias que a reserva ocupa (o seguinte também, se ela passa
+    da meia-noite) e a posição anterior (dia, recurso), se ela mudou.
+    """
+    posicoes = {(booking.resource_id, booking.date)}
+    if booking.end_time is not None and booking.end_time <= booking.start_time:
+        posicoes.add((booking.resource_id, booking.date + timedelta(days=1)))
+    if posicao_anterior and None not in posicao_anterior:
+        anterior_rid, anterior_d = posicao_anterior
+        posicoes.update({(anterior_rid, anterior_d), (anterior_rid, anterior_d + timedelta(days=1))})
+    for resource_id, d in posicoes:
+        invalidar(resource_id, d)
@@ -1,70 +1,458 @@
-import os
 import datetime
+import threading
+
 from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from dateutil import parser, tz
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from dateutil import tz
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+from ..models import Booking
+from . import cache_disponibilidade, metricas
+from .outbox import calcular_backoff
 
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+TIMEZONE = "America/Sao_Paulo"
+GOOGLE_API_ROOT = "https://www.googleapis.com/"
+
+# Prefixo dos ids de evento gerados a partir da reserva (base32hex: a-v, 0-9)
+PREFIXO_EVENTO = "bookingbot"
+
+
+class CalendarClient:
+    """
+    Cliente de longa duração da API do Google Calendar.
+
+    As credenciais da service account são lidas uma vez e o serviço é
+    montado com o documento de descoberta embutido na biblioteca
+    (static_discovery), sem buscar o discovery na rede. Os objetos do
+    googleapiclient/httplib2 não são thread-safe, então cada thread tem o
+    seu serviço (montado uma vez por thread).
+
+    `http_factory` e `root_url` permitem apontar para um servidor local
+    (usado nos testes no lugar da API real).
+    """
+
+    # máximo de chamadas num BatchHttpRequest aceito pela API
+    LOTE_MAXIMO = 50
+
+    def __init__(self, calendar_id, service_account_file=None, credentials=None,
+                 http_factory=None, root_url=GOOGLE_API_ROOT, timezone_name=TIMEZONE):
+        self.calendar_id = calendar_id
+        self.service_account_file = service_account_file
+        self.http_factory = http_factory
+        self.root_url = root_url.rstrip("/") + "/"
+        self.batch_uri = self.root_url + "batch/calendar/v3"
+        self.timezone_name = timezone_name
+        self.tzinfo = tz.gettz(timezone_name)
+        self._credentials = credentials
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            calendar_id=settings.GOOGLE_CALENDAR_ID,
+            service_account_file=getattr(settings, "GOOGLE_SERVICE_ACCOUNT_FILE", "client_secret.json"),
+            root_url=getattr(settings, "GOOGLE_API_ROOT_URL", GOOGLE_API_ROOT),
+        )
+
+    def _credenciais(self):
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    self._credentials = service_account.Credentials.from_service_account_file(
+                        self.service_account_file, scopes=SCOPES)
+        return self._credentials
+
+    @property
+    def service(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            opcoes = {
+                "static_discovery": True,
+                "cache_discovery": False,
+                "client_options": {"api_endpoint": self.root_url + "calendar/v3/"},
+            }
+            if self.http_factory is not None:
+                service = build("calendar", "v3", http=self.http_factory(), **opcoes)
+            else:
+                service = build("calendar", "v3", credentials=self._credenciais(), **opcoes)
+            self._local.service = service
+        return service
+
+    def _com_fuso(self, dt):
+        # converter para RFC3339 com timezone
+        return dt.replace(tzinfo=self.tzinfo) if dt.tzinfo is None else dt
+
+    def evento(self, summary, start_dt, end_dt, description="", event_id=None):
+        event = {
+            'summary': summary,
+            'description': description,
+            'start': {'dateTime': self._com_fuso(start_dt).isoformat(), 'timeZone': self.timezone_name},
+            'end': {'dateTime': self._com_fuso(end_dt).isoformat(), 'timeZone': self.timezone_name},
+            'reminders': {'useDefault': True},
+        }
+        if event_id:
+            event['id'] = event_id
+        return event
+
+    def verificar_disponibilidade(self, start_dt, end_dt, calendar_id=None):
+        with metricas.medir(metricas.calendar_segundos, operation="events.list"):
+            events_result = self.service.events().list(
+                calendarId=calendar_id or self.calendar_id,
+                timeMin=self._com_fuso(start_dt).isoformat(),
+                timeMax=self._com_fuso(end_dt).isoformat(),
+                singleEvents=True,
+                orderBy='startTime'
+            ).execute()
 
+        events = events_result.get('items', [])
+        return len(events) == 0
 
-def _get_service():
+    def criar_evento(self, summary, start_dt, end_dt, description="", calendar_id=None):
+        with metricas.medir(metricas.calendar_segundos, operation="events.insert"):
+            created = self.service.events().insert(
+                calendarId=calendar_id or self.calendar_id,
+                body=self.evento(summary, start_dt, end_dt, description),
+            ).execute()
+        return created.get('id')
+
+    def freebusy(self, calendar_ids, inicio, fim):
+        """
+        Blocos ocupados de várias agendas numa única chamada freebusy().query
+        (até LOTE_MAXIMO agendas por chamada). Retorna
+        {calendar_id: [(inicio, fim)]} com datetimes no fuso do cliente.
+        """
+        resultado = {}
+        calendar_ids = list(dict.fromkeys(calendar_ids))
+        for i in range(0, len(calendar_ids), self.LOTE_MAXIMO):
+            with metricas.medir(metricas.calendar_segundos, operation="freebusy"):
+                resposta = self.service.freebusy().query(body={
+                    "timeMin": self._com_fuso(inicio).isoformat(),
+                    "timeMax": self._com_fuso(fim).isoformat(),
+                    "timeZone": self.timezone_name,
+                    "items": [{"id": cal} for cal in calendar_ids[i:i + self.LOTE_MAXIMO]],
+                }).execute()
+            for cal, dados in resposta.get("calendars", {}).items():
+                resultado[cal] = [
+                    (parser.isoparse(b["start"]).astimezone(self.tzinfo),
+                     parser.isoparse(b["end"]).astimezone(self.tzinfo))
+                    for b in dados.get("busy", [])
+                ]
+        return resultado
+
+    def _inicio_ou_fim(self, campo):
+        # evento de dia inteiro vem com "date" em vez de "dateTime"
+        if "dateTime" in campo:
+            return parser.isoparse(campo["dateTime"]).astimezone(self.tzinfo)
+        return datetime.datetime.combine(datetime.date.fromisoformat(campo["date"]), datetime.time.min,
+                                         tzinfo=self.tzinfo)
+
+    def eventos_externos(self, calendar_id, inicio, fim):
+        """
+        Blocos ocupados da agenda por eventos que não são do bot (os ids com
+        PREFIXO_EVENTO ficam de fora: as reservas já estão no banco, cada uma
+        na sua sala). Eventos "livres" (transparent) também ficam de fora.
+        Retorna [(inicio, fim)] com datetimes no fuso do cliente.
+        """
+        blocos, pagina = [], None
+        while True:
+            with metricas.medir(metricas.calendar_segundos, operation="events.list"):
+                resposta = self.service.events().list(
+                    calendarId=calendar_id,
+                    timeMin=self._com_fuso(inicio).isoformat(),
+                    timeMax=self._com_fuso(fim).isoformat(),
+                    singleEvents=True,
+                    pageToken=pagina,
+                ).execute()
+            for evento in resposta.get("items", []):
+                if (evento.get("id", "").startswith(PREFIXO_EVENTO) or evento.get("status") == "cancelled"
+                        or evento.get("transparency") == "transparent"):
+                    continue
+                blocos.append((self._inicio_ou_fim(evento["start"]), self._inicio_ou_fim(evento["end"])))
+            pagina = resposta.get("nextPageToken")
+            if not pagina:
+                return blocos
+
+    def _executar_em_lote(self, requisicoes):
+        """
+        Executa as requisições em BatchHttpRequest de até LOTE_MAXIMO
+        chamadas (uma ida e volta por lote). Retorna, na mesma ordem, a
+        resposta ou a exceção de cada uma.
+        """
+        resultados = [None] * len(requisicoes)
+
+        for inicio in range(0, len(requisicoes), self.LOTE_MAXIMO):
+            def callback(request_id, response, exception):
+                resultados[int(request_id)] = exception if exception is not None else response
+
+            lote = BatchHttpRequest(callback=callback, batch_uri=self.batch_uri)
+            for i, req in enumerate(requisicoes[inicio:inicio + self.LOTE_MAXIMO], start=inicio):
+                lote.add(req, request_id=str(i))
+            with metricas.medir(metricas.calendar_segundos, operation="batch"):
+                lote.execute()
+        return resultados
+
+    def inserir_eventos(self, eventos):
+        """
+        Insere [(calendar_id, corpo do evento)] em lote. Evento com id que
+        já existe (409: inserido numa tentativa anterior, ou removido e
+        agora reconfirmado) é atualizado num segundo lote com status
+        "confirmed". Retorna o id ou a exceção de cada evento.
+        """
+        events = self.service.events()
+        requisicoes = [events.insert(calendarId=cal or self.calendar_id, body=corpo) for cal, corpo in eventos]
+        resultados = self._executar_em_lote(requisicoes)
+
+        conflitos = [
+            i for i, r in enumerate(resultados)
+            if isinstance(r, HttpError) and r.resp.status == 409 and eventos[i][1].get('id')
+        ]
+        if conflitos:
+            atualizacoes = [
+                events.patch(
+                    calendarId=eventos[i][0] or self.calendar_id,
+                    eventId=eventos[i][1]['id'],
+                    body={**eventos[i][1], 'status': 'confirmed'},
+                )
+                for i in conflitos
+            ]
+            for i, resultado in zip(conflitos, self._executar_em_lote(atualizacoes)):
+                resultados[i] = resultado
+
+        return [r if isinstance(r, Exception) else r.get('id') for r in resultados]
+
+    def cancelar_eventos(self, itens):
+        """
+        Remove [(calendar_id, event_id)] em lote. Evento já removido (404/410)
+        conta como sucesso. Retorna None ou a exceção de cada evento.
+        """
+        events = self.service.events()
+        requisicoes = [events.delete(calendarId=cal or self.calendar_id, eventId=eid) for cal, eid in itens]
+        resultados = []
+        for resultado in self._executar_em_lote(requisicoes):
+            if isinstance(resultado, HttpError) and resultado.resp.status in (404, 410):
+                resultado = None
+            resultados.append(resultado if isinstance(resultado, Exception) else None)
+        return resultados
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente compartilhado pelo processo, ou None se o Google Calendar estiver desligado."""
+    global _client
     if not settings.USE_GOOGLE_CALENDAR:
         return None  # não usa Google Calendar
-    sa_file = getattr(settings, "GOOGLE_SERVICE_ACCOUNT_FILE", "client_secret.json")
-    credentials = service_account.Credentials.from_service_account_file(sa_file, scopes=SCOPES)
-    service = build("calendar", "v3", credentials=credentials)
-    return service
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = CalendarClient.from_settings()
+    return _client
 
 
-def verificar_disponibilidade(start_dt, end_dt):
+def calendario_do_recurso(resource):
+    return resource.calendar_id or settings.GOOGLE_CALENDAR_ID
 
-    service = _get_service()
-    if service is None:
-        return True
 
-    # converter para RFC3339 com timezone
-    tzinfo = tz.gettz("America/Sao_Paulo")
-    if start_dt.tzinfo is None:
-        start_dt = start_dt.replace(tzinfo=tzinfo)
-    if end_dt.tzinfo is None:
-        end_dt = end_dt.replace(tzinfo=tzinfo)
+def _ocupados(client, calendar_ids, inicio, fim):
+    """
+    Blocos ocupados ({calendar_id: [(inicio, fim)]}) das agendas. A agenda
+    geral (GOOGLE_CALENDAR_ID) é compartilhada pelas salas sem agenda
+    própria e recebe os eventos de reserva de todas elas: o freebusy dela
+    ocuparia todas as salas a cada reserva, então ela é lida com
+    events.list, sem os eventos do bot. As agendas próprias vão juntas num
+    freebusy.
+    """
+    geral = settings.GOOGLE_CALENDAR_ID
+    proprias = [cal for cal in calendar_ids if cal != geral]
+    resultado = client.freebusy(proprias, inicio, fim) if proprias else {}
+    if geral in calendar_ids:
+        resultado[geral] = client.eventos_externos(geral, inicio, fim)
+    return resultado
+
+
+def ocupacao_google(recursos, d, client=None):
+    """
+    Blocos ocupados no Google Calendar de cada recurso no dia, em minutos
+    ({resource_id: [(inicio, fim)]}). As agendas que não estão no cache
+    são consultadas juntas (ver _ocupados) para o dia todo; o resultado
+    fica em cache por GOOGLE_FREEBUSY_CACHE_TIMEOUT segundos.
+    """
+    client = client or get_client()
+    if client is None:
+        return {r.pk: [] for r in recursos}
+
+    agendas = {r.pk: calendario_do_recurso(r) for r in recursos}
+    blocos = cache_disponibilidade.ler_ocupacao_google(set(agendas.values()), d)
+    faltando = set(agendas.values()) - set(blocos)
+    if faltando:
+        inicio = datetime.datetime.combine(d, datetime.time.min)
+        fim = inicio + datetime.timedelta(days=1)
+        novos = {}
+        for cal, ocupados in _ocupados(client, faltando, inicio, fim).items():
+            novos[cal] = [_minutos_no_dia(a, b, d) for a, b in ocupados]
+        # agenda sem resposta (ex.: sem permissão) conta como livre
+        novos.update({cal: [] for cal in faltando if cal not in novos})
+        cache_disponibilidade.gravar_ocupacao_google(novos, d)
+        blocos.update(novos)
+    return {rid: blocos[cal] for rid, cal in agendas.items()}
 
-    time_min = start_dt.isoformat()
-    time_max = end_dt.isoformat()
 
-    events_result = service.events().list(
-        calendarId=settings.GOOGLE_CALENDAR_ID,
-        timeMin=time_min,
-        timeMax=time_max,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
+def ocupacao_google_periodo(resource, datas, client=None):
+    """
+    Blocos ocupados da agenda do recurso em cada uma das datas, em minutos
+    ({data: [(inicio, fim)]}), com uma única consulta do primeiro ao último
+    dia (reservas recorrentes; não passa pelo cache por dia).
+    """
+    client = client or get_client()
+    if client is None or not datas:
+        return {d: [] for d in datas}
+    agenda = calendario_do_recurso(resource)
+    inicio = datetime.datetime.combine(min(datas), datetime.time.min)
+    fim = datetime.datetime.combine(max(datas), datetime.time.min) + datetime.timedelta(days=1)
+    ocupados = _ocupados(client, [agenda], inicio, fim).get(agenda, [])
+    return {
+        d: [_minutos_no_dia(a, b, d) for a, b in ocupados if a.date() <= d <= b.date()]
+        for d in datas
+    }
+
 
-    events = events_result.get('items', [])
-    return len(events) == 0
+def _minutos_no_dia(inicio, fim, d):
+    """Bloco (datetimes com fuso) recortado ao dia d, em minutos desde a meia-noite."""
+    comeco = datetime.datetime.combine(d, datetime.time.min, tzinfo=inicio.tzinfo)
+    ini = max(0, int((inicio - comeco).total_seconds() // 60))
+    fi = min(24 * 60, int(-(-(fim - comeco).total_seconds() // 60)))
+    return (ini, fi)
+
+
+def verificar_disponibilidade(start_dt, end_dt):
+    client = get_client()
+    if client is None:
+        return True
+    return client.verificar_disponibilidade(start_dt, end_dt)
 
 
 def criar_evento(summary, start_dt, end_dt, description=""):
-    service = _get_service()
-    if service is None:
+    client = get_client()
+    if client is None:
         return "dummy_event_id"
+    return client.criar_evento(summary, start_dt, end_dt, description)
 
-    # converter para RFC3339 com timezone
-    tzinfo = tz.gettz("America/Sao_Paulo")
-    if start_dt.tzinfo is None:
-        start_dt = start_dt.replace(tzinfo=tzinfo)
-    if end_dt.tzinfo is None:
-        end_dt = end_dt.replace(tzinfo=tzinfo)
-
-    event = {
-        'summary': summary,
-        'description': description,
-        'start': {'dateTime': start_dt.isoformat(), 'timeZone': 'America/Sao_Paulo'},
-        'end': {'dateTime': end_dt.isoformat(), 'timeZone': 'America/Sao_Paulo'},
-        'reminders': {'useDefault': True},
-    }
 
-    created = service.events().insert(calendarId=settings.GOOGLE_CALENDAR_ID, body=event).execute()
-    return created.get('id')
+# =======================================================
+#  Sincronização das reservas com o Google Calendar
+# =======================================================
+
+def id_do_evento(booking):
+    """
+    Id determinístico do evento da reserva: se a inserção for repetida
+    (ex.: o worker caiu antes de gravar o id), a API responde 409 em vez
+    de criar um evento duplicado.
+    """
+    return f"{PREFIXO_EVENTO}{booking.pk}"
+
+
+def evento_da_reserva(client, booking):
+    inicio = datetime.datetime.combine(booking.date, booking.start_time)
+    fim = datetime.datetime.combine(booking.date, booking.end_time)
+    if fim <= inicio:  # passa da meia-noite
+        fim += datetime.timedelta(days=1)
+    cliente = booking.customer.name or booking.customer.phone
+    return client.evento(
+        f"{booking.resource.name} — {cliente}", inicio, fim,
+        description=f"Reserva #{booking.pk} ({booking.customer.phone})",
+        event_id=id_do_evento(booking),
+    )
+
+
+def _na_vez():
+    # reservas que falharam esperam o backoff: uma que falha sempre não
+    # fica na frente da janela [:limite] a cada ciclo
+    return Q(google_sync_retry_at__isnull=True) | Q(google_sync_retry_at__lte=timezone.now())
+
+
+def reservas_para_inserir(limite):
+    """Reservas confirmadas, de hoje em diante, ainda sem evento (fora do backoff)."""
+    return list(
+        Booking.objects.filter(
+            _na_vez(), status="confirmed", google_event_id__isnull=True, date__gte=timezone.localdate())
+        .select_related("customer", "resource")
+        .order_by("date", "start_time", "id")[:limite]
+    )
+
+
+def reservas_para_cancelar(limite):
+    """Reservas que deixaram de estar confirmadas mas ainda têm evento (fora do backoff)."""
+    return list(
+        Booking.objects.filter(_na_vez(), ~Q(status="confirmed"), google_event_id__isnull=False)
+        .exclude(google_event_id="")
+        .select_related("resource")
+        .order_by("id")[:limite]
+    )
+
+
+def _registrar_falha(booking, erro):
+    """Conta a falha na reserva e a tira da fila até o fim do backoff."""
+    tentativas = booking.google_sync_attempts + 1
+    espera = calcular_backoff(tentativas, settings.GOOGLE_SYNC_BACKOFF_BASE, settings.GOOGLE_SYNC_BACKOFF_MAX)
+    Booking.objects.filter(pk=booking.pk).update(
+        google_sync_attempts=F("google_sync_attempts") + 1,
+        google_sync_retry_at=timezone.now() + espera,
+        google_sync_error=str(erro)[:1000],
+    )
+
+
+SINCRONIZADA = {"google_sync_attempts": 0, "google_sync_retry_at": None, "google_sync_error": ""}
+
+
+def sincronizar_reservas(client=None, limite=200):
+    """
+    Um ciclo da fila de sincronização: cria em lote os eventos das reservas
+    confirmadas sem google_event_id e remove em lote os eventos das
+    reservas canceladas. O estado da fila é o próprio Booking, então um
+    ciclo interrompido é retomado no seguinte; a reserva que falha guarda
+    o erro e volta à fila depois do backoff (GOOGLE_SYNC_BACKOFF_*).
+    Retorna (inseridos, cancelados, falhas).
+    """
+    client = client or get_client()
+    if client is None:
+        return 0, 0, 0
+
+    inseridos = cancelados = falhas = 0
+
+    novas = reservas_para_inserir(limite)
+    if novas:
+        eventos = [(calendario_do_recurso(b.resource), evento_da_reserva(client, b)) for b in novas]
+        for booking, resultado in zip(novas, client.inserir_eventos(eventos)):
+            if isinstance(resultado, Exception):
+                _registrar_falha(booking, resultado)
+                falhas += 1
+                continue
+            # não sobrescreve se a reserva mudou enquanto o lote rodava
+            Booking.objects.filter(pk=booking.pk, google_event_id__isnull=True).update(
+                google_event_id=resultado, **SINCRONIZADA)
+            cache_disponibilidade.invalidar_ocupacao_google(calendario_do_recurso(booking.resource), booking.date)
+            inseridos += 1
+
+    canceladas = reservas_para_cancelar(limite)
+    if canceladas:
+        itens = [(calendario_do_recurso(b.resource), b.google_event_id) for b in canceladas]
+        for booking, resultado in zip(canceladas, client.cancelar_eventos(itens)):
+            if isinstance(resultado, Exception):
+                _registrar_falha(booking, resultado)
+                falhas += 1
+                continue
+            Booking.objects.filter(pk=booking.pk, google_event_id=booking.google_event_id).update(
+                google_event_id=None, **SINCRONIZADA)
+            cache_disponibilidade.invalidar_ocupacao_google(calendario_do_recurso(booking.resource), booking.date)
+            cancelados += 1
+
+    return inseridos, cancelados, falhas
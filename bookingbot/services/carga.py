@@ -0,0 +1,254 @@
+"""
+Peças do teste de carga do webhook (comandos loadtest_webhook,
+loadtest_release e gateway_falso):
+
+- gerar_mensagens: mensagens realistas de reserva, cancelamento, consulta de
+  horários e saudação, de muitos telefones e para várias salas;
+- GatewayFalso: gateway de WhatsApp local com latência e taxa de erro
+  configuráveis, para o envio (outbox) fazer parte do teste;
+- disparar/resumir: POSTs concorrentes (httpx) e req/s, p50/p95/p99 e erros.
+"""
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# DDD 00 não existe: os clientes do teste não colidem com clientes reais
+PREFIXO_TELEFONE = "+55009"
+
+# Nomes como o cliente escreve (reconhecidos pelo nlp_v2 / índice de recursos)
+SALAS = ("Sala A", "Sala B", "Estudio Grande", "Estudio Pequeno")
+# Recursos cadastrados no banco do teste (preparar_banco)
+RECURSOS = (("Sala A", "sala-a"), ("Sala B", "sala-b"),
+            ("Estúdio Grande", "estudio-grande"), ("Estúdio Pequeno", "estudio-pequeno"))
+DIAS_SEMANA = ("segunda", "terça", "quarta", "quinta", "sexta", "sábado")
+
+MODELOS = {
+    "reservar": (
+        "Quero reservar {sala} {quando} às {h}h",
+        "Oi! Dá pra agendar {sala} {quando} das {h}h às {h2}h?",
+        "marcar {sala} {quando} às {h}:00 por 2 horas",
+        "Boa tarde, gostaria de reservar {quando} às {h}h na {sala}",
+    ),
+    "cancelar": (
+        "Preciso cancelar a reserva de {quando} às {h}h",
+        "cancelar {quando} às {h}h, por favor",
+        "Oi, vou ter que cancelar {quando} {h}h",
+    ),
+    "disponibilidade": (
+        "Quais os horários disponíveis {quando}?",
+        "Queria ver se tem horário livre {quando} à tarde na {sala}",
+        "consultar {sala} {quando} entre {h}h e {h2}h",
+    ),
+    "saudacao": (
+        "oi",
+        "bom dia",
+        "olá",
+        "oi, tudo bem?",
+    ),
+}
+
+# Mistura padrão: mais consultas e reservas que cancelamentos
+PESOS = {"reservar": 40, "disponibilidade": 35, "cancelar": 15, "saudacao": 10}
+
+# Intenção do nlp_v2 esperada para cada tipo de mensagem
+INTENCOES = {
+    "reservar": "criar_reserva",
+    "cancelar": "cancelar_reserva",
+    "disponibilidade": "listar_disponibilidade",
+}
+
+
+def _quando(rng, hoje):
+    escolha = rng.randrange(5)
+    if escolha == 0:
+        return "hoje"
+    if escolha == 1:
+        return "amanhã"
+    if escolha == 2:
+        return f"na próxima {rng.choice(DIAS_SEMANA)}"
+    dia = hoje + timedelta(days=rng.randint(1, 60))
+    return f"dia {dia:%d/%m/%Y}"
+
+
+def gerar_mensagens(n, telefones=500, salas=SALAS, pesos=None, seed=42, hoje=None):
+    """
+    Lista de n payloads do webhook ({"id", "from", "body"}) e, em paralelo,
+    o tipo de cada mensagem. Determinística para o mesmo seed.
+    """
+    rng = random.Random(seed)
+    hoje = hoje or date.today()
+    pesos = pesos or PESOS
+    tipos = rng.choices(list(pesos), weights=list(pesos.values()), k=n)
+    payloads = []
+    for i, tipo in enumerate(tipos):
+        h = rng.randint(8, 19)
+        texto = rng.choice(MODELOS[tipo]).format(
+            sala=rng.choice(salas), quando=_quando(rng, hoje), h=h, h2=min(h + rng.randint(1, 3), 22))
+        payloads.append({
+            "id": f"carga-{seed}-{i}",
+            "from": f"{PREFIXO_TELEFONE}{rng.randrange(telefones):08d}",
+            "body": texto,
+        })
+    return payloads, tipos
+
+
+def preparar_banco():
+    """Cadastra os recursos do teste e apaga clientes, reservas, outbox e ids de uma rodada anterior."""
+    from bookingbot.models import Customer, OutboundMessage, ProcessedMessage, Resource
+
+    for nome, slug in RECURSOS:
+        Resource.objects.get_or_create(slug=slug, defaults={"name": nome})
+    Customer.objects.filter(phone__startswith=PREFIXO_TELEFONE).delete()  # reservas em cascata
+    OutboundMessage.objects.filter(phone__startswith=PREFIXO_TELEFONE).delete()
+    ProcessedMessage.objects.filter(message_id__startswith="carga-").delete()
+
+
+def estado_outbox():
+    """Mensagens do teste no outbox, por status."""
+    from django.db.models import Count
+
+    from bookingbot.models import OutboundMessage
+
+    linhas = (OutboundMessage.objects.filter(phone__startswith=PREFIXO_TELEFONE)
+              .values("status").annotate(n=Count("id")))
+    return {linha["status"]: linha["n"] for linha in linhas}
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        gateway = self.server.gateway
+        falhou = gateway.atender(corpo)
+        if falhou:
+            dados, status = {"error": "falha simulada"}, 503
+        elif "messages" in corpo:
+            dados, status = [{"ok": True} for _ in corpo["messages"]], 200
+        else:
+            dados, status = {"ok": True}, 200
+        resposta = json.dumps(dados).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, *args):
+        pass
+
+
+class GatewayFalso:
+    """
+    Gateway de WhatsApp local: aceita o payload de WhatsAppGateway (envio
+    simples e em lote), responde depois de `latencia_ms` ± `variacao_ms` e
+    falha com 503 numa fração `taxa_erro` das chamadas.
+    """
+
+    def __init__(self, latencia_ms=0, variacao_ms=0, taxa_erro=0.0, host="127.0.0.1", porta=0, seed=None):
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        self.taxa_erro = taxa_erro
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chamadas = self.erros = self.mensagens = 0
+        self.servidor = ThreadingHTTPServer((host, porta), _GatewayHandler)
+        self.servidor.daemon_threads = True
+        self.servidor.gateway = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, porta = self.servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def atender(self, corpo):
+        """Conta a chamada, espera a latência sorteada e diz se ela falha."""
+        with self._lock:
+            espera = max(0.0, self.latencia_ms + self._rng.uniform(-self.variacao_ms, self.variacao_ms)) / 1000
+            falhou = self._rng.random() < self.taxa_erro
+            self.chamadas += 1
+            if falhou:
+                self.erros += 1
+            else:
+                self.mensagens += len(corpo.get("messages", ())) or 1
+        time.sleep(espera)
+        return falhou
+
+    def snapshot(self):
+        with self._lock:
+            return {"chamadas": self.chamadas, "erros": self.erros, "mensagens": self.mensagens}
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+async def disparar(url, payloads, concorrencia=100, timeout=30):
+    """POSTs de `payloads` com `concorrencia` conexões. Retorna (latências ms, status, duração s)."""
+    import httpx
+
+    limites = httpx.Limits(max_connections=concorrencia)
+    fila = asyncio.Queue()
+    for p in payloads:
+        fila.put_nowait(p)
+
+    latencias = []
+    status = Counter()
+
+    async def trabalhador(client):
+        while not fila.empty():
+            payload = fila.get_nowait()
+            inicio = time.perf_counter()
+            try:
+                resp = await client.post(url, json=payload)
+                status[resp.status_code] += 1
+            except httpx.HTTPError as e:
+                status[type(e).__name__] += 1
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    async with httpx.AsyncClient(limits=limites, timeout=timeout) as client:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador(client) for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+    return latencias, status, duracao
+
+
+def resumir(latencias, status, duracao):
+    """req/s, taxa de erro (status >= 400 ou exceção) e p50/p95/p99 da latência."""
+    total = len(latencias)
+    erros = sum(n for s, n in status.items() if not (isinstance(s, int) and s < 400))
+    if total > 1:
+        pontos = statistics.quantiles(latencias, n=100, method="inclusive")
+        p50, p95, p99 = pontos[49], pontos[94], pontos[98]
+    else:
+        p50 = p95 = p99 = latencias[0] if latencias else 0.0
+    return {
+        "requisicoes": total,
+        "duracao_s": round(duracao, 3),
+        "req_s": round(total / duracao, 1) if duracao else 0.0,
+        "erros": erros,
+        "taxa_erro": round(erros / total, 4) if total else 0.0,
+        "status": {str(s): n for s, n in sorted(status.items(), key=lambda kv: str(kv[0]))},
+        "latencia_ms": {
+            "p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1),
+            "max": round(max(latencias), 1) if latencias else 0.0,
+        },
+    }
@@ -0,0 +1,139 @@
+"""
+Cliente do remetente do webhook.
+
+O telefone é normalizado uma vez na entrada (E.164, ex.: +5511999990001) e
+resolvido para o id do Customer por um LRU em processo, opcionalmente
+apoiado no cache do Django (CUSTOMER_CACHE) para ser compartilhado entre
+workers. Só o primeiro contato vai ao banco: um upsert
+(INSERT ... ON CONFLICT DO NOTHING RETURNING) cria o cliente numa única
+consulta; se ele já existia, um SELECT busca o id.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Customer
+from .memo import CacheMemo
+from .metricas import etapa
+
+
+cache = CacheMemo(
+    "clientes",
+    tamanho=getattr(settings, "CUSTOMER_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "CUSTOMER_CACHE_TTL", 3600),
+)
+
+PREFIXO = "cliente"
+_NAO_DIGITOS = re.compile(r"\D")
+
+
+def normalizar_telefone(bruto, ddi=None):
+    """
+    Telefone em E.164 ("+" e 8 a 15 dígitos), ou None se não parecer um
+    número. Aceita o formato dos gateways ("5511...@c.us",
+    "5511...:3@s.whatsapp.net"), máscaras ("(11) 99999-0001"), prefixo
+    internacional "00" e números nacionais (10-11 dígitos, com ou sem o 0
+    de tronco), que ganham o DDI padrão (PHONE_DEFAULT_COUNTRY_CODE).
+    """
+    if bruto is None:
+        return None
+    texto = str(bruto).strip().split("@", 1)[0].split(":", 1)[0]
+    internacional = texto.startswith("+")
+    digitos = _NAO_DIGITOS.sub("", texto)
+    if not internacional and digitos.startswith("00"):
+        digitos, internacional = digitos[2:], True
+    if not internacional:
+        ddi = getattr(settings, "PHONE_DEFAULT_COUNTRY_CODE", "55") if ddi is None else ddi
+        nacional = digitos.lstrip("0")
+        if ddi and (digitos.startswith("0") or len(digitos) in (10, 11)):
+            digitos = ddi + nacional
+    if not 8 <= len(digitos) <= 15 or digitos.startswith("0"):
+        return None
+    return "+" + digitos
+
+
+def _cache_compartilhado():
+    alias = getattr(settings, "CUSTOMER_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def _chave(telefone):
+    return f"{PREFIXO}:{telefone}"
+
+
+def _instancia(pk, telefone):
+    # só o id é usado nas FKs; os outros campos são carregados se acessados
+    return Customer.from_db(connection.alias, ["id", "phone"], [pk, telefone])
+
+
+def _guardar(telefone, pk):
+    # depois do commit: um rollback não deixa no cache o id de um cliente
+    # que não existe
+    def aplicar():
+        cache.guardar(telefone, pk)
+        compartilhado = _cache_compartilhado()
+        if compartilhado is not None:
+            compartilhado.set(_chave(telefone), pk, cache.ttl)
+    transaction.on_commit(aplicar)
+
+
+def _suporta_upsert():
+    if connection.vendor == "postgresql":
+        return True
+    # RETURNING no SQLite a partir da 3.35
+    return connection.vendor == "sqlite" and connection.Database.sqlite_version_info >= (3, 35)
+
+
+def _upsert(telefone):
+    """Id do cliente: INSERT ... ON CONFLICT DO NOTHING RETURNING, ou SELECT se já existia."""
+    if not _suporta_upsert():
+        return Customer.objects.get_or_create(phone=telefone)[0].pk
+
+    opts = Customer._meta
+    q = connection.ops.quote_name
+    colunas = [opts.get_field(nome).column for nome in ("name", "phone", "created_at")]
+    criado_em = opts.get_field("created_at").get_db_prep_value(timezone.now(), connection)
+    sql = (
+        f"INSERT INTO {q(opts.db_table)} ({', '.join(q(c) for c in colunas)}) VALUES (%s, %s, %s) "
+        f"ON CONFLICT ({q(colunas[1])}) DO NOTHING RETURNING {q(opts.pk.column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ["", telefone, criado_em])
+        linha = cursor.fetchone()
+    if linha is not None:
+        return linha[0]
+    return Customer.objects.filter(phone=telefone).values_list("pk", flat=True).get()
+
+
+def _resolver(telefone):
+    """Id do cliente fora do LRU: cache compartilhado ou banco."""
+    compartilhado = _cache_compartilhado()
+    pk = compartilhado.get(_chave(telefone)) if compartilhado is not None else None
+    if pk is not None:
+        cache.guardar(telefone, pk)
+        return pk
+    pk = _upsert(telefone)
+    _guardar(telefone, pk)
+    return pk
+
+
+@etapa("cliente")
+def obter_cliente(telefone):
+    """Customer do telefone (já normalizado), criado no primeiro contato."""
+    pk = cache.buscar(telefone, None)
+    if pk is None:
+        pk = _resolver(telefone)
+    return _instancia(pk, telefone)
+
+
+def esquecer(pk, *telefones):
+    """Tira o cliente do cache (telefone alterado ou cliente apagado)."""
+    cache.remover_valor(pk)
+    compartilhado = _cache_compartilhado()
+    for telefone in set(telefones) - {None}:
+        cache.remover(telefone)
+        if compartilhado is not None:
+            compartilhado.delete(_chave(telefone))
@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import ProcessedMessage
+
+
+# Onde cada gateway manda o id da mensagem (WPPConnect, WaSender, Baileys...)
+CAMPOS_ID = ("message_id", "messageId", "id")
+
+
+def extrair_message_id(data):
+    """Id da mensagem no payload do webhook, ou None se o gateway não mandar."""
+    for campo in CAMPOS_ID:
+        valor = data.get(campo)
+        if valor:
+            return str(valor)[:128]
+    # formato Baileys: {"key": {"id": "..."}}
+    chave = data.get("key")
+    if isinstance(chave, dict) and chave.get("id"):
+        return str(chave["id"])[:128]
+    return None
+
+
+class _LRU:
+    """Conjunto limitado com descarte do menos recente (thread-safe)."""
+
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, chave):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return True
+            return False
+
+    def adicionar(self, chave):
+        with self._lock:
+            self._itens[chave] = None
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+vistos = _LRU(getattr(settings, "WEBHOOK_DEDUPE_CACHE_SIZE", 10000))
+
+
+def _gravar(message_id):
+    try:
+        # savepoint: a violação da chave única não aborta uma transação externa
+        with transaction.atomic():
+            ProcessedMessage.objects.create(message_id=message_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def registrar_mensagem(message_id):
+    """
+    Marca a mensagem como processada. Retorna False se ela já tinha sido
+    vista (retentativa do gateway): primeiro no cache do processo, depois
+    pela chave única da tabela, que vale entre workers.
+    """
+    if message_id in vistos:
+        return False
+    novo = _gravar(message_id)
+    vistos.adicionar(message_id)
+    return novo
+
+
+def esquecer_mensagem(message_id):
+    """
+    Desfaz o registro quando o processamento falhou, para que a próxima
+    retentativa do gateway seja processada.
+    """
+    vistos.remover(message_id)
+    ProcessedMessage.objects.filter(message_id=message_id).delete()
+
+
+def limpar_mensagens_antigas(ttl=None):
+    """Apaga os ids mais antigos que o TTL. Retorna quantos foram apagados."""
+    ttl = ttl if ttl is not None else getattr(settings, "WEBHOOK_DEDUPE_TTL", 172800)
+    limite = timezone.now() - timedelta(seconds=ttl)
+    apagados, _ = ProcessedMessage.objects.filter(created_at__lt=limite).delete()
+    return apagados
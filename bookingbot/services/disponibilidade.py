@@ -0,0 +1,433 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.dateparse import parse_time
+
+from ..models import Booking
+from . import cache_disponibilidade, respostas
+from .metricas import etapa
+
+
+SLOT_MINUTOS = 15
+FIM_DO_DIA = 24 * 60
+
+
+def _minutos(t):
+    return t.hour * 60 + t.minute
+
+
+def _hora(m):
+    return "24:00" if m >= FIM_DO_DIA else f"{m // 60:02d}:{m % 60:02d}"
+
+
+def _slot_acima(m):
+    return -(-m // SLOT_MINUTOS) * SLOT_MINUTOS
+
+
+def _trechos(booking_date, inicio, fim, d):
+    """
+    Trecho (em minutos) que a reserva ocupa no dia d. Reservas que passam
+    da meia-noite (fim <= início) ocupam o resto do dia e o começo do
+    seguinte.
+    """
+    ini, fi = _minutos(inicio), _minutos(fim)
+    vira = fi <= ini
+    if booking_date == d:
+        return (ini, FIM_DO_DIA if vira else fi)
+    if vira and booking_date == d - timedelta(days=1) and fi > 0:
+        return (0, fi)
+    return None
+
+
+def intervalos_no_banco(resource_ids, d):
+    """
+    Intervalos ocupados de cada recurso no dia lidos direto do banco
+    ({resource_id: [(inicio, fim, booking_id)]}), numa consulta.
+    """
+    intervalos = {rid: [] for rid in resource_ids}
+    reservas = Booking.objects.filter(
+        Q(date=d) | Q(date=d - timedelta(days=1), end_time__lte=F("start_time")),
+        resource_id__in=list(intervalos),
+        status="confirmed",
+    ).values_list("pk", "resource_id", "date", "start_time", "end_time")
+    for pk, resource_id, booking_date, inicio, fim in reservas:
+        trecho = _trechos(booking_date, inicio, fim, d)
+        if trecho:
+            intervalos[resource_id].append((*trecho, pk))
+    return intervalos
+
+
+class AgendaDia:
+    """
+    Intervalos ocupados de um recurso num dia, ordenados pelo início, em
+    minutos desde a meia-noite. `maior_fim[i]` é o maior fim entre os i+1
+    primeiros intervalos (não decrescente), o que permite achar por busca
+    binária o primeiro intervalo que alcança um horário mesmo que existam
+    reservas sobrepostas (cadastradas pelo admin ou pela API).
+    """
+
+    def __init__(self, abertura, fechamento, expira_em):
+        self.abertura = abertura
+        self.fechamento = fechamento
+        self.expira_em = expira_em
+        self.intervalos = []  # (inicio, fim, booking_id)
+        self.maior_fim = []
+
+    def _reindexar(self):
+        maior = 0
+        self.maior_fim = []
+        for _, fim, _ in self.intervalos:
+            maior = max(maior, fim)
+            self.maior_fim.append(maior)
+
+    def ocupar(self, inicio, fim, booking_id):
+        self.liberar(booking_id, reindexar=False)
+        insort(self.intervalos, (inicio, fim, booking_id))
+        self._reindexar()
+
+    def liberar(self, booking_id, reindexar=True):
+        antes = len(self.intervalos)
+        self.intervalos = [i for i in self.intervalos if i[2] != booking_id]
+        if reindexar and len(self.intervalos) != antes:
+            self._reindexar()
+
+    def ocupados(self):
+        return [(ini, fim) for ini, fim, _ in self.intervalos]
+
+    def _lacunas(self, inicio, fim):
+        """Intervalos livres dentro de [inicio, fim), em ordem."""
+        # primeiro intervalo que termina depois de `inicio` (O(log n))
+        i = bisect_right(self.maior_fim, inicio)
+        cursor = inicio
+        # intervalos que começam antes de `fim`
+        ultimo = bisect_left(self.intervalos, (fim,))
+        for ini, fi, _ in self.intervalos[i:ultimo]:
+            if ini > cursor:
+                yield (cursor, ini)
+            cursor = max(cursor, fi)
+            if cursor >= fim:
+                return
+        if cursor < fim:
+            yield (cursor, fim)
+
+    def livres(self, inicio=None, fim=None):
+        inicio = self.abertura if inicio is None else max(inicio, self.abertura)
+        fim = self.fechamento if fim is None else min(fim, self.fechamento)
+        if inicio >= fim:
+            return []
+        return list(self._lacunas(inicio, fim))
+
+    def proximo_livre(self, duracao, a_partir=None):
+        """
+        Início (alinhado em SLOT_MINUTOS) do primeiro trecho livre com
+        `duracao` minutos a partir de `a_partir`, ou None. A busca do ponto
+        de partida é O(log n); depois percorre só as lacunas seguintes.
+        """
+        inicio = self.abertura if a_partir is None else max(a_partir, self.abertura)
+        for ini, fim in self._lacunas(_slot_acima(inicio), self.fechamento):
+            ini = _slot_acima(ini)
+            if ini + duracao <= fim:
+                return ini
+        return None
+
+
+class MotorDisponibilidade:
+    """
+    Agendas por (recurso, dia) em memória, montadas na primeira pergunta
+    sobre o dia (do cache compartilhado ou com uma consulta ao banco) e
+    depois atualizadas incrementalmente
+    pelos sinais de Booking (ver bookingbot/signals.py). Como nos demais
+    caches em processo, cada agenda expira após AVAILABILITY_TTL segundos
+    para enxergar reservas gravadas por outros workers.
+    """
+
+    def __init__(self, max_agendas=4096):
+        self.max_agendas = max_agendas
+        self._lock = threading.Lock()
+        self._agendas = OrderedDict()  # (resource_id, date) -> AgendaDia
+        self._onde = {}  # booking_id -> chaves das agendas que o contêm
+        self._geracao = 0
+
+    def _ttl(self):
+        return getattr(settings, "AVAILABILITY_TTL", 300)
+
+    def _carregar(self, recursos, d):
+        """
+        Monta as agendas a partir do cache compartilhado (Django cache) e
+        consulta o banco só para os recursos que faltarem lá.
+        """
+        expira_em = time.monotonic() + self._ttl()
+        agendas = {
+            r.pk: AgendaDia(_minutos(r.opens_at), _minutos(r.closes_at), expira_em)
+            for r in recursos
+        }
+        intervalos = cache_disponibilidade.ler_agendas(list(agendas), d)
+        faltando = [rid for rid in agendas if rid not in intervalos]
+        if faltando:
+            novos = intervalos_no_banco(faltando, d)
+            cache_disponibilidade.gravar_agendas(novos, d)
+            intervalos.update(novos)
+
+        for rid, agenda in agendas.items():
+            agenda.intervalos = sorted(intervalos[rid])
+            agenda._reindexar()
+        return agendas
+
+    def agendas(self, recursos, d, recarregar=False):
+        """
+        Agenda de cada recurso no dia ({resource_id: AgendaDia}); uma consulta
+        para os que faltam. `recarregar` ignora as cópias em memória e lê de
+        novo do cache compartilhado/banco.
+        """
+        agora = time.monotonic()
+        resultado, faltando = {}, []
+        with self._lock:
+            for r in recursos:
+                agenda = None if recarregar else self._agendas.get((r.pk, d))
+                if agenda is not None and agenda.expira_em > agora:
+                    self._agendas.move_to_end((r.pk, d))
+                    resultado[r.pk] = agenda
+                else:
+                    faltando.append(r)
+            geracao = self._geracao
+        if not faltando:
+            return resultado
+
+        novas = self._carregar(faltando, d)
+        resultado.update(novas)
+        with self._lock:
+            # uma reserva registrada durante a carga torna estas agendas velhas
+            if geracao == self._geracao:
+                for resource_id, agenda in novas.items():
+                    self._agendas[(resource_id, d)] = agenda
+                    for _, _, booking_id in agenda.intervalos:
+                        self._onde.setdefault(booking_id, set()).add((resource_id, d))
+                while len(self._agendas) > self.max_agendas:
+                    chave, velha = self._agendas.popitem(last=False)
+                    for _, _, booking_id in velha.intervalos:
+                        self._onde.get(booking_id, set()).discard(chave)
+        return resultado
+
+    def agenda(self, resource, d):
+        return self.agendas([resource], d)[resource.pk]
+
+    def livres(self, resource, d, inicio=None, fim=None):
+        """Trechos livres [("HH:MM", "HH:MM")] do recurso no dia, dentro do horário de funcionamento."""
+        ini = None if inicio is None else _minutos(inicio)
+        fi = None if fim is None else _minutos(fim)
+        return [(_hora(a), _hora(b)) for a, b in self.agenda(resource, d).livres(ini, fi)]
+
+    def proximo_livre(self, resource, d, duracao, a_partir=None):
+        """Primeiro início livre para `duracao` minutos ("HH:MM"), ou None."""
+        ini = None if a_partir is None else _minutos(a_partir)
+        inicio = self.agenda(resource, d).proximo_livre(duracao, ini)
+        return None if inicio is None else _hora(inicio)
+
+    def _tirar(self, booking_id):
+        for chave in self._onde.pop(booking_id, ()):
+            agenda = self._agendas.get(chave)
+            if agenda is not None:
+                agenda.liberar(booking_id)
+
+    def registrar(self, booking):
+        """Aplica a reserva criada/alterada/cancelada às agendas já carregadas."""
+        with self._lock:
+            self._geracao += 1
+            self._tirar(booking.pk)
+            if booking.status != "confirmed":
+                return
+            for d in (booking.date, booking.date + timedelta(days=1)):
+                chave = (booking.resource_id, d)
+                agenda = self._agendas.get(chave)
+                trecho = _trechos(booking.date, booking.start_time, booking.end_time, d)
+                if agenda is not None and trecho:
+                    agenda.ocupar(*trecho, booking.pk)
+                    self._onde.setdefault(booking.pk, set()).add(chave)
+
+    def remover(self, booking_id):
+        with self._lock:
+            self._geracao += 1
+            self._tirar(booking_id)
+
+    def invalidar(self, resource_id=None):
+        with self._lock:
+            self._geracao += 1
+            if resource_id is None:
+                self._agendas.clear()
+                self._onde.clear()
+            else:
+                for chave in [c for c in self._agendas if c[0] == resource_id]:
+                    del self._agendas[chave]
+
+
+motor = MotorDisponibilidade()
+
+
+def janela_da_pergunta(horarios):
+    """Janela (inicio, fim) citada na pergunta ("entre 14h e 18h"); (None, None) se não houver."""
+    horarios = [parse_time(h) for h in (horarios or [])[:2]]
+    horarios = [h for h in horarios if h is not None]
+    if len(horarios) == 2 and horarios[0] < horarios[1]:
+        return horarios[0], horarios[1]
+    if horarios:
+        return horarios[0], None
+    return None, None
+
+
+@etapa("disponibilidade")
+def consultar_disponibilidade(d, recursos, inicio=None, fim=None, so_livres=False):
+    """
+    Resposta da pergunta de disponibilidade a partir das agendas em memória.
+    Sem janela e sem recurso citado lista os horários ocupados (resposta
+    original do bot); com janela ou `so_livres` lista os trechos livres.
+    As perguntas sem janela ("horários disponíveis amanhã") têm a resposta
+    pronta guardada no cache por (dia, recurso).
+    Retorna (mensagem, payload do JSON da view).
+    """
+    recursos = sorted(recursos, key=lambda r: r.name)
+    escopo = None
+    if inicio is None and fim is None:
+        if not so_livres:
+            escopo = "todas"
+        elif len(recursos) == 1:
+            escopo = recursos[0].pk
+
+    if escopo is not None:
+        guardada = cache_disponibilidade.ler_resposta(d, escopo, recursos)
+        if guardada is not None:
+            return guardada
+        # a resposta vai para o cache compartilhado: não montar de uma cópia
+        # em memória que pode estar atrasada em relação aos outros workers
+        agendas = motor.agendas(recursos, d, recarregar=True)
+    else:
+        agendas = motor.agendas(recursos, d)
+    google = ocupacao_google(recursos, d)
+    agendas = {r.pk: _com_blocos(agendas[r.pk], google.get(r.pk)) for r in recursos}
+
+    if not so_livres and inicio is None and fim is None:
+        ocupados = {}
+        for r in recursos:
+            for ini, fim_ in agendas[r.pk].ocupados():
+                ocupados.setdefault(r.name, []).append(f"{_hora(ini)} - {_hora(fim_)}")
+        msg, slots = respostas.disponibilidade(d, ocupados)
+        payload = {"date": d.strftime("%Y-%m-%d"), "slots": slots}
+    else:
+        ini = None if inicio is None else _minutos(inicio)
+        fi = None if fim is None else _minutos(fim)
+        livres = {
+            r.name: [f"{_hora(a)} - {_hora(b)}" for a, b in agendas[r.pk].livres(ini, fi)]
+            for r in recursos
+        }
+        msg = respostas.horarios_livres(d, livres, inicio, fim)
+        payload = {"date": d.strftime("%Y-%m-%d"), "free": livres}
+
+    if escopo is not None:
+        # com o Google ligado a resposta não pode durar mais que os blocos dele
+        timeout = settings.GOOGLE_FREEBUSY_CACHE_TIMEOUT if settings.USE_GOOGLE_CALENDAR else None
+        cache_disponibilidade.gravar_resposta(d, escopo, recursos, msg, payload, timeout)
+    return msg, payload
+
+
+def _unir(intervalos):
+    unidos = []
+    for ini, fim in sorted(intervalos):
+        if unidos and ini <= unidos[-1][1]:
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], fim))
+        else:
+            unidos.append((ini, fim))
+    return unidos
+
+
+def ocupacao_google(recursos, d):
+    """
+    Blocos ocupados no Google Calendar de cada recurso no dia
+    ({resource_id: [(inicio, fim)]}); vazio com a integração desligada.
+    """
+    if not settings.USE_GOOGLE_CALENDAR:
+        return {}
+    # as bibliotecas do Google só são carregadas com a integração ligada
+    from . import calendar
+
+    return calendar.ocupacao_google(recursos, d)
+
+
+def _com_blocos(agenda, blocos):
+    """
+    Cópia da agenda com os blocos do Google unidos às reservas locais (o
+    evento que o bot sincronizou e a própria reserva viram um trecho só).
+    Sem blocos, a própria agenda.
+    """
+    if not blocos:
+        return agenda
+    copia = AgendaDia(agenda.abertura, agenda.fechamento, agenda.expira_em)
+    copia.intervalos = [(ini, fim, None) for ini, fim in _unir(agenda.ocupados() + list(blocos))]
+    copia._reindexar()
+    return copia
+
+
+def ocupacao_do_dia(recursos, d, do_banco=False):
+    """
+    Intervalos ocupados de cada recurso no dia ({resource_id: [(inicio, fim)]},
+    em minutos): reservas locais das agendas unidas aos blocos do Google
+    Calendar, quando ligado (uma chamada freebusy para todos, em cache).
+    `do_banco` lê as reservas do banco em vez das agendas em memória, que
+    podem estar até AVAILABILITY_TTL segundos atrás dos outros workers.
+    """
+    if do_banco:
+        ocupados = {
+            rid: sorted((ini, fim) for ini, fim, _ in intervalos)
+            for rid, intervalos in intervalos_no_banco([r.pk for r in recursos], d).items()
+        }
+    else:
+        agendas = motor.agendas(recursos, d)
+        ocupados = {r.pk: agendas[r.pk].ocupados() for r in recursos}
+    for resource_id, blocos in ocupacao_google(recursos, d).items():
+        ocupados[resource_id] = _unir(ocupados[resource_id] + blocos)
+    return ocupados
+
+
+@etapa("salas_livres")
+def recursos_livres(recursos, d, inicio, fim):
+    """
+    Recursos sem nada ocupado em [inicio, fim) no dia, na ordem recebida.
+    É o portão da reserva: lê as reservas do banco, não das agendas em
+    memória (essas ficam para as respostas de disponibilidade).
+    """
+    ini, fi = _minutos(inicio), _minutos(fim)
+    if fi <= ini:  # passa da meia-noite
+        fi = FIM_DO_DIA
+    ocupados = ocupacao_do_dia(recursos, d, do_banco=True)
+    return [r for r in recursos if not any(a < fi and b > ini for a, b in ocupados[r.pk])]
+
+
+def datas_ocupadas_no_google(resource, datas, inicio, fim):
+    """
+    Datas em que a agenda do Google Calendar do recurso tem algo em
+    [inicio, fim), com uma chamada freebusy para o período todo.
+    """
+    if not settings.USE_GOOGLE_CALENDAR or not datas:
+        return set()
+    from .calendar import ocupacao_google_periodo
+
+    ini, fi = _minutos(inicio), _minutos(fim)
+    if fi <= ini:
+        fi = FIM_DO_DIA
+    blocos = ocupacao_google_periodo(resource, datas)
+    return {d for d in datas if any(a < fi and b > ini for a, b in blocos[d])}
+
+
+@etapa("sugestao")
+def sugerir_horario(resource, d, duracao, a_partir):
+    """
+    Próximo horário livre do recurso no dia para a mesma duração (ou None),
+    pulando também os blocos ocupados no Google Calendar.
+    """
+    agenda = _com_blocos(motor.agenda(resource, d), ocupacao_google([resource], d).get(resource.pk))
+    inicio = agenda.proximo_livre(duracao, None if a_partir is None else _minutos(a_partir))
+    return None if inicio is None else _hora(inicio)
+
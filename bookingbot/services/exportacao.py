@@ -0,0 +1,81 @@
+import csv
+import json
+
+from django.conf import settings
+from django.utils.dateparse import parse_date
+
+from ..models import Booking
+
+
+# Colunas da exportação: campos simples + nomes das relações (via JOIN,
+# sem instanciar modelos nem consultar cliente/recurso por linha)
+CAMPOS = (
+    ("id", "id"),
+    ("date", "date"),
+    ("start_time", "start_time"),
+    ("end_time", "end_time"),
+    ("status", "status"),
+    ("resource", "resource__name"),
+    ("customer_phone", "customer__phone"),
+    ("customer_name", "customer__name"),
+    ("google_event_id", "google_event_id"),
+    ("created_at", "created_at"),
+)
+
+
+def filtrar_reservas(params, queryset=None):
+    """Filtros opcionais ?status=, ?date_from= e ?date_to= (AAAA-MM-DD)."""
+    queryset = Booking.objects.all() if queryset is None else queryset
+    if params.get("status"):
+        queryset = queryset.filter(status=params["status"])
+    desde = _data(params.get("date_from"))
+    if desde:
+        queryset = queryset.filter(date__gte=desde)
+    ate = _data(params.get("date_to"))
+    if ate:
+        queryset = queryset.filter(date__lte=ate)
+    return queryset
+
+
+def _data(valor):
+    try:
+        return parse_date(valor) if valor else None
+    except ValueError:
+        return None
+
+
+def linhas(queryset, chunk_size=None):
+    """Tuplas na ordem de CAMPOS, lidas do banco em blocos (.iterator)."""
+    chunk_size = chunk_size or getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+    colunas = [coluna for _, coluna in CAMPOS]
+    return queryset.order_by("date", "start_time", "id").values_list(*colunas).iterator(chunk_size=chunk_size)
+
+
+def _texto(valor):
+    return "" if valor is None else valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+def ndjson(queryset, chunk_size=None):
+    nomes = [nome for nome, _ in CAMPOS]
+    for linha in linhas(queryset, chunk_size):
+        yield json.dumps(dict(zip(nomes, map(_texto, linha))), ensure_ascii=False) + "\n"
+
+
+class _Eco:
+    """'Arquivo' do csv.writer que devolve a linha em vez de gravar."""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_(queryset, chunk_size=None):
+    writer = csv.writer(_Eco())
+    yield writer.writerow([nome for nome, _ in CAMPOS])
+    for linha in linhas(queryset, chunk_size):
+        yield writer.writerow([_texto(v) for v in linha])
+
+
+FORMATOS = {
+    "ndjson": (ndjson, "application/x-ndjson"),
+    "csv": (csv_, "text/csv"),
+}
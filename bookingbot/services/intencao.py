@@ -0,0 +1,161 @@
+"""
+Classificação de intenção em camadas:
+
+1. regras: palavras-chave do nlp_v2 como palavras inteiras ("desmarcar"
+   não é "marcar") e algumas regex exatas (saudação, pedido de ajuda)
+   respondem os casos óbvios em microssegundos;
+2. modelo: o classificador treinado (ia/intent_classifier) decide o resto
+   com predict_proba;
+3. esclarecer: se a confiança do modelo fica abaixo de
+   INTENT_CONFIDENCE_THRESHOLD, o bot pergunta em vez de adivinhar. Para
+   as intenções que alteram reservas (ACOES) o limiar é
+   INTENT_ACTION_CONFIDENCE_THRESHOLD, bem mais alto: texto qualquer com
+   data e hora não pode reservar uma sala. O modelo distribuído não chega
+   a esse limiar, então ele só decide intenções de leitura; criar e
+   cancelar ficam com as regras (ou com a confirmação do cliente).
+
+As estatísticas por camada (fração do tráfego e latência) ficam em `stats`.
+"""
+import re
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+
+from .memo import CacheMemo
+from .metricas import etapa
+from .nlp_v2 import INTENT_KEYWORDS
+
+
+Classificacao = namedtuple("Classificacao", "intent camada confianca palpite")
+
+REGRAS = (
+    ("saudacao", re.compile(r"^(oi+|ol[aá]|opa|bom dia|boa tarde|boa noite|e a[ií])[\s!,.?]*$")),
+    ("ajuda", re.compile(r"^(ajuda|menu|help|\?+)[\s!.?]*$")),
+)
+
+# palavras-chave do nlp_v2 (mesma ordem de prioridade), só como palavras inteiras
+PALAVRAS = tuple(
+    (intent, re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, palavras))))
+    for intent, palavras in INTENT_KEYWORDS
+)
+
+# intenções que criam ou cancelam reservas: o modelo só decide com confiança alta
+ACOES = ("criar_reserva", "cancelar_reserva")
+
+# rótulos do modelo (training_data.json) → intenções tratadas pelas views
+INTENCOES_DO_MODELO = {
+    "consultar_disponibilidade": "listar_disponibilidade",
+    "reagendar_reserva": "remarcar_reserva",
+}
+
+CAMADAS = ("regras", "modelo", "esclarecer", "sem_modelo")
+
+# (rótulo, confiança) do modelo por (modelo carregado, texto normalizado);
+# o limiar é aplicado depois, então mudar a configuração vale na hora
+cache_modelo = CacheMemo("intencao")
+
+
+class EstatisticasIntencao:
+    """Mensagens e latência por camada (thread-safe; p95 sobre as últimas amostras)."""
+
+    def __init__(self, amostras=1000):
+        self._lock = threading.Lock()
+        self._amostras = amostras
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.contagem = {}
+            self.total_s = {}
+            self.max_s = {}
+            self.recentes = {}
+
+    def record(self, camada, segundos):
+        with self._lock:
+            self.contagem[camada] = self.contagem.get(camada, 0) + 1
+            self.total_s[camada] = self.total_s.get(camada, 0.0) + segundos
+            self.max_s[camada] = max(self.max_s.get(camada, 0.0), segundos)
+            self.recentes.setdefault(camada, deque(maxlen=self._amostras)).append(segundos)
+
+    def snapshot(self):
+        with self._lock:
+            total = sum(self.contagem.values())
+            resultado = {}
+            for camada in CAMADAS:
+                n = self.contagem.get(camada, 0)
+                if not n:
+                    continue
+                recentes = sorted(self.recentes[camada])
+                resultado[camada] = {
+                    "mensagens": n,
+                    "fracao": n / total,
+                    "media_ms": self.total_s[camada] / n * 1000,
+                    "p95_ms": recentes[min(len(recentes) - 1, int(len(recentes) * 0.95))] * 1000,
+                    "max_ms": self.max_s[camada] * 1000,
+                }
+            return resultado
+
+
+stats = EstatisticasIntencao()
+
+
+def _limiar():
+    return getattr(settings, "INTENT_CONFIDENCE_THRESHOLD", 0.3)
+
+
+def _limiar_acoes():
+    return getattr(settings, "INTENT_ACTION_CONFIDENCE_THRESHOLD", 0.9)
+
+
+def intencao_por_regras(t, dica=None):
+    """
+    Intenção pelas palavras-chave como palavras inteiras, ou "desconhecido".
+    `dica` é a intenção do nlp_v2 (por substring): "desconhecido" dispensa a
+    varredura, já que nenhuma palavra-chave aparece no texto.
+    """
+    if dica != "desconhecido":
+        for intent, regex in PALAVRAS:
+            if regex.search(t):
+                return intent
+    return next((intent for intent, regex in REGRAS if regex.match(t)), "desconhecido")
+
+
+def _registrar(inicio, classificacao):
+    stats.record(classificacao.camada, time.perf_counter() - inicio)
+    return classificacao
+
+
+def _prever(modelo, texto):
+    probabilidades = modelo.predict_proba([texto])[0]
+    melhor = probabilidades.argmax()
+    return str(modelo.classes_[melhor]), float(probabilidades[melhor])
+
+
+@etapa("intencao")
+def classificar(texto, intent_regras=None):
+    """
+    Classificação do texto. `intent_regras` é a intenção já extraída pelo
+    nlp_v2 (por substring); as regras a conferem com palavras inteiras.
+    """
+    inicio = time.perf_counter()
+    t = texto.lower().strip()
+
+    intent_regras = intencao_por_regras(t, intent_regras)
+    if intent_regras != "desconhecido":
+        return _registrar(inicio, Classificacao(intent_regras, "regras", 1.0, None))
+
+    # import tardio: sklearn só é carregado quando alguma mensagem chega aqui
+    from bookingbot.ia.intent_classifier import registry
+
+    assinatura, modelo = registry.get_com_assinatura()
+    if modelo is None:
+        return _registrar(inicio, Classificacao("desconhecido", "sem_modelo", 0.0, None))
+
+    rotulo, confianca = cache_modelo.obter((assinatura, t), lambda: _prever(modelo, texto))
+    intent = INTENCOES_DO_MODELO.get(rotulo, rotulo)
+    limiar = _limiar_acoes() if intent in ACOES else _limiar()
+    if confianca >= limiar:
+        return _registrar(inicio, Classificacao(intent, "modelo", confianca, None))
+    return _registrar(inicio, Classificacao("esclarecer", "esclarecer", confianca, intent))
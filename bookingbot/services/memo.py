@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+_NAO_ACHOU = object()
+
+# todos os caches criados, por nome (para métricas e para desligar no benchmark)
+caches = {}
+
+
+class CacheMemo:
+    """
+    Memoização de resultados de funções puras: LRU limitado a `tamanho`
+    itens, cada um válido por `ttl` segundos, com métricas de acerto,
+    descarte (LRU) e expiração (thread-safe).
+    """
+
+    def __init__(self, nome, tamanho=None, ttl=None, relogio=time.monotonic):
+        self.nome = nome
+        self.tamanho = getattr(settings, "NLP_CACHE_SIZE", 4096) if tamanho is None else tamanho
+        self.ttl = getattr(settings, "NLP_CACHE_TTL", 3600) if ttl is None else ttl
+        self.ativo = True
+        self._relogio = relogio
+        self._itens = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._zerar_metricas()
+        caches[nome] = self
+
+    def _zerar_metricas(self):
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def buscar(self, chave, padrao=_NAO_ACHOU):
+        if not self.ativo or not self.tamanho:
+            return padrao
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                if item[0] > self._relogio():
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return item[1]
+                del self._itens[chave]
+                self.expirations += 1
+            self.misses += 1
+            return padrao
+
+    def guardar(self, chave, valor):
+        if not self.ativo or not self.tamanho:
+            return
+        with self._lock:
+            self._itens[chave] = (self._relogio() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+                self.evictions += 1
+
+    def obter(self, chave, calcular):
+        """Valor em cache ou calcular() (fora do lock; duas threads podem calcular a mesma chave)."""
+        valor = self.buscar(chave)
+        if valor is _NAO_ACHOU:
+            valor = calcular()
+            self.guardar(chave, valor)
+        return valor
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def remover_valor(self, valor):
+        """Remove todas as chaves que apontam para `valor` (varre o cache)."""
+        with self._lock:
+            for chave in [c for c, (_, v) in self._itens.items() if v == valor]:
+                del self._itens[chave]
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._zerar_metricas()
+
+    def snapshot(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "itens": len(self._itens),
+                "tamanho": self.tamanho,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / consultas if consultas else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def snapshot():
+    return {nome: cache.snapshot() for nome, cache in sorted(caches.items())}
+
+
+@contextmanager
+def desligados():
+    """Desliga todos os caches no bloco (ex.: para medir o custo real do parser)."""
+    estados = {nome: cache.ativo for nome, cache in caches.items()}
+    for cache in caches.values():
+        cache.ativo = False
+    try:
+        yield
+    finally:
+        for nome, ativo in estados.items():
+            caches[nome].ativo = ativo
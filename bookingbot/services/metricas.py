@@ -0,0 +1,271 @@
+"""
+Métricas em processo, expostas no formato texto do Prometheus (GET /metrics).
+
+- bookingbot_stage_seconds: cada etapa do atendimento (cliente, nlp,
+  intenção, disponibilidade, reserva, outbox), via @etapa nos serviços;
+- bookingbot_calendar_request_seconds / bookingbot_whatsapp_request_seconds:
+  chamadas às APIs externas, com resultado ok/error;
+- bookingbot_http_request_seconds e consultas ao banco por requisição (total,
+  tempo e tabela), medidas pelo MetricasMiddleware.
+
+Com METRICS_ENABLED=False os cronômetros viram um contexto vazio e as
+consultas não são contadas (uma checagem por chamada).
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+from django.conf import settings
+
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# todas as métricas, por nome, na ordem de criação
+registro = {}
+
+
+def ativo():
+    return getattr(settings, "METRICS_ENABLED", True)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._series = {}
+        registro[nome] = self
+
+    def _chave(self, rotulos):
+        return tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+
+    def _texto_rotulos(self, chave, extra=()):
+        pares = list(zip(self.rotulos, chave)) + list(extra)
+        if not pares:
+            return ""
+        return "{" + ",".join(f'{r}="{_escapar(v)}"' for r, v in pares) + "}"
+
+    def limpar(self):
+        with self._lock:
+            self._series.clear()
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            linhas += [self._linhas(chave, valor) for chave, valor in series]
+        return "\n".join(linhas)
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        with self._lock:
+            return self._series.get(self._chave(rotulos), 0)
+
+    def _linhas(self, chave, valor):
+        return f"{self.nome}{self._texto_rotulos(chave)} {_formatar(valor)}"
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(buckets)
+
+    def observe(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                # [contagem por bucket (+Inf no fim), soma, total]
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def contagem(self, **rotulos):
+        with self._lock:
+            serie = self._series.get(self._chave(rotulos))
+            return serie[2] if serie else 0
+
+    def _linhas(self, chave, serie):
+        contagens, soma, total = serie
+        linhas = []
+        acumulado = 0
+        for limite, n in zip(self.buckets + ("+Inf",), contagens):
+            acumulado += n
+            linhas.append(f"{self.nome}_bucket{self._texto_rotulos(chave, [('le', limite)])} {acumulado}")
+        linhas.append(f"{self.nome}_sum{self._texto_rotulos(chave)} {_formatar(soma)}")
+        linhas.append(f"{self.nome}_count{self._texto_rotulos(chave)} {total}")
+        return "\n".join(linhas)
+
+
+etapas = Histograma(
+    "bookingbot_stage_seconds", "Duração de cada etapa do atendimento da mensagem.", ("stage",))
+calendar_segundos = Histograma(
+    "bookingbot_calendar_request_seconds", "Chamadas à API do Google Calendar.", ("operation", "result"))
+whatsapp_segundos = Histograma(
+    "bookingbot_whatsapp_request_seconds", "Chamadas HTTP ao gateway do WhatsApp.", ("result",))
+requisicoes = Histograma(
+    "bookingbot_http_request_seconds", "Duração das requisições HTTP por view.", ("view", "status"))
+consultas_por_requisicao = Histograma(
+    "bookingbot_db_queries_per_request", "Consultas ao banco por requisição.", ("view",), BUCKETS_CONSULTAS)
+banco_por_requisicao = Histograma(
+    "bookingbot_db_seconds_per_request", "Tempo no banco por requisição.", ("view",))
+consultas_por_tabela = Contador(
+    "bookingbot_db_queries_total", "Consultas ao banco por view e tabela principal.", ("view", "table"))
+
+
+class _Cronometro:
+    __slots__ = ("histograma", "rotulos", "inicio")
+
+    def __init__(self, histograma, rotulos):
+        self.histograma = histograma
+        self.rotulos = rotulos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        rotulos = self.rotulos
+        if "result" in self.histograma.rotulos and "result" not in rotulos:
+            rotulos = {**rotulos, "result": "error" if tipo else "ok"}
+        self.histograma.observe(time.perf_counter() - self.inicio, **rotulos)
+        return False
+
+
+_NADA = nullcontext()
+
+
+def medir(histograma, **rotulos):
+    """Contexto que observa a duração do bloco (result=ok/error se a métrica tiver esse rótulo)."""
+    if not ativo():
+        return _NADA
+    return _Cronometro(histograma, rotulos)
+
+
+def etapa(nome):
+    """Decorador: mede a função (sync ou async) como uma etapa do atendimento."""
+    def decorar(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def envolver(*args, **kwargs):
+                if not ativo():
+                    return await func(*args, **kwargs)
+                with _Cronometro(etapas, {"stage": nome}):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def envolver(*args, **kwargs):
+                if not ativo():
+                    return func(*args, **kwargs)
+                with _Cronometro(etapas, {"stage": nome}):
+                    return func(*args, **kwargs)
+        return envolver
+    return decorar
+
+
+# Consultas da requisição atual. O contextvar acompanha o sync_to_async, então
+# as consultas da view síncrona sob ASGI (feitas em outra thread) também contam.
+
+_TABELA = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+["`]?(\w+)', re.IGNORECASE)
+
+
+class ColetaConsultas:
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.tabelas = Counter()
+
+    def registrar(self, sql, segundos):
+        self.consultas += 1
+        self.segundos += segundos
+        achou = _TABELA.search(sql)
+        self.tabelas[achou.group(1) if achou else "none"] += 1
+
+
+coleta_atual = contextvars.ContextVar("coleta_consultas", default=None)
+
+
+def contar_consulta(execute, sql, params, many, context):
+    """execute_wrapper instalado em toda conexão (ver signals.py)."""
+    coleta = coleta_atual.get()
+    if coleta is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        coleta.registrar(sql, time.perf_counter() - inicio)
+
+
+def registrar_requisicao(view, status, segundos, coleta):
+    requisicoes.observe(segundos, view=view, status=status)
+    consultas_por_requisicao.observe(coleta.consultas, view=view)
+    banco_por_requisicao.observe(coleta.segundos, view=view)
+    for tabela, n in coleta.tabelas.items():
+        consultas_por_tabela.inc(n, view=view, table=tabela)
+
+
+def _exportar_caches():
+    # contadores que já existem nos serviços, lidos só na coleta
+    from . import cache_disponibilidade, intencao, memo
+
+    linhas = [
+        "# HELP bookingbot_cache_requests_total Consultas aos caches em processo e de disponibilidade.",
+        "# TYPE bookingbot_cache_requests_total counter",
+    ]
+    for nome, s in memo.snapshot().items():
+        linhas.append(f'bookingbot_cache_requests_total{{cache="{nome}",result="hit"}} {s["hits"]}')
+        linhas.append(f'bookingbot_cache_requests_total{{cache="{nome}",result="miss"}} {s["misses"]}')
+    for tipo, s in cache_disponibilidade.stats.snapshot().items():
+        linhas.append(f'bookingbot_cache_requests_total{{cache="disponibilidade_{tipo}",result="hit"}} {s["hits"]}')
+        linhas.append(f'bookingbot_cache_requests_total{{cache="disponibilidade_{tipo}",result="miss"}} {s["misses"]}')
+
+    linhas += [
+        "# HELP bookingbot_intent_messages_total Mensagens por camada da classificação de intenção.",
+        "# TYPE bookingbot_intent_messages_total counter",
+    ]
+    for camada, s in intencao.stats.snapshot().items():
+        linhas.append(f'bookingbot_intent_messages_total{{layer="{camada}"}} {s["mensagens"]}')
+    return "\n".join(linhas)
+
+
+def exportar():
+    """Todas as métricas no formato texto do Prometheus (0.0.4)."""
+    partes = [metrica.exportar() for metrica in registro.values()]
+    partes.append(_exportar_caches())
+    return "\n".join(partes) + "\n"
+
+
+def limpar():
+    for metrica in registro.values():
+        metrica.limpar()
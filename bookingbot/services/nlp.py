@@ -1,13 +1,7 @@
 import re
 import datetime
-import spacy
 
-nlp = None
-try:
-    nlp = spacy.load("pt_core_news_sm")
-except Exception:
-    # se não tiver modelo, o sistema ainda funciona com regex básico
-    nlp = None
+from .spacy_nlp import get_nlp
 
 
 def _extrair_data_hora_texto(text):
@@ -36,6 +30,8 @@ def _extrair_data_hora_texto(text):
         except Exception:
             return None, None
     # fallback com spaCy: tentar extrair entidades
+    # (se não tiver modelo, o sistema ainda funciona com regex básico)
+    nlp = get_nlp()
     if nlp:
         doc = nlp(text)
         date_ent = None
@@ -2,11 +2,17 @@ import re
 import numpy as np
 from datetime import datetime, timedelta
 from dateutil.parser import parse as date_parse
+from dateutil.relativedelta import relativedelta
+
+from .memo import CacheMemo
+from .metricas import etapa
 
 
 # ----------------------------------------
 # MAPAS DE APOIO
 # ----------------------------------------
+# Também são os apelidos padrão do índice de recursos (services/recursos.py),
+# que resolve o Resource a partir do nome/slug cadastrado no admin.
 RECURSOS_MAP = {
     "sala a": "Sala A",
     "sala b": "Sala B",
@@ -43,6 +49,21 @@ HORAS_ESPECIAIS = {
     "meia noite": "00:00",
 }
 
+# Recorrência ("toda terça às 19h por 2 meses"): sem prazo na mensagem, vale
+# RECORRENCIA_SEMANAS_PADRAO semanas; nunca passa de RECORRENCIA_MAX_DIAS
+RECORRENCIA_SEMANAS_PADRAO = 4
+RECORRENCIA_MAX_DIAS = 366
+NUMEROS = {"um": 1, "uma": 1, "dois": 2, "duas": 2, "três": 3, "tres": 3,
+           "quatro": 4, "cinco": 5, "seis": 6}
+
+# Ordem importa: vence a primeira intenção com alguma palavra presente
+INTENT_KEYWORDS = (
+    ("criar_reserva", ("reservar", "agendar", "marcar", "quero um horário")),
+    ("cancelar_reserva", ("cancelar", "desmarcar")),
+    ("listar_disponibilidade", ("ver", "consultar", "horários disponíveis")),
+    ("remarcar_reserva", ("mudar", "remarcar")),
+)
+
 
 # ----------------------------------------
 # FUNÇÕES DE EXTRAÇÃO
@@ -137,15 +158,15 @@ def extrair_recurso(texto):
     return None
 
 
-def interpretar_datas(texto):
-    hoje = datetime.now().date()
+def interpretar_datas(texto, hoje=None):
+    hoje = hoje or datetime.now().date()
     datas = []
 
     # hoje / amanhã
     if "hoje" in texto:
         datas.append(hoje)
 
-    if "amanhã" in texto or "amanha" in texto:
+    if _cita_amanha(texto):
         datas.append(hoje + timedelta(days=1))
 
     if "depois de amanhã" in texto or "depois de amanha" in texto:
@@ -159,9 +180,11 @@ def interpretar_datas(texto):
 
     # próxima/este/essa segunda
     sem = re.search(r"(próxima|proxima|este|essa) (\w+)", texto)
+    relativo = None
     if sem:
         nome = sem.group(2)
         if nome in DIAS_SEMANA:
+            relativo = nome
             alvo = DIAS_SEMANA[nome]
             atual = hoje.weekday()
             add = (alvo - atual + 7) % 7
@@ -171,6 +194,8 @@ def interpretar_datas(texto):
     # múltiplos dias: segunda e quarta
     multi = re.findall(r"(segunda|terça|terca|quarta|quinta|sexta|sábado|sabado|domingo)", texto)
     for m in multi:
+        if m == relativo:  # já entrou como "próxima <dia>"
+            continue
         alvo = DIAS_SEMANA[m]
         atual = hoje.weekday()
         add = (alvo - atual + 7) % 7
@@ -186,39 +211,324 @@ def interpretar_datas(texto):
     return list(dict.fromkeys(datas))  # remove duplicatas
 
 
+def _cita_amanha(texto):
+    # "depois de amanhã" não é amanhã
+    if "depois de amanh" in texto:
+        texto = texto.replace("depois de amanh", "")
+    return "amanhã" in texto or "amanha" in texto
+
+
+def _numero(valor):
+    return int(valor) if valor.isdigit() else NUMEROS[valor]
+
+
+def expandir_recorrencia(texto, datas, hoje=None):
+    """
+    Datas de uma reserva recorrente: "toda terça", "todas as segundas e
+    quartas", "todo dia", "toda semana" (dia da semana da data citada),
+    "semanalmente". O prazo vem de "por/durante N semanas|meses" ou "até
+    dd/mm/aaaa" (inclusive), e o começo de "a partir de dd/mm/aaaa" (senão,
+    hoje). Sem recorrência no texto, retorna None.
+    """
+    rec = _RE_RECORRENCIA.search(texto)
+    if not rec:
+        return None
+    hoje = hoje or datetime.now().date()
+
+    inicio = hoje
+    a_partir = _RE_A_PARTIR.search(texto)
+    if a_partir:
+        try:
+            inicio = date_parse(a_partir.group(1), dayfirst=True).date()
+        except Exception:
+            pass
+
+    fim = None
+    ate = _RE_ATE.search(texto)
+    if ate:
+        try:
+            fim = date_parse(ate.group(1), dayfirst=True).date() + timedelta(days=1)
+        except Exception:
+            pass
+
+    alvo = rec.group(1)
+    if alvo == "dia":
+        dias = set(range(7))
+    elif alvo in DIAS_SEMANA:
+        dias = {n for nome, n in DIAS_SEMANA.items() if nome in texto}
+    else:  # toda semana / semanalmente: no dia da semana da data citada
+        citadas = [d for d in datas if fim is None or d != fim - timedelta(days=1)]
+        if citadas and not a_partir:
+            inicio = citadas[0]
+        dias = {inicio.weekday()}
+
+    prazo = _RE_PRAZO.search(texto)
+    if fim is None and prazo:
+        n = _numero(prazo.group(1))
+        fim = inicio + (timedelta(weeks=n) if prazo.group(2).startswith("semana") else relativedelta(months=n))
+    if fim is None:
+        fim = inicio + timedelta(weeks=RECORRENCIA_SEMANAS_PADRAO)
+    fim = min(fim, inicio + timedelta(days=RECORRENCIA_MAX_DIAS))
+
+    return [inicio + timedelta(days=k) for k in range((fim - inicio).days)
+            if (inicio + timedelta(days=k)).weekday() in dias]
+
+
 # ----------------------------------------
 # INTENT FINAL
 # ----------------------------------------
 
 def interpretar_intent(texto):
-    if any(w in texto for w in ["reservar", "agendar", "marcar", "quero um horário"]):
-        return "criar_reserva"
-    if any(w in texto for w in ["cancelar"]):
-        return "cancelar_reserva"
-    if any(w in texto for w in ["ver", "consultar", "horários disponíveis"]):
-        return "listar_disponibilidade"
-    if any(w in texto for w in ["mudar", "remarcar"]):
-        return "remarcar_reserva"
+    for intent, palavras in INTENT_KEYWORDS:
+        if any(w in texto for w in palavras):
+            return intent
     return "desconhecido"
 
 
 # ----------------------------------------
-# FUNÇÃO PRINCIPAL
+# EXTRATOR PRÉ-COMPILADO
 # ----------------------------------------
 
-def interpretar_mensagem(texto):
-    t = texto.lower().strip()
+_RE_DIGITO = re.compile(r"\d")
+_RE_DURACAO = re.compile(r"por (\d+)\s*(hora|horas|h|minuto|minutos)")
+_RE_HORA_MINUTO = re.compile(r"\d{1,2}:\d{2}")
+_RE_HORA_H = re.compile(r"\b(\d{1,2})h\b")
+_RE_HORA_PERIODO = re.compile(r"(\d{1,2}) (da tarde|da noite|da manhã|de manhã|de tarde)")
+_RE_INTERVALO = re.compile(
+    r"(entre|das|do)\s+(\d{1,2}[:h]?\d{0,2}|\w+)\s*(às|as|a)\s*(\d{1,2}[:h]?\d{0,2}|\w+)"
+)
+_RE_DAQUI = re.compile(r"daqui (\d+) dias")
+_RE_SEMANA_RELATIVA = re.compile(r"(próxima|proxima|este|essa) (\w+)")
+_RE_DATA_COMPLETA = re.compile(r"\d{1,2}/\d{1,2}/\d{2,4}")
+_RE_RECORRENCIA = re.compile(
+    r"\b(?:tod[ao]s?\s+(?:[ao]s\s+)?(segunda|terça|terca|quarta|quinta|sexta|sábado|sabado|domingo|semana|dia)"
+    r"|semanalmente)"
+)
+_RE_PRAZO = re.compile(
+    r"(?:por|durante)\s+(?:mais\s+)?(\d+|um|uma|dois|duas|três|tres|quatro|cinco|seis)\s+(semanas?|m[eê]s|meses)"
+)
+# Datas listadas de propósito ("segunda e quarta", "hoje e amanhã",
+# "10/01, 12/01"): várias reservas. "hoje ou amanhã" é dúvida, não lista.
+_DATA_CITADA = (
+    r"(?:hoje|amanh[ãa]|segunda|terça|terca|quarta|quinta|sexta|sábado|sabado|domingo"
+    r"|\d{1,2}/\d{1,2}(?:/\d{2,4})?)(?:-feira)?"
+)
+_RE_VARIAS_DATAS = re.compile(
+    _DATA_CITADA
+    + r"\s*(?:,|\be\b)\s*(?:(?:também|tambem|n[ao]s?|[ao]s?|dia|depois de|próxima|proxima)\s+)*"
+    + _DATA_CITADA
+)
+_RE_ATE = re.compile(r"até\s+(?:o\s+)?(?:dia\s+)?(\d{1,2}/\d{1,2}/\d{2,4})")
+_RE_A_PARTIR = re.compile(r"a partir d[eoa]\s+(?:dia\s+)?(\d{1,2}/\d{1,2}/\d{2,4})")
+
+
+class ExtratorEntidades:
+    """
+    Extrai intenção e entidades de uma mensagem (já em minúsculas) com as
+    tabelas e regexes preparados uma única vez.
+
+    Uma varredura sobre a tabela de termos (recursos, dias da semana,
+    períodos, horas especiais, palavras de intenção e gatilhos das regex)
+    diz quais termos aparecem no texto; os extratores consultam esse
+    conjunto em vez de reprocessar o texto, e cada regex só roda quando o
+    seu gatilho (dígito, "por ", "entre"/"das"/"do", ...) está presente.
+    O resultado é idêntico ao de interpretar_mensagem_sequencial.
+    """
+
+    GATILHOS_DATA = (
+        "hoje", "amanhã", "amanha", "depois de amanhã", "depois de amanha",
+        "daqui ", "próxima ", "proxima ", "este ", "essa ",
+    )
+    GATILHOS_INTERVALO = ("entre", "das", "do")
+    GATILHO_DURACAO = "por "
+    GATILHOS_RECORRENCIA = ("toda", "todo", "semanalmente")
+
+    def __init__(self, recursos=None, dias_semana=None, periodos=None,
+                 horas_especiais=None, intents=None):
+        self.recursos = tuple((recursos or RECURSOS_MAP).items())
+        self.dias_semana = dict(dias_semana or DIAS_SEMANA)
+        self.periodos = tuple((periodos or PERIODOS_NATURAIS).items())
+        self.horas_especiais = tuple((horas_especiais or HORAS_ESPECIAIS).items())
+        self.intents = tuple(intents or INTENT_KEYWORDS)
+
+        termos = [p for _, palavras in self.intents for p in palavras]
+        termos += self.GATILHOS_DATA
+        termos += self.dias_semana
+        termos += [t for t, _ in self.periodos]
+        termos += [t for t, _ in self.horas_especiais]
+        termos += [t for t, _ in self.recursos]
+        termos += self.GATILHOS_INTERVALO
+        termos.append(self.GATILHO_DURACAO)
+        termos += self.GATILHOS_RECORRENCIA
+        # o período "da manhã" da regex de horário depende destes termos
+        termos += ("tarde", "noite", "manhã")
+        # sem repetição, preservando a ordem
+        self.termos = tuple(dict.fromkeys(termos))
+        self._cache_dias = None
+
+    def termos_presentes(self, t):
+        return {termo for termo in self.termos if termo in t}
+
+    # --- extratores (mesma semântica das funções avulsas) ---
+
+    def intent(self, presentes):
+        for intent, palavras in self.intents:
+            for p in palavras:
+                if p in presentes:
+                    return intent
+        return "desconhecido"
+
+    def _dias_relativos(self, hoje=None):
+        """hoje, amanhã, ... (hoje + 7): recalculado só quando o dia muda."""
+        hoje = hoje or datetime.now().date()
+        dias = self._cache_dias
+        # variável local: outra thread pode trocar o cache por outra data de referência
+        if dias is None or dias[0] != hoje:
+            dias = self._cache_dias = [hoje + timedelta(days=k) for k in range(8)]
+        return dias
+
+    def datas(self, t, presentes, tem_digito, hoje=None):
+        dias = self._dias_relativos(hoje)
+        hoje = dias[0]
+        datas = []
+
+        if "hoje" in presentes:
+            datas.append(hoje)
+        if ("amanhã" in presentes or "amanha" in presentes) and _cita_amanha(t):
+            datas.append(dias[1])
+        if "depois de amanhã" in presentes or "depois de amanha" in presentes:
+            datas.append(dias[2])
+
+        if tem_digito and "daqui " in presentes:
+            m = _RE_DAQUI.search(t)
+            if m:
+                datas.append(hoje + timedelta(days=int(m.group(1))))
 
-    intent = interpretar_intent(t)
+        atual = hoje.weekday()
+        relativo = None
+        if ("próxima " in presentes or "proxima " in presentes
+                or "este " in presentes or "essa " in presentes):
+            sem = _RE_SEMANA_RELATIVA.search(t)
+            if sem and sem.group(2) in self.dias_semana:
+                relativo = sem.group(2)
+                add = (self.dias_semana[relativo] - atual + 7) % 7
+                datas.append(dias[7 if add == 0 else add])
+
+        # dias da semana na ordem em que aparecem no texto ("próxima <dia>" já entrou)
+        semana = [d for d in self.dias_semana if d in presentes and d != relativo]
+        if len(semana) > 1:
+            semana.sort(key=t.find)
+        for d in semana:
+            datas.append(dias[(self.dias_semana[d] - atual + 7) % 7])
+
+        if tem_digito and "/" in t:
+            for d in _RE_DATA_COMPLETA.findall(t):
+                try:
+                    datas.append(date_parse(d, dayfirst=True).date())
+                except Exception:
+                    pass
+
+        return list(dict.fromkeys(datas))
+
+    def horarios(self, t, presentes, tem_digito):
+        horarios = []
+        if tem_digito:
+            if ":" in t:
+                horarios += _RE_HORA_MINUTO.findall(t)
+            if "h" in t:
+                for h in _RE_HORA_H.findall(t):
+                    horarios.append(f"{h}:00")
+
+            if "tarde" in presentes or "noite" in presentes or "manhã" in presentes:
+                exp = _RE_HORA_PERIODO.search(t)
+                if exp:
+                    h = int(exp.group(1))
+                    periodo = exp.group(2)
+                    if "tarde" in periodo and h < 12:
+                        h += 12
+                    if "noite" in periodo and h < 12:
+                        h += 12
+                    horarios.append(f"{h:02d}:00")
+
+        for termo, hora in self.horas_especiais:
+            if termo in presentes:
+                horarios.append(hora)
+        return horarios
+
+    def intervalo(self, t, presentes):
+        if not any(g in presentes for g in self.GATILHOS_INTERVALO):
+            return None, None
+        padrao = _RE_INTERVALO.search(t)
+        if not padrao:
+            return None, None
+
+        especiais = dict(self.horas_especiais)
+
+        def normalizar(h):
+            if h in especiais:
+                return especiais[h]
+            h = h.replace("h", ":")
+            if ":" not in h:
+                return f"{h}:00"
+            return h
+
+        return normalizar(padrao.group(2)), normalizar(padrao.group(4))
+
+    def periodo(self, presentes):
+        for termo, (ini, fim) in self.periodos:
+            if termo in presentes:
+                return ini, fim
+        return None, None
 
-    datas = interpretar_datas(t)
-    horarios_simples = extrair_horarios_simples(t)
-    intervalo_ini, intervalo_fim = extrair_intervalo(t)
+    def duracao(self, t, presentes, tem_digito):
+        if not tem_digito or self.GATILHO_DURACAO not in presentes:
+            return None
+        padrao = _RE_DURACAO.search(t)
+        if not padrao:
+            return None
+        valor = int(padrao.group(1))
+        return valor if padrao.group(2).startswith("min") else valor * 60
+
+    def recurso(self, presentes):
+        for termo, nome_recurso in self.recursos:
+            if termo in presentes:
+                return nome_recurso
+        return None
 
-    periodo_ini, periodo_fim = extrair_periodo(t)
-    duracao = extrair_duracao(t)
-    recurso_nome = extrair_recurso(t)
+    def extrair(self, texto, hoje=None):
+        """`hoje`: data de referência de "hoje", "amanhã", "próxima sexta"... (padrão: a de hoje)."""
+        t = texto.lower().strip()
+        presentes = self.termos_presentes(t)
+        tem_digito = _RE_DIGITO.search(t) is not None
+
+        datas = self.datas(t, presentes, tem_digito, hoje)
+        recorrencia = None
+        if any(g in presentes for g in self.GATILHOS_RECORRENCIA):
+            recorrencia = expandir_recorrencia(t, datas, self._dias_relativos(hoje)[0])
+        horarios_simples = self.horarios(t, presentes, tem_digito)
+        intervalo_ini, intervalo_fim = self.intervalo(t, presentes)
+        periodo_ini, periodo_fim = self.periodo(presentes)
+
+        return _montar_resultado(
+            texto,
+            intent=self.intent(presentes),
+            datas=datas if recorrencia is None else recorrencia,
+            recorrente=recorrencia is not None,
+            horarios_simples=horarios_simples,
+            intervalo=(intervalo_ini or periodo_ini, intervalo_fim or periodo_fim),
+            duracao=self.duracao(t, presentes, tem_digito),
+            recurso_nome=self.recurso(presentes),
+        )
+
+
+extrator = ExtratorEntidades()
 
+
+# ----------------------------------------
+# FUNÇÃO PRINCIPAL
+# ----------------------------------------
+
+def _montar_resultado(texto, intent, datas, horarios_simples, intervalo, duracao, recurso_nome, recorrente=False):
     # horário único se houver apenas um simples
     horario_unico = horarios_simples[0] if len(horarios_simples) == 1 else None
 
@@ -227,12 +537,16 @@ def interpretar_mensagem(texto):
 
         "dates": [str(d) for d in datas],
         "date": str(datas[0]) if datas else None,
+        # "toda terça ...": `dates` traz todas as ocorrências
+        "recurring": recorrente,
+        # pede uma reserva em cada data (recorrência ou datas listadas com "e")
+        "multiple_dates": recorrente or (len(datas) > 1 and _RE_VARIAS_DATAS.search(texto.lower()) is not None),
 
         "times": horarios_simples,
         "time": horario_unico,
 
-        "interval_start": intervalo_ini or periodo_ini,
-        "interval_end": intervalo_fim or periodo_fim,
+        "interval_start": intervalo[0],
+        "interval_end": intervalo[1],
 
         "duration_minutes": duracao,
 
@@ -240,3 +554,54 @@ def interpretar_mensagem(texto):
 
         "resource_name": recurso_nome,
     }
+
+
+# Mensagens repetidas ("oi", "cancelar", payloads de botão) não passam de
+# novo pelo extrator. A chave é o texto como o extrator o vê (minúsculo, sem
+# espaços nas pontas) e o dia de hoje: "amanhã" muda de data à meia-noite.
+cache_interpretacao = CacheMemo("nlp_v2")
+
+
+@etapa("nlp")
+def interpretar_mensagem(texto, hoje=None):
+    """
+    Intenção e entidades da mensagem. `hoje` resolve as datas relativas a
+    partir de outro dia (ex.: mensagens arquivadas, pela data em que foram
+    enviadas).
+    """
+    hoje = hoje or datetime.now().date()
+    chave = (hoje, texto.lower().strip())
+    resultado = cache_interpretacao.obter(chave, lambda: extrator.extrair(texto, hoje))
+    # cópia: quem chama pode alterar o dict, e o texto original é o desta mensagem
+    return {**resultado, "dates": list(resultado["dates"]), "times": list(resultado["times"]),
+            "texto_original": texto}
+
+
+def interpretar_mensagem_sequencial(texto, hoje=None):
+    """
+    Implementação de referência: cada extrator varre o texto por conta
+    própria. Mantida para comparação (benchmark_nlp_v2 e testes).
+    """
+    t = texto.lower().strip()
+
+    intent = interpretar_intent(t)
+
+    datas = interpretar_datas(t, hoje)
+    recorrencia = expandir_recorrencia(t, datas, hoje)
+    horarios_simples = extrair_horarios_simples(t)
+    intervalo_ini, intervalo_fim = extrair_intervalo(t)
+
+    periodo_ini, periodo_fim = extrair_periodo(t)
+    duracao = extrair_duracao(t)
+    recurso_nome = extrair_recurso(t)
+
+    return _montar_resultado(
+        texto,
+        intent=intent,
+        datas=datas if recorrencia is None else recorrencia,
+        recorrente=recorrencia is not None,
+        horarios_simples=horarios_simples,
+        intervalo=(intervalo_ini or periodo_ini, intervalo_fim or periodo_fim),
+        duracao=duracao,
+        recurso_nome=recurso_nome,
+    )
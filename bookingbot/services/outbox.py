@@ -0,0 +1,220 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from ..models import OutboundMessage
+from .metricas import etapa
+from .whatsapp import enviar_whatsapp
+
+
+# Estados que ainda bloqueiam as próximas mensagens do mesmo destinatário
+NAO_FINALIZADAS = ("pending", "sending")
+
+
+@etapa("outbox")
+def enfileirar_whatsapp(numero, mensagem):
+    """
+    Grava a mensagem no outbox. Chamado dentro de transaction.atomic(),
+    a mensagem só existe se a reserva/cancelamento também for gravado.
+    """
+    return OutboundMessage.objects.create(phone=numero, body=mensagem)
+
+
+def calcular_backoff(tentativas, base=None, maximo=None):
+    """Espera exponencial: base, 2x base, 4x base... limitada ao máximo."""
+    base = base if base is not None else getattr(settings, "WHATSAPP_OUTBOX_BACKOFF_BASE", 5)
+    maximo = maximo if maximo is not None else getattr(settings, "WHATSAPP_OUTBOX_BACKOFF_MAX", 3600)
+    return timedelta(seconds=min(base * 2 ** max(tentativas - 1, 0), maximo))
+
+
+def liberar_envios_travados():
+    """
+    Devolve para a fila mensagens que ficaram em 'sending' depois que o
+    prazo (lease) expirou — ex.: o worker morreu no meio do envio.
+    """
+    return OutboundMessage.objects.filter(
+        status="sending", next_attempt_at__lte=timezone.now()
+    ).update(status="pending")
+
+
+def destinatarios_prontos(limite=100):
+    """
+    Telefones cuja mensagem mais antiga ainda não finalizada já pode ser
+    enviada. Só a primeira mensagem de cada telefone é elegível, o que
+    garante a ordem de entrega por destinatário.
+    """
+    primeiras = (
+        OutboundMessage.objects.filter(status__in=NAO_FINALIZADAS)
+        .values("phone")
+        .annotate(first_id=Min("id"))
+        .values("first_id")
+    )
+    return list(
+        OutboundMessage.objects.filter(
+            id__in=primeiras,
+            status="pending",
+            next_attempt_at__lte=timezone.now(),
+        )
+        .order_by("id")
+        .values_list("phone", flat=True)[:limite]
+    )
+
+
+def _proxima(phone):
+    """Mensagem mais antiga ainda não finalizada do telefone."""
+    return OutboundMessage.objects.filter(phone=phone, status__in=NAO_FINALIZADAS).order_by("id")
+
+
+def _pronta(msg):
+    return msg is not None and msg.status == "pending" and msg.next_attempt_at <= timezone.now()
+
+
+def _reservar(msg, lease):
+    """
+    Queryset e campos para marcar a mensagem como 'sending'. O update
+    afeta 0 linhas se outro worker pegou a mensagem antes.
+    """
+    return OutboundMessage.objects.filter(pk=msg.pk, status="pending"), {
+        "status": "sending",
+        "next_attempt_at": timezone.now() + timedelta(seconds=lease),
+    }
+
+
+def _registrar_falha(msg, erro, max_tentativas):
+    msg.last_error = str(erro)[:1000]
+    if msg.attempts >= max_tentativas:
+        msg.status = "failed"
+    else:
+        msg.status = "pending"
+        msg.next_attempt_at = timezone.now() + calcular_backoff(msg.attempts)
+    return ["status", "attempts", "next_attempt_at", "last_error"]
+
+
+def _registrar_envio(msg):
+    msg.status = "sent"
+    msg.sent_at = timezone.now()
+    msg.last_error = ""
+    return ["status", "attempts", "sent_at", "last_error"]
+
+
+def _config(max_tentativas, lease):
+    return (
+        max_tentativas or getattr(settings, "WHATSAPP_OUTBOX_MAX_ATTEMPTS", 8),
+        lease or getattr(settings, "WHATSAPP_OUTBOX_LEASE", 60),
+    )
+
+
+def drenar_destinatario(phone, enviar=None, max_tentativas=None, lease=None):
+    """
+    Envia, em ordem, as mensagens pendentes de um telefone. Para no
+    primeiro erro (a mensagem é reagendada) para não furar a ordem.
+    Retorna (enviadas, falhas).
+    """
+    enviar = enviar or (lambda n, m: enviar_whatsapp(n, m, raise_on_error=True))
+    max_tentativas, lease = _config(max_tentativas, lease)
+
+    enviadas = falhas = 0
+    while True:
+        msg = _proxima(phone).first()
+        if not _pronta(msg):
+            break
+        qs, campos = _reservar(msg, lease)
+        if qs.update(**campos) != 1:
+            break
+
+        msg.attempts += 1
+        try:
+            enviar(msg.phone, msg.body)
+        except Exception as e:
+            falhas += 1
+            msg.save(update_fields=_registrar_falha(msg, e, max_tentativas))
+            if msg.status == "pending":
+                break
+            continue
+
+        enviadas += 1
+        msg.save(update_fields=_registrar_envio(msg))
+    return enviadas, falhas
+
+
+async def adrenar_destinatario(phone, gateway, max_tentativas=None, lease=None):
+    """Versão assíncrona de drenar_destinatario (ORM async + AsyncWhatsAppGateway)."""
+    max_tentativas, lease = _config(max_tentativas, lease)
+
+    enviadas = falhas = 0
+    while True:
+        msg = await _proxima(phone).afirst()
+        if not _pronta(msg):
+            break
+        qs, campos = _reservar(msg, lease)
+        if await qs.aupdate(**campos) != 1:
+            break
+
+        msg.attempts += 1
+        try:
+            await gateway.send(msg.phone, msg.body, raise_on_error=True)
+        except Exception as e:
+            falhas += 1
+            await msg.asave(update_fields=_registrar_falha(msg, e, max_tentativas))
+            if msg.status == "pending":
+                break
+            continue
+
+        enviadas += 1
+        await msg.asave(update_fields=_registrar_envio(msg))
+    return enviadas, falhas
+
+
+def _drenar_em_thread(phone, enviar):
+    try:
+        return drenar_destinatario(phone, enviar=enviar)
+    finally:
+        # cada thread do pool abre sua própria conexão
+        connection.close()
+
+
+def processar_outbox(workers=None, limite=100, enviar=None):
+    """
+    Executa um ciclo de envio: um telefone por tarefa no pool de threads,
+    de forma que telefones diferentes são enviados em paralelo e as
+    mensagens de um mesmo telefone em sequência.
+    """
+    workers = workers or getattr(settings, "WHATSAPP_OUTBOX_WORKERS", 4)
+    liberar_envios_travados()
+    phones = destinatarios_prontos(limite)
+    if not phones:
+        return 0, 0
+
+    enviadas = falhas = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for ok, erro in pool.map(lambda p: _drenar_em_thread(p, enviar), phones):
+            enviadas += ok
+            falhas += erro
+    return enviadas, falhas
+
+
+async def processar_outbox_async(gateway, concorrencia=None, limite=100):
+    """
+    Mesmo ciclo de processar_outbox, mas com asyncio: até `concorrencia`
+    telefones enviando ao mesmo tempo pelo AsyncWhatsAppGateway.
+    """
+    concorrencia = concorrencia or getattr(settings, "WHATSAPP_OUTBOX_WORKERS", 4)
+    await sync_to_async(liberar_envios_travados)()
+    phones = await sync_to_async(destinatarios_prontos)(limite)
+    if not phones:
+        return 0, 0
+
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def drenar(phone):
+        async with semaforo:
+            return await adrenar_destinatario(phone, gateway)
+
+    resultados = await asyncio.gather(*(drenar(p) for p in phones))
+    return sum(r[0] for r in resultados), sum(r[1] for r in resultados)
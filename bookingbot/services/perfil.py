@@ -0,0 +1,231 @@
+"""
+Perfil sob demanda de requisições (PerfilMiddleware).
+
+Uma requisição é perfilada se sorteada (PROFILING_SAMPLE_RATE) ou se trouxer
+o cabeçalho PROFILING_HEADER com um token assinado por PROFILING_SECRET
+(comando token_perfil). Para cada uma, grava em PROFILING_DIR:
+
+- <id>.prof: dump do cProfile (pstats), ou <id>.stacks: pilhas amostradas
+  no formato "collapsed" (uma linha "raiz;...;folha contagem", lida por
+  flamegraph.pl/speedscope), com PROFILING_PROFILER = "amostragem";
+- <id>.sql.json: as consultas ao banco, com duração, e o EXPLAIN das que
+  passaram de PROFILING_SLOW_QUERY_MS. Os parâmetros (telefones, nomes)
+  só vão para o EXPLAIN; no arquivo saem como "?", a menos que
+  PROFILING_LOG_PARAMS esteja ligado.
+
+Só os PROFILING_MAX_DUMPS perfis mais recentes ficam no diretório. O
+comando relatorio_perfis soma os dumps num relatório das funções mais caras.
+"""
+import contextvars
+import cProfile
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+
+SALT = "bookingbot.perfil"
+EXTENSOES = (".prof", ".stacks", ".sql.json")
+
+# cProfile só admite um perfil ativo por vez no processo: as requisições
+# que chegam durante um perfil seguem sem perfil
+ocupado = threading.Lock()
+
+
+def _config(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def diretorio():
+    return Path(_config("PROFILING_DIR", settings.BASE_DIR / "perfis"))
+
+
+def gerar_token(segredo=None):
+    """Valor do cabeçalho que pede o perfil da requisição (vale PROFILING_TOKEN_MAX_AGE segundos)."""
+    return signing.TimestampSigner(key=segredo or settings.PROFILING_SECRET, salt=SALT).sign("perfil")
+
+
+def token_valido(valor):
+    segredo = _config("PROFILING_SECRET", None)
+    if not segredo or not valor:
+        return False
+    try:
+        signing.TimestampSigner(key=segredo, salt=SALT).unsign(
+            valor, max_age=_config("PROFILING_TOKEN_MAX_AGE", 3600))
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def deve_perfilar(request):
+    cabecalho = request.headers.get(_config("PROFILING_HEADER", "X-Profile"))
+    if cabecalho is not None:
+        return token_valido(cabecalho)
+    taxa = _config("PROFILING_SAMPLE_RATE", 0.0)
+    return taxa > 0 and random.random() < taxa
+
+
+def _nome_da_funcao(code):
+    # mesmo formato do pstats: arquivo:linha(função)
+    return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+
+class Amostrador:
+    """
+    Perfil por amostragem: uma thread lê a pilha da thread perfilada a cada
+    `intervalo` segundos (sys._current_frames). Custo fixo por amostra, sem
+    o overhead por chamada do cProfile.
+    """
+
+    def __init__(self, intervalo=0.001):
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _amostrar(self, alvo):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(alvo)
+            pilha = []
+            while frame is not None:
+                pilha.append(_nome_da_funcao(frame.f_code))
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[";".join(reversed(pilha))] += 1
+
+    def enable(self):
+        self._thread = threading.Thread(target=self._amostrar, args=(threading.get_ident(),), daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._parar.set()
+        self._thread.join()
+
+    def dump_stats(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as f:
+            for pilha, n in self.pilhas.most_common():
+                f.write(f"{pilha} {n}\n")
+
+
+class Consultas:
+    """Consultas da requisição perfilada (execute_wrapper, ver signals.py)."""
+
+    def __init__(self):
+        self.itens = []
+
+    def registrar(self, sql, params, many, segundos):
+        self.itens.append({"sql": sql, "params": params, "many": many, "ms": segundos * 1000})
+
+
+consultas_atuais = contextvars.ContextVar("consultas_perfil", default=None)
+
+
+def registrar_consulta(execute, sql, params, many, context):
+    consultas = consultas_atuais.get()
+    if consultas is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        consultas.registrar(sql, params, many, time.perf_counter() - inicio)
+
+
+class Sessao:
+    """Um perfil de requisição: iniciar() antes da view, parar() e gravar() depois."""
+
+    def __init__(self, request):
+        self.request = request
+        self.consultas = Consultas()
+        tipo = _config("PROFILING_PROFILER", "cprofile")
+        self.extensao = ".stacks" if tipo == "amostragem" else ".prof"
+        self.perfilador = (
+            Amostrador(_config("PROFILING_SAMPLE_INTERVAL", 0.001)) if tipo == "amostragem" else cProfile.Profile())
+
+    def iniciar(self):
+        self._token = consultas_atuais.set(self.consultas)
+        self.inicio = time.perf_counter()
+        self.perfilador.enable()
+
+    def parar(self):
+        self.perfilador.disable()
+        self.duracao = time.perf_counter() - self.inicio
+        consultas_atuais.reset(self._token)
+
+    def gravar(self, response):
+        """Grava o perfil e o log de consultas (com EXPLAIN das lentas). Retorna o id."""
+        destino = diretorio()
+        destino.mkdir(parents=True, exist_ok=True)
+        match = getattr(self.request, "resolver_match", None)
+        view = match.url_name if match and match.url_name else "nao_encontrada"
+        ident = f"{datetime.now():%Y%m%dT%H%M%S%f}-{view}"
+
+        self.perfilador.dump_stats(destino / f"{ident}{self.extensao}")
+        with open(destino / f"{ident}.sql.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "path": self.request.path,
+                "method": self.request.method,
+                "view": view,
+                "status": response.status_code,
+                "ms": round(self.duracao * 1000, 3),
+                "consultas": _com_explain(self.consultas.itens),
+            }, f, ensure_ascii=False, indent=2, default=str)
+        rotacionar(destino, _config("PROFILING_MAX_DUMPS", 200))
+        return ident
+
+
+def _com_explain(itens):
+    limite = _config("PROFILING_SLOW_QUERY_MS", 50)
+    com_params = _config("PROFILING_LOG_PARAMS", False)
+    resultado = []
+    for item in itens:
+        item = {**item, "ms": round(item["ms"], 3)}
+        if item["ms"] >= limite and not item["many"] and item["sql"].lstrip().upper().startswith("SELECT"):
+            item["explain"] = explain(item["sql"], item["params"])
+        item["params"] = _texto(item["params"]) if com_params else _redigido(item["params"])
+        resultado.append(item)
+    return resultado
+
+
+def _texto(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: str(v) for k, v in params.items()}
+    return [str(p) for p in params]
+
+
+def _redigido(params):
+    """Só o formato dos parâmetros: quantos e com que nome, sem os valores."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: "?" for k in params}
+    return ["?" for _ in params]
+
+
+def explain(sql, params):
+    """Plano da consulta (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no PostgreSQL), sem executá-la."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return [" ".join(str(c) for c in linha) for linha in cursor.fetchall()]
+    except Exception as e:  # o log não pode derrubar a resposta
+        return [f"EXPLAIN falhou: {e}"]
+
+
+def rotacionar(destino, maximo):
+    """Apaga os perfis mais antigos, deixando os `maximo` mais recentes."""
+    arquivos = [p for p in destino.iterdir() if p.name.endswith(EXTENSOES)]
+    idents = sorted({p.name.split(".", 1)[0] for p in arquivos}, reverse=True)
+    antigos = set(idents[maximo:])
+    for p in arquivos:
+        if p.name.split(".", 1)[0] in antigos:
+            p.unlink(missing_ok=True)
@@ -0,0 +1,127 @@
+import re
+import time
+import threading
+import unicodedata
+
+from django.conf import settings
+
+from ..models import Resource
+from .nlp_v2 import RECURSOS_MAP
+
+
+_FIM = None  # chave do nó terminal na trie (nunca é um caractere)
+_RE_SEPARADORES = re.compile(r"[\s\-_]+")
+
+
+def normalizar(texto):
+    """Minúsculas, sem acento e com hífen/underscore/espaços colapsados."""
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _RE_SEPARADORES.sub(" ", texto.casefold()).strip()
+
+
+class _Trie:
+    def __init__(self):
+        self.raiz = {}
+
+    def adicionar(self, termo, valor):
+        no = self.raiz
+        for c in termo:
+            no = no.setdefault(c, {})
+        no[_FIM] = valor
+
+    def buscar(self, texto):
+        """
+        Primeiro termo (mais à esquerda e, nele, o mais longo) que aparece
+        como palavra inteira no texto já normalizado.
+        """
+        n = len(texto)
+        raiz = self.raiz
+        for i in range(n):
+            if (i and texto[i - 1].isalnum()) or texto[i] not in raiz:
+                continue
+            no = raiz
+            achado = None
+            j = i
+            while j < n and texto[j] in no:
+                no = no[texto[j]]
+                j += 1
+                if _FIM in no and (j == n or not texto[j].isalnum()):
+                    achado = no[_FIM]
+            if achado is not None:
+                return achado
+        return None
+
+
+class IndiceRecursos:
+    """
+    Índice em memória dos recursos (nome, slug e apelidos) para achar a sala
+    citada na mensagem sem consultar o banco.
+
+    É montado na primeira consulta e invalidado pelos sinais de Resource
+    (ver bookingbot/signals.py). Como sinais só valem no próprio processo,
+    o índice também expira após RESOURCE_INDEX_TTL segundos para enxergar
+    alterações feitas por outros workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estado = None  # (expira_em, trie, por_nome, padrao, recursos)
+        self._geracao = 0
+
+    def _apelidos(self):
+        apelidos = getattr(settings, "RESOURCE_ALIASES", None)
+        return RECURSOS_MAP if apelidos is None else apelidos
+
+    def _construir(self):
+        recursos = list(Resource.objects.order_by("pk"))
+        por_nome = {}
+        for r in recursos:
+            por_nome[normalizar(r.name)] = r
+            por_nome.setdefault(normalizar(r.slug), r)
+
+        trie = _Trie()
+        for termo, r in por_nome.items():
+            trie.adicionar(termo, r)
+        for apelido, destino in self._apelidos().items():
+            r = por_nome.get(normalizar(destino))
+            if r is not None:
+                trie.adicionar(normalizar(apelido), r)
+
+        padrao = recursos[0] if recursos else None
+        ttl = getattr(settings, "RESOURCE_INDEX_TTL", 300)
+        return (time.monotonic() + ttl, trie, por_nome, padrao, recursos)
+
+    def _obter(self):
+        estado = self._estado
+        if estado is None or time.monotonic() >= estado[0]:
+            with self._lock:
+                estado = self._estado
+                if estado is None or time.monotonic() >= estado[0]:
+                    geracao = self._geracao
+                    estado = self._construir()
+                    # um sinal durante a montagem torna este estado velho
+                    if geracao == self._geracao:
+                        self._estado = estado
+        return estado
+
+    def buscar(self, texto):
+        """Recurso citado no texto (nome, slug ou apelido) ou None."""
+        return self._obter()[1].buscar(normalizar(texto))
+
+    def por_nome(self, nome):
+        return self._obter()[2].get(normalizar(nome))
+
+    def padrao(self):
+        """Recurso usado quando a mensagem não cita nenhum (o de menor id)."""
+        return self._obter()[3]
+
+    def todos(self):
+        return list(self._obter()[4])
+
+    def invalidar(self):
+        self._geracao += 1
+        self._estado = None
+
+
+indice_recursos = IndiceRecursos()
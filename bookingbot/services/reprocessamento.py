@@ -0,0 +1,176 @@
+"""
+Reprocessa mensagens arquivadas (JSONL ou CSV) pelo nlp_v2 e pelo
+classificador de intenção, em streaming: o arquivo é lido em blocos, cada
+bloco vai para um processo do pool (spaCy via nlp.pipe dentro dele) e os
+resultados saem na ordem de entrada, sem carregar o arquivo em memória.
+"""
+import csv
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .nlp_v2 import interpretar_mensagem
+
+
+# mesmos campos aceitos pelo webhook
+CAMPOS_TEXTO = ("body", "text")
+CAMPOS_ID = ("id", "message_id")
+# quando a mensagem foi enviada: referência de "hoje", "amanhã"... na releitura
+CAMPOS_DATA = ("timestamp", "created_at", "sent_at", "date")
+
+
+class LinhasPuladas:
+    """Total de linhas puladas e o número das primeiras `limite` (para o relatório)."""
+
+    def __init__(self, limite=20):
+        self.limite = limite
+        self.total = 0
+        self.primeiras = []
+
+    def anotar(self, linha):
+        self.total += 1
+        if len(self.primeiras) < self.limite:
+            self.primeiras.append(linha)
+
+
+def data_de_referencia(valor):
+    """
+    Dia (fuso do TIME_ZONE) de um timestamp do registro: segundos ou
+    milissegundos desde 1970 (como os gateways mandam) ou data/hora ISO.
+    None se vazio ou ilegível.
+    """
+    if valor in (None, ""):
+        return None
+    try:
+        segundos = float(valor)
+    except (TypeError, ValueError):
+        segundos = None
+    try:
+        if segundos is not None:
+            if segundos > 1e11:  # milissegundos
+                segundos /= 1000
+            return datetime.fromtimestamp(segundos, timezone.get_current_timezone()).date()
+        momento = parse_datetime(str(valor))
+    except (ValueError, OverflowError, OSError):
+        return None
+    if momento is None:
+        try:
+            return parse_date(str(valor))
+        except ValueError:
+            return None
+    if timezone.is_aware(momento):
+        momento = timezone.localtime(momento)
+    return momento.date()
+
+
+def formato_do_arquivo(caminho):
+    return "csv" if str(caminho).lower().endswith(".csv") else "jsonl"
+
+
+def ler_mensagens(arquivo, formato="jsonl", campo=None, invalidas=None, campo_data=None):
+    """
+    Gera (linha, registro) de um arquivo aberto. O registro leva a data de
+    envio (`campo_data`, padrão: o primeiro de CAMPOS_DATA presente) em
+    "hoje", para as datas relativas saírem como no dia. Linhas JSON inválidas ou
+    sem texto são puladas e, se `invalidas` (LinhasPuladas) for passado,
+    anotadas nele.
+    """
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        registros = ((leitor.line_num, r) for r in leitor)
+    else:
+        registros = _jsonl(arquivo, invalidas)
+
+    campos = (campo,) if campo else CAMPOS_TEXTO
+    campos_data = (campo_data,) if campo_data else CAMPOS_DATA
+    for linha, registro in registros:
+        texto = next((registro[c] for c in campos if registro.get(c)), None)
+        if not isinstance(texto, str):
+            if invalidas is not None:
+                invalidas.anotar(linha)
+            continue
+        id_ = next((registro[c] for c in CAMPOS_ID if registro.get(c) not in (None, "")), None)
+        enviada = next((registro[c] for c in campos_data if registro.get(c) not in (None, "")), None)
+        yield linha, {"texto": texto, "id": id_, "hoje": data_de_referencia(enviada)}
+
+
+def _jsonl(arquivo, invalidas):
+    for linha, bruto in enumerate(arquivo, start=1):
+        if not bruto.strip():
+            continue
+        try:
+            registro = json.loads(bruto)
+        except ValueError:
+            registro = None
+        if not isinstance(registro, dict):
+            if invalidas is not None:
+                invalidas.anotar(linha)
+            continue
+        yield linha, registro
+
+
+def em_blocos(iteravel, tamanho):
+    it = iter(iteravel)
+    while bloco := list(islice(it, tamanho)):
+        yield bloco
+
+
+def _preparar_worker():
+    # carrega modelo e spaCy uma vez por processo, antes do primeiro bloco
+    from bookingbot.ia import intent_classifier
+    from .spacy_nlp import get_nlp
+
+    intent_classifier.registry.get()
+    get_nlp()
+
+
+def interpretar_bloco(bloco, batch_size=64):
+    """Resultados de um bloco de (linha, registro): um predict e um nlp.pipe para o bloco todo."""
+    from bookingbot.ia import intent_classifier
+
+    textos = [registro["texto"] for _, registro in bloco]
+    classificados = intent_classifier.interpretar_mensagens(textos, batch_size=batch_size)
+
+    resultados = []
+    for (linha, registro), classificado in zip(bloco, classificados):
+        hoje = registro.get("hoje")
+        parsed = interpretar_mensagem(registro["texto"], hoje)
+        parsed.pop("texto_original")
+        parsed["intent"] = str(parsed["intent"])
+        classificado["intent"] = str(classificado["intent"])
+        resultados.append({
+            "linha": linha,
+            "id": registro["id"],
+            "texto": registro["texto"],
+            "data_referencia": str(hoje) if hoje else None,
+            "nlp_v2": parsed,
+            "classificador": classificado,
+        })
+    return resultados
+
+
+def reprocessar(mensagens, processos=1, tamanho_bloco=1000, batch_size=64):
+    """
+    Gera um resultado por mensagem, na ordem de entrada. Com processos > 1
+    os blocos são distribuídos num pool, com no máximo 2 blocos pendentes
+    por processo (a leitura anda junto com o consumo da saída).
+    """
+    blocos = em_blocos(mensagens, tamanho_bloco)
+    if processos <= 1:
+        for bloco in blocos:
+            yield from interpretar_bloco(bloco, batch_size)
+        return
+
+    with ProcessPoolExecutor(processos, initializer=_preparar_worker) as pool:
+        pendentes = deque()
+        for bloco in blocos:
+            pendentes.append(pool.submit(interpretar_bloco, bloco, batch_size))
+            if len(pendentes) >= 2 * processos:
+                yield from pendentes.popleft().result()
+        while pendentes:
+            yield from pendentes.popleft().result()
@@ -0,0 +1,136 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_save
+
+from ..models import Booking, Resource
+from .metricas import etapa
+
+
+def conflitos(resource, d, inicio, fim):
+    """
+    Reservas confirmadas do recurso que se sobrepõem a [inicio, fim) no dia.
+    Os filtros batem com o índice parcial booking_conf_slot_idx
+    (resource, date, start_time) WHERE status = 'confirmed'.
+    """
+    return Booking.objects.filter(
+        resource=resource,
+        date=d,
+        status="confirmed",
+        start_time__lt=fim,
+        end_time__gt=inicio,
+    )
+
+
+def existe_conflito(resource, d, inicio, fim):
+    return conflitos(resource, d, inicio, fim).exists()
+
+
+def datas_em_conflito(resource, datas, inicio, fim):
+    """
+    Datas (entre `datas`) em que o recurso tem reserva confirmada sobreposta
+    a [inicio, fim): uma consulta só, qualquer que seja o número de datas
+    (date IN (...) sobre o mesmo índice booking_conf_slot_idx).
+    """
+    return set(
+        Booking.objects.filter(
+            resource=resource,
+            date__in=datas,
+            status="confirmed",
+            start_time__lt=fim,
+            end_time__gt=inicio,
+        ).values_list("date", flat=True)
+    )
+
+
+def reservas_confirmadas_do_dia(d):
+    """Reservas confirmadas do dia (usa o índice booking_conf_date_idx)."""
+    return Booking.objects.filter(date=d, status="confirmed")
+
+
+class ConflitoDeHorario(Exception):
+    """O recurso já tem reserva confirmada sobreposta ao horário pedido."""
+
+
+# nome da constraint de exclusão criada no PostgreSQL (migração 0004)
+CONSTRAINT_SEM_SOBREPOSICAO = "booking_no_overlap"
+
+
+def _travar_recurso(resource):
+    """
+    Serializa as reservas de um mesmo recurso até o fim da transação.
+
+    PostgreSQL (e demais bancos com SELECT ... FOR UPDATE): trava a linha do
+    recurso. SQLite não tem lock de linha: um UPDATE inócuo pega o lock de
+    escrita logo no início (equivalente a BEGIN IMMEDIATE), e as outras
+    transações esperam o busy timeout em vez de ler um estado velho.
+    """
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Resource._meta.db_table} SET id = id WHERE id = %s",
+                [resource.pk],
+            )
+    else:
+        list(Resource.objects.select_for_update().filter(pk=resource.pk).values_list("pk", flat=True))
+
+
+def _violou_exclusao(erro):
+    causa = erro.__cause__
+    return getattr(causa, "sqlstate", None) == "23P01" or CONSTRAINT_SEM_SOBREPOSICAO in str(erro)
+
+
+@etapa("reserva")
+def criar_reserva(customer, resource, d, inicio, fim, status="confirmed"):
+    """
+    Cria a reserva de forma atômica mesmo com mensagens concorrentes para o
+    mesmo horário: checagem e INSERT rodam com o recurso travado e, no
+    PostgreSQL, a constraint de exclusão é a última barreira.
+    Levanta ConflitoDeHorario se o horário estiver ocupado.
+    """
+    try:
+        with transaction.atomic():
+            _travar_recurso(resource)
+            if status == "confirmed" and existe_conflito(resource, d, inicio, fim):
+                raise ConflitoDeHorario()
+            return Booking.objects.create(
+                customer=customer,
+                resource=resource,
+                date=d,
+                start_time=inicio,
+                end_time=fim,
+                status=status,
+            )
+    except IntegrityError as e:
+        if _violou_exclusao(e):
+            raise ConflitoDeHorario() from e
+        raise
+
+
+@etapa("reserva")
+def criar_reservas(customer, resource, datas, inicio, fim, ocupadas=()):
+    """
+    Reserva o mesmo horário em várias datas (recorrência, "segunda e quarta")
+    com número fixo de consultas: com o recurso travado, uma consulta acha as
+    datas em conflito e um bulk_create grava as livres. `ocupadas` são datas
+    já sabidamente ocupadas (ex.: Google Calendar). Retorna (reservas criadas,
+    datas em conflito), ambas em ordem de data.
+    """
+    datas = sorted(set(datas))
+    try:
+        with transaction.atomic():
+            _travar_recurso(resource)
+            conflito = datas_em_conflito(resource, datas, inicio, fim) | set(ocupadas)
+            reservas = Booking.objects.bulk_create([
+                Booking(customer=customer, resource=resource, date=d,
+                        start_time=inicio, end_time=fim, status="confirmed")
+                for d in datas if d not in conflito
+            ])
+            # bulk_create não dispara post_save: as agendas em memória e o
+            # cache de disponibilidade são atualizados pelos mesmos receivers
+            for booking in reservas:
+                post_save.send(sender=Booking, instance=booking, created=True, raw=False, using=booking._state.db,
+                               update_fields=None)
+    except IntegrityError as e:
+        if _violou_exclusao(e):
+            raise ConflitoDeHorario() from e
+        raise
+    return reservas, sorted(d for d in datas if d in conflito)
@@ -0,0 +1,109 @@
+"""
+Textos das respostas do bot, compartilhados pelo webhook síncrono e pelo
+assíncrono.
+"""
+
+SEM_RECURSOS = "🚫 Não há salas cadastradas para reserva. Fale com um administrador."
+DATA_HORA_INVALIDA = "❌ Não consegui entender a data ou o horário. Tente novamente no formato dd/mm/aaaa hh:mm."
+CANCELAR_SEM_DADOS = "Para cancelar, preciso da **data e horário** da reserva (Ex: 'cancelar dia 10 às 17h')."
+CANCELAR_INVALIDO = "❌ Data ou horário inválido para o cancelamento."
+CANCELAR_NAO_ENCONTRADA = "Não encontrei nenhuma reserva **ativa** para você nesta data e horário."
+DATAS_PASSADAS = "📅 Todas essas datas já passaram. Diga as próximas datas que quer reservar."
+CONSULTAR_SEM_DATA = "Para consultar a agenda, preciso da data (Ex: 'horários disponíveis amanhã')."
+CONSULTAR_DATA_INVALIDA = "❌ Data inválida. Tente no formato dd/mm/aaaa."
+AJUDA = "🤖 Olá! Sou o bot de reservas do Estúdio. Posso agendar, cancelar ou consultar a disponibilidade.\n\n*Diga 'Reservar Sala A amanhã às 16h' ou 'Ver horários disponíveis hoje'.*"
+
+
+# palpite do classificador (intenção de baixa confiança) → como perguntar
+PALPITES = {
+    "criar_reserva": "fazer uma reserva",
+    "cancelar_reserva": "cancelar uma reserva",
+    "listar_disponibilidade": "ver os horários disponíveis",
+    "remarcar_reserva": "remarcar uma reserva",
+}
+
+
+def esclarecer(palpite=None):
+    if palpite in PALPITES:
+        return (f"🤔 Não tenho certeza se entendi. Você quer *{PALPITES[palpite]}*? "
+                "Me diga o que deseja com a data e o horário (Ex: 'Reservar Sala A amanhã às 16h').")
+    return "🤔 Não entendi. Você quer *reservar*, *cancelar* ou *consultar horários*?\n\n*Ex: 'Ver horários disponíveis hoje'.*"
+
+
+def recurso_nao_encontrado(resource_name):
+    return f"🚫 Não encontrei a sala '{resource_name}'. Por favor, verifique o nome e tente novamente."
+
+
+def reserva_sem_dados(resource):
+    return f"Para reservar a *{resource.name}*, especifique a **data e o horário** (Ex: 'reservar amanhã às 15:00')."
+
+
+def reserva_ocupada(resource, d, start_dt, end_dt, sugestao=None):
+    msg = f"🚫 Desculpe, a sala **{resource.name}** está reservada das {start_dt.strftime('%H:%M')} às {end_dt.strftime('%H:%M')} em {d.strftime('%d/%m')}."
+    if sugestao:
+        return msg + f" O próximo horário livre nesse dia é às *{sugestao}*."
+    return msg + " Consulte a disponibilidade."
+
+
+def reserva_confirmada(resource, d, start_dt, end_dt, duration_minutes):
+    return f"✅ Reserva **Confirmada** na sala **{resource.name}** para {d.strftime('%d/%m')}:\nHorário: *{start_dt.strftime('%H:%M')} às {end_dt.strftime('%H:%M')}* ({duration_minutes} minutos).\nObrigado por reservar!"
+
+
+def _lista_de_datas(datas):
+    return ", ".join(d.strftime('%d/%m') for d in datas)
+
+
+def reservas_confirmadas(resource, reservas, conflitos, start_dt, end_dt):
+    """Resposta de uma reserva em várias datas: as confirmadas e as que já estavam ocupadas."""
+    horario = f"{start_dt.strftime('%H:%M')} às {end_dt.strftime('%H:%M')}"
+    if not reservas:
+        return (f"🚫 Desculpe, a sala **{resource.name}** já está reservada das {horario} em todas as datas "
+                f"pedidas ({_lista_de_datas(conflitos)}). Consulte a disponibilidade.")
+    msg = (f"✅ {len(reservas)} reserva(s) **Confirmada(s)** na sala **{resource.name}**, das *{horario}*:\n"
+           f"{_lista_de_datas(b.date for b in reservas)}.")
+    if conflitos:
+        msg += f"\n🚫 Já ocupadas, não reservadas: {_lista_de_datas(conflitos)}."
+    return msg + "\nObrigado por reservar!"
+
+
+def datas_demais(maximo):
+    return (f"📅 Consigo reservar no máximo {maximo} datas de uma vez. "
+            "Diminua o período (Ex: 'toda terça às 19h por 2 meses').")
+
+
+def reserva_cancelada(d, t):
+    return f"🗑️ Reserva cancelada com sucesso para {d.strftime('%d/%m')} às {t.strftime('%H:%M')}."
+
+
+def disponibilidade(d, busy_slots_by_resource):
+    """
+    Resposta com os horários ocupados do dia ({nome do recurso: ["HH:MM - HH:MM", ...]}).
+    Retorna (mensagem, horários por recurso).
+    """
+    if not busy_slots_by_resource:
+        msg = f"🎉 Ótima notícia! Não há reservas para {d.strftime('%d/%m')}. Todas as salas estão **totalmente disponíveis**!"
+        return msg, busy_slots_by_resource
+
+    msg = f"🗓️ Horários Ocupados em {d.strftime('%d/%m')}:\n\n"
+    for name, slots in busy_slots_by_resource.items():
+        msg += f"**{name}**: {', '.join(slots)}\n"
+
+    msg += "\n*Os demais horários e salas estão livres.*"
+    return msg, busy_slots_by_resource
+
+
+def horarios_livres(d, livres_por_recurso, inicio=None, fim=None):
+    """Resposta com os trechos livres de cada recurso ({nome: ["HH:MM - HH:MM", ...]})."""
+    janela = ""
+    if inicio and fim:
+        janela = f" entre {inicio.strftime('%H:%M')} e {fim.strftime('%H:%M')}"
+    elif inicio:
+        janela = f" a partir das {inicio.strftime('%H:%M')}"
+
+    if not any(livres_por_recurso.values()):
+        return f"😕 Não há horários livres em {d.strftime('%d/%m')}{janela}."
+
+    msg = f"🗓️ Horários Livres em {d.strftime('%d/%m')}{janela}:\n\n"
+    for name, slots in livres_por_recurso.items():
+        msg += f"**{name}**: {', '.join(slots) if slots else 'lotada'}\n"
+    return msg
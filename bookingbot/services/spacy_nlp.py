@@ -0,0 +1,53 @@
+import os
+import threading
+
+
+# Só usamos doc.ents, então o pipeline é carregado sem os componentes
+# que não alimentam o NER (economiza tempo de carga e memória por worker).
+MODELO = os.getenv("SPACY_MODEL", "pt_core_news_sm")
+COMPONENTES_EXCLUIDOS = [
+    "morphologizer", "tagger", "parser", "lemmatizer",
+    "attribute_ruler", "senter", "sentencizer",
+]
+
+_nlp = None
+_carregado = False
+_lock = threading.Lock()
+
+
+def carregar(modelo=MODELO, excluir=COMPONENTES_EXCLUIDOS):
+    """Carrega o pipeline do zero; None se o spaCy/modelo não estiver instalado."""
+    try:
+        import spacy
+        return spacy.load(modelo, exclude=list(excluir))
+    except Exception as e:
+        # sem modelo, o sistema ainda funciona com regex básico
+        print(f"spaCy indisponível ({modelo}):", e)
+        return None
+
+
+def get_nlp():
+    """
+    Pipeline compartilhado pelo processo, carregado na primeira chamada
+    (e não no import dos módulos que o usam).
+    """
+    global _nlp, _carregado
+    if not _carregado:
+        with _lock:
+            if not _carregado:
+                _nlp = carregar()
+                _carregado = True
+    return _nlp
+
+
+def pipe(textos, batch_size=64, n_process=1):
+    """
+    Processa vários textos com nlp.pipe (em lote e, com n_process > 1, em
+    vários processos). Sem spaCy, devolve None para cada texto.
+    """
+    nlp = get_nlp()
+    if nlp is None:
+        for _ in textos:
+            yield None
+        return
+    yield from nlp.pipe(textos, batch_size=batch_size, n_process=n_process)
@@ -1,29 +1,297 @@
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 
+from . import metricas
 
-def enviar_whatsapp(numero, mensagem):
-    """
-    Função simples para enviar mensagem via endpoint HTTP do gateway de WhatsApp.
-    Ajuste o payload conforme o gateway (WPPConnect, WaSender, etc.)
-    """
-    url = settings.WHATSAPP_API_URL
-    token = settings.WHATSAPP_API_TOKEN
+logger = logging.getLogger(__name__)
+
+
+# Respostas em que o gateway não processou o POST (repetir não duplica a mensagem)
+STATUS_REPETIVEIS = (429, 503)
 
-    if not url:
-        # para desenvolvimento, apenas print
-        print(f"[whatsapp] {numero}: {mensagem}")
-        return
 
-    payload = {
-        "token": token,
-        "to": numero,
-        "body": mensagem
-    }
+def _corpo(resp):
+    """
+    JSON da resposta do gateway, ou {} se o corpo vier vazio ou em outro
+    formato: o status 2xx já confirma o envio.
+    """
     try:
-        resp = requests.post(url, json=payload, timeout=10)
-        resp.raise_for_status()
         return resp.json()
-    except Exception as e:
-        print("Erro ao enviar WhatsApp:", e)
-        return None
+    except ValueError:
+        return {}
+
+
+class GatewayStats:
+    """Contadores de chamadas, erros e latência do gateway (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.total_latency = 0.0
+            self.max_latency = 0.0
+            self.last_error = None
+
+    def record(self, latency, error=None):
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if error is not None:
+                self.errors += 1
+                self.last_error = str(error)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency": self.total_latency / self.calls if self.calls else 0.0,
+                "max_latency": self.max_latency,
+                "last_error": self.last_error,
+            }
+
+
+class WhatsAppGateway:
+    """
+    Cliente reutilizável do gateway de WhatsApp.
+
+    Mantém uma requests.Session com pool de conexões keep-alive, então as
+    mensagens não pagam um novo handshake TCP/TLS a cada envio.
+    """
+
+    def __init__(self, url, token=None, batch_url=None, pool_size=10,
+                 connect_timeout=3.05, read_timeout=10, retries=2, backoff_factor=0.5):
+        self.url = url
+        self.token = token
+        self.batch_url = batch_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.stats = GatewayStats()
+
+        # read=0: um POST que chegou ao gateway não é repetido (evita duplicar
+        # mensagens). Pelo status, só 429/503: o gateway recusou sem processar.
+        # Um 502/504 pode vir de um proxy depois de a mensagem ter sido entregue.
+        retry = Retry(
+            total=retries, connect=retries, read=0, status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=STATUS_REPETIVEIS,
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, url, payload):
+        inicio = time.perf_counter()
+        try:
+            with metricas.medir(metricas.whatsapp_segundos):
+                resp = self.session.post(url, json=payload, timeout=self.timeout)
+                resp.raise_for_status()
+                data = _corpo(resp)
+        except Exception as e:
+            self.stats.record(time.perf_counter() - inicio, error=e)
+            raise
+        self.stats.record(time.perf_counter() - inicio)
+        return data
+
+    def send(self, numero, mensagem, raise_on_error=False):
+        if not self.url:
+            # para desenvolvimento, apenas print
+            print(f"[whatsapp] {numero}: {mensagem}")
+            return None
+
+        payload = {
+            "token": self.token,
+            "to": numero,
+            "body": mensagem
+        }
+        try:
+            return self._post(self.url, payload)
+        except Exception as e:
+            if raise_on_error:
+                raise
+            logger.warning("Erro ao enviar WhatsApp para %s: %s", numero, e)
+            return None
+
+    def send_many(self, mensagens, raise_on_error=False):
+        """
+        Envia vários (numero, mensagem). Usa o endpoint de lote do gateway
+        quando configurado; senão faz os envios em paralelo usando o pool.
+        Retorna a lista de respostas na mesma ordem.
+        """
+        mensagens = list(mensagens)
+        if not mensagens:
+            return []
+
+        if self.url and self.batch_url:
+            payload = {
+                "token": self.token,
+                "messages": [{"to": n, "body": m} for n, m in mensagens],
+            }
+            try:
+                data = self._post(self.batch_url, payload)
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                logger.warning("Erro ao enviar lote de WhatsApp (%d mensagens): %s", len(mensagens), e)
+                return [None] * len(mensagens)
+            if isinstance(data, list) and len(data) == len(mensagens):
+                return data
+            return [data] * len(mensagens)
+
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(mensagens))) as pool:
+            return list(pool.map(lambda nm: self.send(nm[0], nm[1], raise_on_error), mensagens))
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncWhatsAppGateway:
+    """
+    Versão assíncrona do cliente (httpx.AsyncClient), para o webhook ASGI e
+    o worker do outbox em modo asyncio. Mesmo payload, pool e contadores.
+    O cliente fica preso ao event loop em que foi criado.
+    """
+
+    def __init__(self, url, token=None, batch_url=None, pool_size=10,
+                 connect_timeout=3.05, read_timeout=10, retries=2):
+        import httpx
+
+        self.url = url
+        self.token = token
+        self.batch_url = batch_url
+        self.pool_size = pool_size
+        self.stats = GatewayStats()
+        # retries do httpx só repetem falhas de conexão (nunca um POST entregue)
+        transport = httpx.AsyncHTTPTransport(
+            retries=retries,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self.client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            url=settings.WHATSAPP_API_URL,
+            token=settings.WHATSAPP_API_TOKEN,
+            batch_url=getattr(settings, "WHATSAPP_API_BATCH_URL", None),
+            pool_size=getattr(settings, "WHATSAPP_POOL_SIZE", 10),
+            connect_timeout=getattr(settings, "WHATSAPP_CONNECT_TIMEOUT", 3.05),
+            read_timeout=getattr(settings, "WHATSAPP_READ_TIMEOUT", 10),
+            retries=getattr(settings, "WHATSAPP_RETRIES", 2),
+        )
+
+    async def _post(self, url, payload):
+        inicio = time.perf_counter()
+        try:
+            with metricas.medir(metricas.whatsapp_segundos):
+                resp = await self.client.post(url, json=payload)
+                resp.raise_for_status()
+                data = _corpo(resp)
+        except Exception as e:
+            self.stats.record(time.perf_counter() - inicio, error=e)
+            raise
+        self.stats.record(time.perf_counter() - inicio)
+        return data
+
+    async def send(self, numero, mensagem, raise_on_error=False):
+        if not self.url:
+            # para desenvolvimento, apenas print
+            print(f"[whatsapp] {numero}: {mensagem}")
+            return None
+
+        payload = {
+            "token": self.token,
+            "to": numero,
+            "body": mensagem
+        }
+        try:
+            return await self._post(self.url, payload)
+        except Exception as e:
+            if raise_on_error:
+                raise
+            logger.warning("Erro ao enviar WhatsApp para %s: %s", numero, e)
+            return None
+
+    async def send_many(self, mensagens, raise_on_error=False):
+        mensagens = list(mensagens)
+        if not mensagens:
+            return []
+
+        if self.url and self.batch_url:
+            payload = {
+                "token": self.token,
+                "messages": [{"to": n, "body": m} for n, m in mensagens],
+            }
+            try:
+                data = await self._post(self.batch_url, payload)
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                logger.warning("Erro ao enviar lote de WhatsApp (%d mensagens): %s", len(mensagens), e)
+                return [None] * len(mensagens)
+            if isinstance(data, list) and len(data) == len(mensagens):
+                return data
+            return [data] * len(mensagens)
+
+        semaforo = asyncio.Semaphore(self.pool_size)
+
+        async def enviar(numero, mensagem):
+            async with semaforo:
+                return await self.send(numero, mensagem, raise_on_error)
+
+        return list(await asyncio.gather(*(enviar(n, m) for n, m in mensagens)))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Cliente compartilhado pelo processo, configurado a partir do settings."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = WhatsAppGateway(
+                    url=settings.WHATSAPP_API_URL,
+                    token=settings.WHATSAPP_API_TOKEN,
+                    batch_url=getattr(settings, "WHATSAPP_API_BATCH_URL", None),
+                    pool_size=getattr(settings, "WHATSAPP_POOL_SIZE", 10),
+                    connect_timeout=getattr(settings, "WHATSAPP_CONNECT_TIMEOUT", 3.05),
+                    read_timeout=getattr(settings, "WHATSAPP_READ_TIMEOUT", 10),
+                    retries=getattr(settings, "WHATSAPP_RETRIES", 2),
+                )
+    return _gateway
+
+
+def enviar_whatsapp(numero, mensagem, raise_on_error=False):
+    """
+    Função simples para enviar mensagem via endpoint HTTP do gateway de WhatsApp.
+    Ajuste o payload conforme o gateway (WPPConnect, WaSender, etc.)
+
+    Com raise_on_error=True a exceção é propagada (usado pelo outbox para
+    decidir se reenvia a mensagem).
+    """
+    return get_gateway().send(numero, mensagem, raise_on_error=raise_on_error)
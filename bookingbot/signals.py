@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Booking, Customer, Resource
+from .services import cache_disponibilidade, clientes, metricas, perfil
+from .services.disponibilidade import motor
+from .services.recursos import indice_recursos
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def invalidar_indice_recursos(sender, instance, **kwargs):
+    indice_recursos.invalidar()
+    # horário de funcionamento pode ter mudado
+    motor.invalidar(instance.pk)
+
+
+# As agendas só mudam depois do commit: uma reserva desfeita por rollback
+# (ex.: ConflitoDeHorario) não chega a ocupar o horário.
+
+def _ao_commitar(booking):
+    anterior = getattr(booking, "_posicao_carregada", None)
+    booking._posicao_carregada = (booking.resource_id, booking.date)
+
+    def aplicar():
+        cache_disponibilidade.invalidar_reserva(booking, anterior)
+        motor.registrar(booking)
+    transaction.on_commit(aplicar)
+
+
+@receiver(post_save, sender=Booking)
+def atualizar_agenda(sender, instance, **kwargs):
+    _ao_commitar(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def remover_da_agenda(sender, instance, **kwargs):
+    pk = instance.pk
+    anterior = getattr(instance, "_posicao_carregada", None)
+
+    def aplicar():
+        cache_disponibilidade.invalidar_reserva(instance, anterior)
+        motor.remover(pk)
+    transaction.on_commit(aplicar)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def esquecer_cliente(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    pk, telefones = instance.pk, (instance.phone, getattr(instance, "_telefone_carregado", None))
+    instance._telefone_carregado = instance.phone
+    transaction.on_commit(lambda: clientes.esquecer(pk, *telefones))
+
+
+@receiver(connection_created)
+def contar_consultas(sender, connection, **kwargs):
+    # consultas por requisição (services/metricas.py) e das requisições
+    # perfiladas (services/perfil.py); sem coleta ativa, só repassam
+    for wrapper in (metricas.contar_consulta, perfil.registrar_consulta):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
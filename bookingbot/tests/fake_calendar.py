@@ -0,0 +1,149 @@
+"""
+Servidor HTTP local que imita o pedaço da API do Google Calendar usado
+pelo CalendarClient: events insert/list/patch/delete, freeBusy e o
+endpoint de lote (/batch/calendar/v3, multipart/mixed).
+"""
+import json
+import re
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from dateutil import parser
+
+
+_EVENTS = re.compile(r"^/calendar/v3/calendars/([^/]+)/events(?:/([^/?]+))?$")
+
+
+class FakeCalendar:
+    def __init__(self):
+        self.eventos = {}  # (calendar_id, event_id) -> evento
+        self.requisicoes = []  # (método, caminho) de cada chamada HTTP recebida
+        self.falhar = set()  # event ids que respondem 500
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.root_url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def iniciar(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def ativos(self, calendar_id="primary"):
+        return {eid: e for (cal, eid), e in self.eventos.items() if cal == calendar_id and e["status"] != "cancelled"}
+
+    # ------------------------------------------------------------------
+    # Uma chamada da API (direta ou dentro de um lote): (status, corpo)
+    # ------------------------------------------------------------------
+
+    def chamar(self, metodo, caminho, corpo):
+        path = urlsplit(caminho).path
+        if metodo == "POST" and path == "/calendar/v3/freeBusy":
+            return 200, self.freebusy(corpo)
+        m = _EVENTS.match(path)
+        if not m:
+            return 404, {"error": {"code": 404, "message": "not found"}}
+        cal, eid = unquote(m.group(1)), m.group(2)
+
+        with self._lock:
+            if eid in self.falhar or (corpo or {}).get("id") in self.falhar:
+                return 500, {"error": {"code": 500, "message": "backend error"}}
+
+            if metodo == "POST" and eid is None:
+                corpo = dict(corpo)
+                if not corpo.get("id"):
+                    self._seq += 1
+                    corpo["id"] = f"evt{self._seq}"
+                if (cal, corpo["id"]) in self.eventos:
+                    return 409, {"error": {"code": 409, "message": "The requested identifier already exists."}}
+                corpo["status"] = "confirmed"
+                self.eventos[(cal, corpo["id"])] = corpo
+                return 200, corpo
+
+            if metodo == "GET" and eid is None:
+                query = parse_qs(urlsplit(caminho).query)
+                inicio, fim = parser.isoparse(query["timeMin"][0]), parser.isoparse(query["timeMax"][0])
+                return 200, {"items": [e for e in self.ativos(cal).values() if self._cruza(e, inicio, fim)]}
+
+            if (cal, eid) not in self.eventos:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if metodo == "PATCH":
+                self.eventos[(cal, eid)].update(corpo)
+                return 200, self.eventos[(cal, eid)]
+            if metodo == "DELETE":
+                if self.eventos[(cal, eid)]["status"] == "cancelled":
+                    return 410, {"error": {"code": 410, "message": "Resource has been deleted"}}
+                self.eventos[(cal, eid)]["status"] = "cancelled"
+                return 204, None
+        return 405, {"error": {"code": 405, "message": "method not allowed"}}
+
+    @staticmethod
+    def _cruza(evento, inicio, fim):
+        a, b = parser.isoparse(evento["start"]["dateTime"]), parser.isoparse(evento["end"]["dateTime"])
+        return a < fim and b > inicio
+
+    def freebusy(self, corpo):
+        inicio, fim = parser.isoparse(corpo["timeMin"]), parser.isoparse(corpo["timeMax"])
+        calendarios = {}
+        for item in corpo["items"]:
+            busy = []
+            for e in self.ativos(item["id"]).values():
+                if self._cruza(e, inicio, fim):
+                    busy.append({"start": e["start"]["dateTime"], "end": e["end"]["dateTime"]})
+            calendarios[item["id"]] = {"busy": busy}
+        return {"kind": "calendar#freeBusy", "calendars": calendarios}
+
+    def lote(self, content_type, corpo):
+        """Executa cada parte application/http do lote e monta a resposta multipart."""
+        mensagem = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + corpo)
+        partes = []
+        for parte in mensagem.get_payload():
+            content_id = parte["Content-ID"].strip("<>")
+            bruto = parte.get_payload(decode=False)
+            linha, _, resto = bruto.partition("\n")
+            metodo, caminho, _ = linha.strip().split(" ", 2)
+            _, _, corpo_parte = resto.replace("\r\n", "\n").partition("\n\n")
+            status, resposta = self.chamar(metodo, caminho, json.loads(corpo_parte) if corpo_parte.strip() else None)
+            texto = "" if resposta is None else json.dumps(resposta)
+            partes.append(
+                f"Content-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n\r\n{texto}\r\n"
+            )
+        boundary = "batch_fake"
+        corpo = "".join(f"--{boundary}\r\n{p}" for p in partes) + f"--{boundary}--\r\n"
+        return f"multipart/mixed; boundary={boundary}", corpo.encode()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _responder(self):
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                corpo = self.rfile.read(tamanho) if tamanho else b""
+                with fake._lock:
+                    fake.requisicoes.append((self.command, urlsplit(self.path).path))
+
+                if urlsplit(self.path).path == "/batch/calendar/v3":
+                    content_type, dados = fake.lote(self.headers["Content-Type"], corpo)
+                    status = 200
+                else:
+                    status, resposta = fake.chamar(self.command, self.path, json.loads(corpo) if corpo else None)
+                    content_type, dados = "application/json", (b"" if resposta is None else json.dumps(resposta).encode())
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _responder
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+from datetime import date, time
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from bookingbot.models import Booking, Customer, Resource
+
+
+class BookingApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        sala = Resource.objects.create(name="Sala A", slug="sala-a")
+        customer = Customer.objects.create(phone="+5511999990001", name="Ana")
+        # vários empates em (date, start_time) para exercitar o desempate por id
+        Booking.objects.bulk_create([
+            Booking(customer=customer, resource=sala, date=date(2030, 1, 1 + n // 4),
+                    start_time=time(8 + n % 2), end_time=time(9 + n % 2), status="confirmed")
+            for n in range(10)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_paginacao_por_chave(self):
+        ids, url = [], "/api/bookings/?page_size=3"
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            self.assertLessEqual(len(data["results"]), 3)
+            ids += [b["id"] for b in data["results"]]
+            url = data["next"]
+
+        esperado = list(Booking.objects.order_by("date", "start_time", "id").values_list("id", flat=True))
+        self.assertEqual(ids, esperado)
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get("/api/bookings/?cursor=lixo").status_code, 404)
+
+    def entrar_como_admin(self):
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+
+    def test_exportacao_exige_admin(self):
+        self.assertEqual(self.client.get("/api/bookings/export.csv").status_code, 403)
+        self.client.force_login(User.objects.create_user("comum"))
+        self.assertEqual(self.client.get("/api/bookings/export.ndjson").status_code, 403)
+
+    def test_exportacao_ndjson(self):
+        self.entrar_como_admin()
+        # sessão + usuário + a exportação inteira numa consulta só
+        with self.assertNumQueries(3):
+            resp = self.client.get("/api/bookings/export.ndjson?date_from=2030-01-02")
+            linhas = [json.loads(l) for l in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        self.assertEqual(len(linhas), 6)
+        self.assertEqual(linhas[0]["resource"], "Sala A")
+        self.assertEqual(linhas[0]["customer_phone"], "+5511999990001")
+        self.assertEqual(linhas[0]["date"], "2030-01-02")
+
+    def test_exportacao_csv(self):
+        self.entrar_como_admin()
+        resp = self.client.get("/api/bookings/export.csv?status=confirmed")
+        linhas = list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode())))
+        self.assertEqual(linhas[0][:3], ["id", "date", "start_time"])
+        self.assertEqual(len(linhas), 11)
+        self.assertEqual(self.client.get("/api/bookings/export.xml").status_code, 404)
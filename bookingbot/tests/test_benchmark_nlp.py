@@ -0,0 +1,62 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from bookingbot.management.commands.benchmark_nlp import DATASETS, acuracia_f1, carregar_dataset, regressoes
+
+
+def _resultado(msg_s=1000.0, p95=1.0, f1=0.9):
+    return {"commit": "abc", "extratores": {"nlp_v2": {
+        "msg_s": msg_s,
+        "latencia_ms": {"p95": p95},
+        "qualidade": {"holdout": {"f1_macro": f1}},
+    }}}
+
+
+class BenchmarkNlpTests(SimpleTestCase):
+
+    def test_holdout_usa_os_rotulos_do_treino(self):
+        treino = {rotulo for _, rotulo in carregar_dataset(DATASETS["treino"])}
+        holdout = carregar_dataset(DATASETS["holdout"])
+        self.assertTrue(holdout)
+        self.assertLessEqual({rotulo for _, rotulo in holdout}, treino)
+        # holdout não repete frases do treino
+        self.assertFalse({t for t, _ in holdout} & {t for t, _ in carregar_dataset(DATASETS["treino"])})
+
+    def test_acuracia_e_f1_macro(self):
+        r = acuracia_f1(["a", "a", "b", "b"], ["a", "b", "b", "b"])
+        self.assertEqual(r["acuracia"], 0.75)
+        # F1(a) = 2/3, F1(b) = 4/5
+        self.assertEqual(r["f1_macro"], round((2 / 3 + 4 / 5) / 2, 4))
+
+    def test_regressoes(self):
+        base = _resultado()
+        self.assertEqual(regressoes(base, _resultado(msg_s=900, p95=1.1, f1=0.895)), [])
+        problemas = regressoes(base, _resultado(msg_s=700, p95=2.0, f1=0.8))
+        self.assertEqual([nome for nome, _ in problemas], ["nlp_v2"] * 3)
+        # variação de microssegundos não conta como regressão de latência
+        self.assertEqual(regressoes(_resultado(p95=0.01), _resultado(p95=0.03)), [])
+
+    def test_comando_grava_json_e_compara(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            saida = Path(pasta) / "bench.json"
+            call_command("benchmark_nlp", extrator=["nlp_v2"], repeticoes=2, saida=str(saida), stdout=io.StringIO())
+            resultado = json.loads(saida.read_text(encoding="utf-8"))
+
+            r = resultado["extratores"]["nlp_v2"]
+            self.assertEqual(set(r["latencia_ms"]), {"p50", "p95", "p99", "max", "media"})
+            self.assertEqual(set(r["qualidade"]), {"treino", "holdout"})
+            self.assertGreater(r["msg_s"], 0)
+
+            # linha de base bem melhor que o possível: a comparação falha
+            resultado["extratores"]["nlp_v2"]["qualidade"]["holdout"]["f1_macro"] = 1.0
+            base = Path(pasta) / "base.json"
+            base.write_text(json.dumps(resultado), encoding="utf-8")
+            with self.assertRaises(CommandError):
+                call_command("benchmark_nlp", extrator=["nlp_v2"], repeticoes=1, saida="-",
+                             comparar=str(base), stdout=io.StringIO(), stderr=io.StringIO())
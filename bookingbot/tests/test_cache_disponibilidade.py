@@ -0,0 +1,78 @@
+from datetime import date, time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from bookingbot.models import Booking, Customer, Resource
+from bookingbot.services import cache_disponibilidade
+from bookingbot.services.disponibilidade import consultar_disponibilidade, motor
+
+
+class CacheDisponibilidadeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        motor.invalidar()
+        cache_disponibilidade.stats.reset()
+        self.sala_a = Resource.objects.create(name="Sala A", slug="sala-a")
+        self.sala_b = Resource.objects.create(name="Sala B", slug="sala-b")
+        self.customer = Customer.objects.create(phone="+5511999990001")
+        self.dia = date(2030, 5, 10)
+
+    def tearDown(self):
+        cache.clear()
+        motor.invalidar()
+
+    def consultar(self, **kwargs):
+        return consultar_disponibilidade(self.dia, [self.sala_a, self.sala_b], **kwargs)
+
+    def reservar(self, resource, inicio, dia=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                customer=self.customer, resource=resource, date=dia or self.dia,
+                start_time=time(inicio), end_time=time(inicio + 1), status="confirmed")
+
+    def test_resposta_em_cache_e_invalidacao(self):
+        self.reservar(self.sala_a, 10)
+        primeira = self.consultar()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.consultar(), primeira)
+
+        self.reservar(self.sala_b, 15)
+        msg, payload = self.consultar()
+        self.assertEqual(payload["slots"], {"Sala A": ["10:00 - 11:00"], "Sala B": ["15:00 - 16:00"]})
+
+        snapshot = cache_disponibilidade.stats.snapshot()
+        self.assertEqual(snapshot["resposta"]["hits"], 1)
+        self.assertEqual(snapshot["resposta"]["misses"], 2)
+
+    def test_invalida_so_o_recurso_alterado(self):
+        self.consultar()
+        self.reservar(self.sala_a, 10)
+        self.assertIsNone(cache.get(cache_disponibilidade.chave_agenda(self.sala_a.pk, self.dia)))
+        self.assertEqual(cache.get(cache_disponibilidade.chave_agenda(self.sala_b.pk, self.dia)), [])
+
+    def test_reserva_movida_invalida_o_dia_antigo(self):
+        booking = self.reservar(self.sala_a, 10)
+        self.consultar()
+
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.date = date(2030, 5, 11)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(self.consultar()[1]["slots"], {})
+
+    def test_horario_de_funcionamento_novo_descarta_resposta(self):
+        livres = lambda: consultar_disponibilidade(self.dia, [self.sala_a], so_livres=True)[1]["free"]
+        self.assertEqual(livres(), {"Sala A": ["08:00 - 22:00"]})
+        self.sala_a.closes_at = time(18)
+        self.sala_a.save()
+        self.assertEqual(livres(), {"Sala A": ["08:00 - 18:00"]})
+
+    def test_estatisticas_so_para_admin(self):
+        url = "/api/cache/availability/"
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_superuser("admin", "a@a.com", "x"))
+        self.consultar()
+        self.assertEqual(self.client.get(url).json()["resposta"]["misses"], 1)
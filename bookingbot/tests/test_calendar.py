@@ -0,0 +1,238 @@
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+import httplib2
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bookingbot.models import Booking, Customer, Resource
+from bookingbot.services import calendar
+from bookingbot.services.calendar import CalendarClient, id_do_evento, sincronizar_reservas
+from bookingbot.services.disponibilidade import (
+    consultar_disponibilidade, datas_ocupadas_no_google, motor, ocupacao_do_dia, recursos_livres, sugerir_horario,
+)
+from bookingbot.services.recursos import indice_recursos
+
+from .fake_calendar import FakeCalendar
+
+
+class CalendarSyncTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeCalendar().iniciar()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.parar()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.fake.eventos.clear()
+        self.fake.requisicoes.clear()
+        self.fake.falhar.clear()
+        self.client = CalendarClient("primary", http_factory=httplib2.Http, root_url=self.fake.root_url)
+        self.sala = Resource.objects.create(name="Sala A", slug="sala-a")
+        self.customer = Customer.objects.create(phone="+5511999990001", name="Ana")
+        self.amanha = timezone.localdate() + timedelta(days=1)
+
+    def reservas(self, n):
+        return Booking.objects.bulk_create([
+            Booking(customer=self.customer, resource=self.sala, date=self.amanha + timedelta(days=i // 10),
+                    start_time=time(8 + i % 10), end_time=time(9 + i % 10), status="confirmed")
+            for i in range(n)
+        ])
+
+    def test_insere_em_lotes_e_preenche_event_id(self):
+        self.reservas(60)
+        with mock.patch.object(calendar, "build", wraps=calendar.build) as build:
+            self.assertEqual(sincronizar_reservas(self.client), (60, 0, 0))
+            self.assertEqual(sincronizar_reservas(self.client), (0, 0, 0))
+        build.assert_called_once()
+
+        # 60 inserções em 2 idas e voltas (lotes de 50)
+        self.assertEqual(self.fake.requisicoes, [("POST", "/batch/calendar/v3")] * 2)
+        self.assertFalse(Booking.objects.filter(google_event_id__isnull=True).exists())
+        self.assertEqual(len(self.fake.ativos()), 60)
+        evento = self.fake.ativos()[id_do_evento(Booking.objects.first())]
+        self.assertTrue(evento["summary"].startswith("Sala A"))
+
+    def test_cancelamento_remove_o_evento(self):
+        booking = self.reservas(1)[0]
+        sincronizar_reservas(self.client)
+
+        Booking.objects.filter(pk=booking.pk).update(status="canceled")
+        self.assertEqual(sincronizar_reservas(self.client), (0, 1, 0))
+        self.assertEqual(self.fake.ativos(), {})
+        self.assertIsNone(Booking.objects.get(pk=booking.pk).google_event_id)
+
+        # reconfirmada: o id determinístico já existe (409) e o evento é restaurado
+        Booking.objects.filter(pk=booking.pk).update(status="confirmed")
+        self.assertEqual(sincronizar_reservas(self.client), (1, 0, 0))
+        self.assertIn(id_do_evento(booking), self.fake.ativos())
+
+    def test_falha_parcial_fica_para_o_proximo_ciclo(self):
+        ok, falha = self.reservas(2)
+        self.fake.falhar.add(id_do_evento(falha))
+
+        self.assertEqual(sincronizar_reservas(self.client), (1, 0, 1))
+        falha.refresh_from_db()
+        self.assertIsNone(falha.google_event_id)
+        self.assertEqual(falha.google_sync_attempts, 1)
+        self.assertIn("500", falha.google_sync_error)
+
+        # em backoff: fica fora do próximo ciclo
+        self.fake.falhar.clear()
+        self.assertEqual(sincronizar_reservas(self.client), (0, 0, 0))
+
+        Booking.objects.filter(pk=falha.pk).update(google_sync_retry_at=timezone.now())
+        self.assertEqual(sincronizar_reservas(self.client), (1, 0, 0))
+        falha.refresh_from_db()
+        self.assertEqual((falha.google_sync_attempts, falha.google_sync_retry_at, falha.google_sync_error), (0, None, ""))
+
+    def test_reserva_que_sempre_falha_nao_trava_a_fila(self):
+        venenos = self.reservas(3)
+        for booking in venenos:
+            self.fake.falhar.add(id_do_evento(booking))
+        outras = Booking.objects.bulk_create([
+            Booking(customer=self.customer, resource=self.sala, date=self.amanha + timedelta(days=1),
+                    start_time=time(h), end_time=time(h + 1), status="confirmed")
+            for h in (8, 9)
+        ])
+
+        # janela de 3: as três primeiras falham e saem da frente da fila
+        self.assertEqual(sincronizar_reservas(self.client, limite=3), (0, 0, 3))
+        self.assertEqual(sincronizar_reservas(self.client, limite=3), (2, 0, 0))
+        self.assertEqual(set(self.fake.ativos()), {id_do_evento(b) for b in outras})
+
+        # a segunda falha seguida espera o dobro
+        Booking.objects.filter(pk=venenos[0].pk).update(google_sync_retry_at=timezone.now())
+        antes = timezone.now()
+        self.assertEqual(sincronizar_reservas(self.client, limite=3), (0, 0, 1))
+        veneno = Booking.objects.get(pk=venenos[0].pk)
+        self.assertEqual(veneno.google_sync_attempts, 2)
+        self.assertGreaterEqual(veneno.google_sync_retry_at, antes + timedelta(seconds=120))
+
+    def test_chamadas_diretas(self):
+        inicio = timezone.now().replace(tzinfo=None)
+        self.assertTrue(self.client.verificar_disponibilidade(inicio, inicio + timedelta(hours=1)))
+        self.assertEqual(self.client.criar_evento("Teste", inicio, inicio + timedelta(hours=1)), "evt1")
+        self.assertFalse(self.client.verificar_disponibilidade(inicio, inicio + timedelta(hours=1)))
+
+
+@override_settings(USE_GOOGLE_CALENDAR=True)
+class FreeBusyTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeCalendar().iniciar()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.parar()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        motor.invalidar()
+        indice_recursos.invalidar()
+        self.fake.eventos.clear()
+        self.fake.requisicoes.clear()
+        self.client = CalendarClient("primary", http_factory=httplib2.Http, root_url=self.fake.root_url)
+        patcher = mock.patch.object(calendar, "get_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.salas = [
+            Resource.objects.create(name=f"Sala {i}", slug=f"sala-{i}", calendar_id=f"sala{i}@group")
+            for i in range(5)
+        ]
+        self.customer = Customer.objects.create(phone="+5511999990001")
+        self.dia = timezone.localdate() + timedelta(days=1)
+
+    def tearDown(self):
+        cache.clear()
+        motor.invalidar()
+        indice_recursos.invalidar()
+
+    def evento_externo(self, sala, inicio, fim, calendar_id=None):
+        base = datetime.combine(self.dia, time())
+        self.client.service.events().insert(
+            calendarId=calendar_id or sala.calendar_id,
+            body=self.client.evento("Externo", base + timedelta(hours=inicio), base + timedelta(hours=fim)),
+        ).execute()
+        self.fake.requisicoes.clear()
+
+    def test_uma_consulta_para_todas_as_salas(self):
+        self.evento_externo(self.salas[1], 14, 16)
+        Booking.objects.create(customer=self.customer, resource=self.salas[0], date=self.dia,
+                               start_time=time(15), end_time=time(16), status="confirmed")
+
+        livres = recursos_livres(self.salas, self.dia, time(15), time(16))
+        self.assertEqual(livres, self.salas[2:])
+        self.assertEqual(self.fake.requisicoes, [("POST", "/calendar/v3/freeBusy")])
+
+        # mesmo dia: resposta do cache, sem nova chamada
+        self.assertEqual(ocupacao_do_dia(self.salas, self.dia)[self.salas[1].pk], [(14 * 60, 16 * 60)])
+        self.assertEqual(len(self.fake.requisicoes), 1)
+
+    def test_reserva_sem_sala_escolhe_a_primeira_livre(self):
+        self.evento_externo(self.salas[0], 9, 12)
+        resp = APIClient().post(
+            "/webhook/", {"from": self.customer.phone, "body": f"reservar {self.dia:%d/%m/%Y} às 10h"}, format="json")
+        self.assertEqual(resp.json()["status"], "confirmed")
+        self.assertEqual(Booking.objects.get(pk=resp.json()["booking_id"]).resource, self.salas[1])
+
+        # sala citada ocupada no Google
+        resp = APIClient().post(
+            "/webhook/", {"from": self.customer.phone, "body": f"reservar sala 0 {self.dia:%d/%m/%Y} às 10h"}, format="json")
+        self.assertEqual(resp.json()["status"], "busy")
+
+    def test_horarios_livres_e_sugestao_pulam_o_google(self):
+        sala = self.salas[0]
+        self.evento_externo(sala, 10, 12)
+        Booking.objects.create(customer=self.customer, resource=sala, date=self.dia,
+                               start_time=time(9), end_time=time(10), status="confirmed")
+
+        _, payload = consultar_disponibilidade(self.dia, [sala], time(8), time(14))
+        self.assertEqual(payload["free"], {sala.name: ["08:00 - 09:00", "12:00 - 14:00"]})
+
+        # sem janela (resposta em cache) e a lista de ocupados também
+        _, payload = consultar_disponibilidade(self.dia, [sala], so_livres=True)
+        self.assertNotIn("10:00", " ".join(payload["free"][sala.name]))
+        _, payload = consultar_disponibilidade(self.dia, self.salas[:1])
+        self.assertEqual(payload["slots"], {sala.name: ["09:00 - 12:00"]})
+
+        self.assertEqual(sugerir_horario(sala, self.dia, 60, time(9)), "12:00")
+        self.assertEqual(sugerir_horario(self.salas[1], self.dia, 60, time(9)), "09:00")
+        self.assertEqual([r for r in self.fake.requisicoes if r[1].endswith("freeBusy")],
+                         [("POST", "/calendar/v3/freeBusy")] * 2)
+
+    def test_agenda_geral_compartilhada_nao_ocupa_as_outras_salas(self):
+        # salas sem agenda própria: os eventos de reserva de todas caem na agenda geral
+        a, b = [Resource.objects.create(name=f"Geral {n}", slug=f"geral-{n}") for n in "ab"]
+        booking = Booking.objects.create(customer=self.customer, resource=a, date=self.dia,
+                                         start_time=time(10), end_time=time(11), status="confirmed")
+        sincronizar_reservas(self.client)
+        self.assertIn(id_do_evento(booking), self.fake.ativos("primary"))
+        self.fake.requisicoes.clear()
+
+        self.assertEqual(recursos_livres([a, b], self.dia, time(10), time(11)), [b])
+        self.assertEqual(ocupacao_do_dia([a, b], self.dia)[b.pk], [])
+        self.assertEqual(self.fake.requisicoes, [("GET", "/calendar/v3/calendars/primary/events")])
+
+        # evento criado à mão na agenda geral ocupa as salas que a usam
+        cache.clear()
+        self.evento_externo(a, 14, 15, calendar_id="primary")
+        self.assertEqual(recursos_livres([a, b, self.salas[0]], self.dia, time(14), time(15)), [self.salas[0]])
+        self.assertEqual(sorted(self.fake.requisicoes),
+                         [("GET", "/calendar/v3/calendars/primary/events"), ("POST", "/calendar/v3/freeBusy")])
+
+        # recorrente na agenda geral: só o evento à mão conta
+        self.assertEqual(datas_ocupadas_no_google(b, [self.dia, self.dia + timedelta(days=7)], time(10), time(15)),
+                         {self.dia})
+        self.assertEqual(datas_ocupadas_no_google(b, [self.dia], time(10), time(11)), set())
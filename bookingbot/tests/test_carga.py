@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.cache import cache
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from bookingbot.models import OutboundMessage, Resource
+from bookingbot.services import carga, clientes, nlp_v2
+from bookingbot.services.whatsapp import WhatsAppGateway
+
+
+class GeradorMensagensTests(SimpleTestCase):
+
+    def test_deterministico_e_variado(self):
+        a, tipos = carga.gerar_mensagens(200, telefones=30, seed=7, hoje=date(2026, 1, 5))
+        b, _ = carga.gerar_mensagens(200, telefones=30, seed=7, hoje=date(2026, 1, 5))
+        self.assertEqual(a, b)
+        self.assertEqual(set(tipos), set(carga.PESOS))
+        self.assertEqual(len({p["id"] for p in a}), 200)
+        telefones = {p["from"] for p in a}
+        self.assertTrue(all(t.startswith(carga.PREFIXO_TELEFONE) for t in telefones))
+        self.assertGreater(len(telefones), 20)
+
+    def test_intencao_reconhecida(self):
+        payloads, tipos = carga.gerar_mensagens(300, seed=3)
+        for payload, tipo in zip(payloads, tipos):
+            resultado = nlp_v2.interpretar_mensagem(payload["body"])
+            self.assertEqual(resultado["intent"], carga.INTENCOES.get(tipo, "desconhecido"), payload["body"])
+            if tipo != "saudacao":
+                self.assertTrue(resultado["date"], payload["body"])
+
+    def test_resumo(self):
+        resumo = carga.resumir([float(i) for i in range(1, 101)], Counter({200: 98, 503: 1, "ConnectError": 1}), 2.0)
+        self.assertEqual(resumo["req_s"], 50.0)
+        self.assertEqual(resumo["erros"], 2)
+        self.assertEqual(resumo["taxa_erro"], 0.02)
+        self.assertEqual(resumo["latencia_ms"]["p50"], 50.5)
+        self.assertEqual(resumo["latencia_ms"]["max"], 100.0)
+
+
+class GatewayFalsoTests(SimpleTestCase):
+
+    def test_latencia_erros_e_lote(self):
+        with carga.GatewayFalso(latencia_ms=30, taxa_erro=0.5, seed=1) as gateway:
+            cliente = WhatsAppGateway(f"{gateway.url}/send", batch_url=f"{gateway.url}/batch", retries=0)
+            inicio = time.perf_counter()
+            with self.assertLogs("bookingbot.services.whatsapp", "WARNING"):
+                respostas = [cliente.send("+5511999990001", "oi") for _ in range(20)]
+            self.assertGreaterEqual(time.perf_counter() - inicio, 20 * 0.03)
+            self.assertEqual(cliente.send_many([("+5511999990001", "a"), ("+5511999990002", "b")])[0], {"ok": True})
+            estado = gateway.snapshot()
+
+        erros = respostas.count(None)
+        self.assertTrue(0 < erros < 20)
+        self.assertEqual(estado["chamadas"], 21)
+        self.assertEqual(estado["erros"], erros)
+        self.assertEqual(estado["mensagens"], 20 - erros + 2)
+
+
+class DisparoWebhookTests(LiveServerTestCase):
+
+    def setUp(self):
+        cache.clear()
+        clientes.cache.limpar()
+        Resource.objects.create(name="Sala A", slug="sala-a")
+
+    def tearDown(self):
+        clientes.cache.limpar()
+
+    def test_mede_o_webhook(self):
+        payloads, _ = carga.gerar_mensagens(12, telefones=4, seed=5)
+        latencias, status, duracao = asyncio.run(
+            carga.disparar(f"{self.live_server_url}/webhook/", payloads, concorrencia=2))
+        resumo = carga.resumir(latencias, status, duracao)
+        self.assertEqual(resumo["requisicoes"], 12)
+        self.assertEqual(resumo["status"], {"200": 12})
+        self.assertGreater(resumo["req_s"], 0)
+        self.assertEqual(carga.estado_outbox(), {"pending": OutboundMessage.objects.count()})
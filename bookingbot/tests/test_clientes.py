@@ -0,0 +1,215 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from bookingbot.models import Booking, Customer, OutboundMessage, Resource
+from bookingbot.services import clientes
+from bookingbot.services.clientes import normalizar_telefone, obter_cliente
+from bookingbot.services.disponibilidade import motor
+from bookingbot.services.recursos import indice_recursos
+
+
+class NormalizacaoTests(SimpleTestCase):
+
+    def test_formatos_dos_gateways(self):
+        for bruto in (
+            "+5511999990001",
+            "5511999990001",
+            "5511999990001@c.us",
+            "5511999990001:12@s.whatsapp.net",
+            "+55 (11) 99999-0001",
+            "005511999990001",
+            "(11) 99999-0001",
+            "011 99999-0001",
+        ):
+            self.assertEqual(normalizar_telefone(bruto), "+5511999990001", bruto)
+
+    def test_outro_pais_e_ddi_padrao(self):
+        self.assertEqual(normalizar_telefone("+1 415 555 0100"), "+14155550100")
+        self.assertEqual(normalizar_telefone("(11) 99999-0001", ddi="351"), "+35111999990001")
+        self.assertEqual(normalizar_telefone("11999990001", ddi=""), "+11999990001")
+
+    def test_invalidos(self):
+        for bruto in (None, "", "abc", "123", "+0011999990001", "9" * 16):
+            self.assertIsNone(normalizar_telefone(bruto), bruto)
+
+
+class ClienteTests(TestCase):
+    TELEFONE = "+5511999990001"
+
+    def setUp(self):
+        clientes.cache.limpar()
+        cache.clear()
+
+    def tearDown(self):
+        clientes.cache.limpar()
+        cache.clear()
+
+    def test_primeiro_contato_numa_consulta_depois_cache(self):
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            customer = obter_cliente(self.TELEFONE)
+        self.assertEqual(Customer.objects.get(phone=self.TELEFONE).pk, customer.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(obter_cliente(self.TELEFONE).pk, customer.pk)
+        self.assertEqual(clientes.cache.hits, 1)
+
+    def test_cliente_existente(self):
+        existente = Customer.objects.create(phone=self.TELEFONE, name="Ana")
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(2):
+            customer = obter_cliente(self.TELEFONE)
+        self.assertEqual(customer.pk, existente.pk)
+        self.assertEqual(Customer.objects.count(), 1)
+        # campos fora do cache são carregados se usados
+        self.assertEqual(customer.name, "Ana")
+
+    def test_rollback_nao_guarda_no_cache(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            obter_cliente(self.TELEFONE)
+            raise RuntimeError
+        self.assertFalse(Customer.objects.exists())
+        self.assertIsNone(clientes.cache.buscar(self.TELEFONE, None))
+
+    def test_apagar_ou_trocar_telefone_tira_do_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            customer = Customer.objects.get(pk=obter_cliente(self.TELEFONE).pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            customer.phone = "+5511999990002"
+            customer.save()
+        self.assertIsNone(clientes.cache.buscar(self.TELEFONE, None))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            obter_cliente("+5511999990002")
+        with self.captureOnCommitCallbacks(execute=True):
+            customer.delete()
+        self.assertIsNone(clientes.cache.buscar("+5511999990002", None))
+
+    @override_settings(CUSTOMER_CACHE="default")
+    def test_cache_compartilhado_entre_workers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            customer = obter_cliente(self.TELEFONE)
+        clientes.cache.limpar()  # outro processo: LRU vazio
+        with self.assertNumQueries(0):
+            self.assertEqual(obter_cliente(self.TELEFONE).pk, customer.pk)
+
+
+class WebhookClienteTests(TestCase):
+
+    def setUp(self):
+        clientes.cache.limpar()
+        cache.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        clientes.cache.limpar()
+        cache.clear()
+
+    def post(self, phone, texto="oi"):
+        return self.client.post("/webhook/", {"from": phone, "body": texto}, format="json")
+
+    def test_formatos_diferentes_mesmo_cliente(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.post("5511999990001@c.us").status_code, 200)
+
+        tabela = Customer._meta.db_table
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.post("+55 (11) 99999-0001").status_code, 200)
+        self.assertFalse([q for q in consultas.captured_queries if tabela in q["sql"]])
+
+        self.assertEqual(list(Customer.objects.values_list("phone", flat=True)), ["+5511999990001"])
+        # a resposta vai para o endereço que o gateway mandou
+        self.assertEqual(
+            list(OutboundMessage.objects.values_list("phone", flat=True)),
+            ["5511999990001@c.us", "+55 (11) 99999-0001"])
+
+    def test_telefone_invalido(self):
+        resp = self.post("loadtest-1")
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(Customer.objects.exists())
+
+    def test_benchmark(self):
+        saida = StringIO()
+        call_command("benchmark_clientes", mensagens=40, telefones=5, stdout=saida)
+        self.assertIn("cache + upsert", saida.getvalue())
+        self.assertFalse(Customer.objects.exists())
+
+
+class ClienteApagadoTests(TransactionTestCase):
+    """Cliente apagado por outro worker: o id velho no cache deste não derruba a reserva."""
+
+    def setUp(self):
+        clientes.cache.limpar()
+        cache.clear()
+        indice_recursos.invalidar()
+        motor.invalidar()
+        Resource.objects.create(name="Sala A", slug="sala-a")
+
+    def tearDown(self):
+        clientes.cache.limpar()
+        cache.clear()
+        indice_recursos.invalidar()
+        motor.invalidar()
+
+    def post(self, texto):
+        return APIClient().post("/webhook/", {"from": "+5511999990001", "body": texto}, format="json").json()
+
+    def test_reserva_recria_o_cliente(self):
+        self.assertEqual(self.post("reservar sala a dia 10/01/2030 às 9h")["status"], "confirmed")
+        antigo = Customer.objects.get().pk
+        # apagado em outro processo: o LRU deste continua com o id
+        Customer.objects.filter(pk=antigo).delete()
+        clientes.cache.guardar("+5511999990001", antigo)
+
+        data = self.post("reservar sala a dia 10/01/2030 às 15h")
+        self.assertEqual(data["status"], "confirmed")
+        novo = Customer.objects.get()
+        self.assertNotEqual(novo.pk, antigo)
+        self.assertEqual(Booking.objects.get(pk=data["booking_id"]).customer, novo)
+        self.assertEqual(clientes.cache.buscar("+5511999990001", None), novo.pk)
+
+
+class MigracaoTelefonesTests(TransactionTestCase):
+    """0009: telefones antigos passam para E.164 e duplicados são unidos."""
+
+    antes = [("bookingbot", "0008_resource_calendar_id")]
+    depois = [("bookingbot", "0009_customer_phone_e164")]
+
+    def migrar(self, alvo):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(alvo)
+        return executor.loader.project_state(alvo).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_normaliza_e_une_duplicados(self):
+        apps = self.migrar(self.antes)
+        Customer = apps.get_model("bookingbot", "Customer")
+        Booking = apps.get_model("bookingbot", "Booking")
+        Resource = apps.get_model("bookingbot", "Resource")
+        sala = Resource.objects.create(name="Sala A", slug="sala-a")
+        novo = Customer.objects.create(phone="+5511999990001")
+        antigo = Customer.objects.create(phone="(11) 99999-0001", name="Ana")
+        outro = Customer.objects.create(phone="5511999990002@c.us")
+        invalido = Customer.objects.create(phone="abc")
+        for n, customer in enumerate((novo, antigo, antigo, outro)):
+            Booking.objects.create(customer=customer, resource=sala, date="2030-01-01",
+                                   start_time=f"{8 + n}:00", end_time=f"{9 + n}:00", status="confirmed")
+
+        apps = self.migrar(self.depois)
+        Customer = apps.get_model("bookingbot", "Customer")
+        Booking = apps.get_model("bookingbot", "Booking")
+        self.assertEqual(
+            sorted(Customer.objects.values_list("pk", "phone", "name")),
+            [(novo.pk, "+5511999990001", "Ana"), (outro.pk, "+5511999990002", ""), (invalido.pk, "abc", "")],
+        )
+        self.assertEqual(Booking.objects.filter(customer_id=novo.pk).count(), 3)
+        self.assertEqual(Booking.objects.filter(customer_id=outro.pk).count(), 1)
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bookingbot.models import Booking, OutboundMessage, ProcessedMessage, Resource
+from bookingbot.services import dedupe
+from bookingbot.services.disponibilidade import motor
+from bookingbot.services.recursos import indice_recursos
+
+
+class DedupeTests(TestCase):
+
+    def setUp(self):
+        dedupe.vistos.limpar()
+        indice_recursos.invalidar()
+        motor.invalidar()
+        cache.clear()
+        Resource.objects.create(name="Sala A", slug="sala-a")
+        self.client = APIClient()
+
+    def tearDown(self):
+        dedupe.vistos.limpar()
+        indice_recursos.invalidar()
+        motor.invalidar()
+        cache.clear()
+
+    def post(self, message_id, texto="reservar sala a amanhã às 15h"):
+        resp = self.client.post(
+            "/webhook/", {"id": message_id, "from": "+5511999990001", "body": texto}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_extrair_message_id(self):
+        self.assertEqual(dedupe.extrair_message_id({"messageId": "abc"}), "abc")
+        self.assertEqual(dedupe.extrair_message_id({"key": {"id": "XYZ"}}), "XYZ")
+        self.assertIsNone(dedupe.extrair_message_id({"body": "oi"}))
+
+    def test_retentativa_nao_duplica_reserva(self):
+        self.assertEqual(self.post("wamid.1")["status"], "confirmed")
+        with mock.patch.object(dedupe, "_gravar") as gravar, self.assertNumQueries(0):
+            self.assertEqual(self.post("wamid.1")["status"], "duplicate")
+        gravar.assert_not_called()
+
+        # outro worker (cache vazio) cai na chave única da tabela
+        dedupe.vistos.limpar()
+        self.assertEqual(self.post("wamid.1")["status"], "duplicate")
+
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(OutboundMessage.objects.count(), 1)
+
+    def test_falha_libera_o_id(self):
+        with mock.patch("bookingbot.services.atendimento.interpretar_mensagem", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post("wamid.2")
+        self.assertFalse(ProcessedMessage.objects.filter(message_id="wamid.2").exists())
+        self.assertEqual(self.post("wamid.2")["status"], "confirmed")
+
+    def test_limpeza_por_ttl(self):
+        ProcessedMessage.objects.create(message_id="velha", created_at=timezone.now() - timedelta(days=3))
+        ProcessedMessage.objects.create(message_id="nova")
+        self.assertEqual(dedupe.limpar_mensagens_antigas(ttl=86400), 1)
+        self.assertEqual(list(ProcessedMessage.objects.values_list("message_id", flat=True)), ["nova"])
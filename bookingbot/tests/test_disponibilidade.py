@@ -0,0 +1,98 @@
+from datetime import date, time
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from bookingbot.models import Booking, Customer, Resource
+from bookingbot.services.disponibilidade import AgendaDia, motor, recursos_livres
+from bookingbot.services.recursos import indice_recursos
+from bookingbot.services.reservas import criar_reserva
+
+
+class AgendaDiaTests(TestCase):
+
+    def agenda(self, *intervalos):
+        agenda = AgendaDia(8 * 60, 22 * 60, expira_em=float("inf"))
+        for n, (ini, fim) in enumerate(intervalos):
+            agenda.ocupar(ini * 60, fim * 60, n)
+        return agenda
+
+    def test_livres_com_janela_e_sobreposicao(self):
+        agenda = self.agenda((10, 12), (11, 13), (15, 16))
+        self.assertEqual(agenda.livres(), [(480, 600), (780, 900), (960, 1320)])
+        self.assertEqual(agenda.livres(14 * 60, 18 * 60), [(840, 900), (960, 1080)])
+        self.assertEqual(agenda.livres(11 * 60, 13 * 60), [])
+
+    def test_proximo_livre(self):
+        agenda = self.agenda((10, 12), (13, 15))
+        self.assertEqual(agenda.proximo_livre(60, 10 * 60), 12 * 60)
+        self.assertEqual(agenda.proximo_livre(90, 10 * 60), 15 * 60)
+        # início arredondado para o slot de 15 minutos
+        self.assertEqual(agenda.proximo_livre(30, 15 * 60 + 5), 15 * 60 + 15)
+        self.assertIsNone(agenda.proximo_livre(8 * 60, 10 * 60))
+
+
+class MotorDisponibilidadeTests(TestCase):
+
+    def setUp(self):
+        motor.invalidar()
+        cache.clear()
+        indice_recursos.invalidar()
+        self.sala = Resource.objects.create(name="Sala B", slug="sala-b", opens_at=time(9), closes_at=time(18))
+        self.customer = Customer.objects.create(phone="+5511999990001")
+        self.dia = date(2030, 5, 10)
+
+    def tearDown(self):
+        motor.invalidar()
+        cache.clear()
+        indice_recursos.invalidar()
+
+    def test_atualizacao_incremental(self):
+        self.assertEqual(motor.livres(self.sala, self.dia), [("09:00", "18:00")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = criar_reserva(self.customer, self.sala, self.dia, time(14), time(16))
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                motor.livres(self.sala, self.dia, time(13), time(18)),
+                [("13:00", "14:00"), ("16:00", "18:00")],
+            )
+            self.assertEqual(motor.proximo_livre(self.sala, self.dia, 120, time(14)), "16:00")
+
+        booking.status = "canceled"
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(motor.livres(self.sala, self.dia), [("09:00", "18:00")])
+
+    def test_reserva_que_passa_da_meia_noite(self):
+        self.sala.opens_at, self.sala.closes_at = time(0), time(23, 59)
+        self.sala.save()
+        Booking.objects.create(customer=self.customer, resource=self.sala, date=self.dia,
+                               start_time=time(22), end_time=time(2), status="confirmed")
+        seguinte = date(2030, 5, 11)
+        self.assertEqual(motor.livres(self.sala, seguinte)[0], ("02:00", "23:59"))
+
+    def test_webhook_horarios_livres_e_sugestao(self):
+        Booking.objects.create(customer=self.customer, resource=self.sala, date=self.dia,
+                               start_time=time(14), end_time=time(15), status="confirmed")
+        client = APIClient()
+
+        resp = client.post("/webhook/", {"from": "+5511999990002", "body": "horários disponíveis 10/05/2030 entre 13h e 17h na sala b"}, format="json")
+        self.assertEqual(resp.json()["free"], {"Sala B": ["13:00 - 14:00", "15:00 - 17:00"]})
+
+        resp = client.post("/webhook/", {"from": "+5511999990002", "body": "reservar sala b 10/05/2030 às 14h"}, format="json")
+        self.assertEqual(resp.json(), {"status": "busy", "next_free": "15:00"})
+
+    def test_portao_da_reserva_le_o_banco(self):
+        self.assertEqual(motor.livres(self.sala, self.dia), [("09:00", "18:00")])
+        # reserva gravada por outro worker: a agenda em memória não vê
+        Booking.objects.bulk_create([Booking(customer=self.customer, resource=self.sala, date=self.dia,
+                                             start_time=time(10), end_time=time(11), status="confirmed")])
+        self.assertEqual(motor.livres(self.sala, self.dia), [("09:00", "18:00")])
+        self.assertEqual(recursos_livres([self.sala], self.dia, time(10, 30), time(11, 30)), [])
+
+        resp = APIClient().post("/webhook/", {"from": "+5511999990002", "body": "reservar sala b 10/05/2030 às 10h"}, format="json")
+        self.assertEqual(resp.json()["status"], "busy")
+        self.assertEqual(Booking.objects.count(), 1)
@@ -0,0 +1,156 @@
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bookingbot.ia import intent_classifier
+from bookingbot.management.commands.benchmark_nlp import DATASETS, carregar_dataset
+from bookingbot.models import OutboundMessage, Resource
+from bookingbot.services import intencao
+from bookingbot.services.disponibilidade import motor
+from bookingbot.services.nlp_v2 import interpretar_mensagem
+
+
+class _Modelo:
+    """Modelo com probabilidades fixas por texto (o resto fica com a primeira classe)."""
+
+    classes_ = np.array(["consultar_disponibilidade", "criar_reserva", "saudacao"])
+
+    def __init__(self, probabilidades):
+        self.probabilidades = probabilidades
+
+    def predict_proba(self, textos):
+        return np.array([self.probabilidades.get(t, [0.2, 0.4, 0.4]) for t in textos])
+
+
+def _com_modelo(probabilidades):
+    return mock.patch.object(
+        intent_classifier.registry, "get_com_assinatura", return_value=("teste", _Modelo(probabilidades)))
+
+
+@override_settings(INTENT_CONFIDENCE_THRESHOLD=0.5)
+class ClassificacaoTests(SimpleTestCase):
+
+    def setUp(self):
+        intencao.stats.reset()
+        intencao.cache_modelo.limpar()
+
+    def test_regras_respondem_sem_o_modelo(self):
+        with mock.patch.object(intent_classifier.registry, "get_com_assinatura") as get:
+            c = intencao.classificar("Quero reservar amanhã às 14h")
+            self.assertEqual(intencao.classificar("Boa tarde!").intent, "saudacao")
+            self.assertEqual(intencao.classificar("???").intent, "ajuda")
+        get.assert_not_called()
+        self.assertEqual(c, intencao.Classificacao("criar_reserva", "regras", 1.0, None))
+
+    def test_intencao_do_nlp_v2_e_reaproveitada(self):
+        parsed = interpretar_mensagem("cancelar dia 10 às 9h")
+        c = intencao.classificar("cancelar dia 10 às 9h", parsed["intent"])
+        self.assertEqual((c.intent, c.camada), ("cancelar_reserva", "regras"))
+        # sem palavra-chave nem por substring: as regras de palavras inteiras nem rodam
+        with mock.patch.object(intencao, "PALAVRAS", mock.MagicMock()) as palavras, _com_modelo({}):
+            self.assertEqual(intencao.classificar("hmm", "desconhecido").camada, "esclarecer")
+        palavras.__iter__.assert_not_called()
+
+    def test_regras_por_palavra_inteira(self):
+        for texto, esperado in (
+            ("quero desmarcar amanhã 14h", "cancelar_reserva"),
+            ("preciso remarcar amanhã 14h", "remarcar_reserva"),
+        ):
+            c = intencao.classificar(texto, interpretar_mensagem(texto)["intent"])
+            self.assertEqual((c.intent, c.camada), (esperado, "regras"), texto)
+        # "ver" dentro de "verificar" não é consulta: vai para o modelo
+        with _com_modelo({}):
+            c = intencao.classificar("vou verificar e te aviso", "listar_disponibilidade")
+        self.assertNotEqual(c.camada, "regras")
+
+    def test_modelo_nao_reserva_sem_confianca_alta(self):
+        with _com_modelo({"amanhã às 14h não dá": [0.1, 0.8, 0.1], "amanhã 14h sim": [0.02, 0.95, 0.03]}):
+            duvida = intencao.classificar("amanhã às 14h não dá")
+            certeza = intencao.classificar("amanhã 14h sim")
+        self.assertEqual((duvida.intent, duvida.palpite), ("esclarecer", "criar_reserva"))
+        self.assertEqual((certeza.intent, certeza.camada), ("criar_reserva", "modelo"))
+
+    def test_modelo_distribuido_so_decide_leitura(self):
+        # o modelo treinado com training_data.json (acurácia ~0.34) não chega ao
+        # limiar das ações nem nos próprios exemplos: criar/cancelar ficam com as regras
+        _, modelo = intent_classifier.registry.get_com_assinatura()
+        if modelo is None:
+            self.skipTest("modelo não treinado")
+        textos = [texto for caminho in DATASETS.values() for texto, _ in carregar_dataset(caminho)]
+        self.assertLess(modelo.predict_proba(textos).max(), settings.INTENT_ACTION_CONFIDENCE_THRESHOLD)
+
+    def test_modelo_acima_do_limiar(self):
+        with _com_modelo({"Tem horário livre amanhã?": [0.8, 0.1, 0.1]}):
+            c = intencao.classificar("Tem horário livre amanhã?")
+        self.assertEqual((c.intent, c.camada), ("listar_disponibilidade", "modelo"))
+        self.assertAlmostEqual(c.confianca, 0.8)
+
+    def test_abaixo_do_limiar_pede_esclarecimento(self):
+        with _com_modelo({"hmm talvez depois": [0.1, 0.45, 0.45]}):
+            c = intencao.classificar("hmm talvez depois")
+        self.assertEqual((c.intent, c.camada, c.palpite), ("esclarecer", "esclarecer", "criar_reserva"))
+
+    def test_sem_modelo(self):
+        with mock.patch.object(intent_classifier.registry, "get_com_assinatura", return_value=(None, None)):
+            self.assertEqual(intencao.classificar("hmm").camada, "sem_modelo")
+
+    def test_estatisticas_por_camada(self):
+        with _com_modelo({"tem vaga?": [0.9, 0.05, 0.05]}):
+            for texto in ("reservar amanhã", "oi", "tem vaga?", "hmm"):
+                intencao.classificar(texto)
+        snap = intencao.stats.snapshot()
+        self.assertEqual({c: s["mensagens"] for c, s in snap.items()}, {"regras": 2, "modelo": 1, "esclarecer": 1})
+        self.assertEqual(snap["regras"]["fracao"], 0.5)
+        self.assertTrue(all(s["p95_ms"] <= s["max_ms"] for s in snap.values()))
+
+
+@override_settings(INTENT_CONFIDENCE_THRESHOLD=0.5)
+class ModeloDistribuidoTests(SimpleTestCase):
+    """Com o modelo de ia/model.joblib, texto de baixa qualidade nunca vira reserva."""
+
+    def setUp(self):
+        intencao.cache_modelo.limpar()
+
+    def test_texto_ruim_nao_chega_a_criar_reserva(self):
+        for texto in ("Amanhã às 14h não dá", "asdf qwer amanhã 14h", "xyz 10/11/2026 9h",
+                      "quero desmarcar amanhã 14h", "pode ser amanhã 15h?", "k"):
+            c = intencao.classificar(texto, interpretar_mensagem(texto)["intent"])
+            self.assertNotEqual(c.intent, "criar_reserva", (texto, c))
+
+
+@override_settings(INTENT_CONFIDENCE_THRESHOLD=0.5)
+class WebhookIntencaoTests(TestCase):
+
+    def setUp(self):
+        intencao.cache_modelo.limpar()
+        cache.clear()
+        motor.invalidar()
+        self.addCleanup(motor.invalidar)
+        Resource.objects.create(name="Sala A", slug="sala-a")
+        self.client = APIClient()
+        self.phone = "+5511999990001"
+
+    def test_pergunta_quando_o_modelo_nao_tem_confianca(self):
+        with _com_modelo({}):
+            resp = self.client.post("/webhook/", {"from": self.phone, "body": "hmm talvez depois"}, format="json")
+        self.assertEqual(resp.json(), {"status": "clarify", "guess": "criar_reserva"})
+        self.assertIn("fazer uma reserva", OutboundMessage.objects.get().body)
+
+    def test_modelo_encaminha_para_a_consulta(self):
+        with _com_modelo({"Tem horário livre amanhã?": [0.8, 0.1, 0.1]}):
+            resp = self.client.post("/webhook/", {"from": self.phone, "body": "Tem horário livre amanhã?"}, format="json")
+        self.assertEqual(resp.json(), {"date": str(timezone.localdate() + timedelta(days=1)), "slots": {}})
+
+    def test_endpoint_de_estatisticas_exige_admin(self):
+        self.assertEqual(self.client.get("/api/nlp/intents/").status_code, 403)
+        admin = User.objects.create_superuser("admin", "a@a.com", "x")
+        self.client.force_authenticate(admin)
+        self.client.post("/webhook/", {"from": self.phone, "body": "oi"}, format="json")
+        self.assertIn("regras", self.client.get("/api/nlp/intents/").json())
@@ -0,0 +1,111 @@
+from datetime import datetime as datetime_real
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from bookingbot.ia import intent_classifier
+from bookingbot.services import memo, nlp_v2
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class CacheMemoTests(SimpleTestCase):
+
+    def setUp(self):
+        self.relogio = _Relogio()
+        self.cache = memo.CacheMemo("teste", tamanho=2, ttl=10, relogio=self.relogio)
+        self.addCleanup(memo.caches.pop, "teste")
+
+    def test_lru_e_metricas(self):
+        calculos = []
+        calcular = lambda chave: lambda: calculos.append(chave) or chave.upper()
+
+        self.assertEqual(self.cache.obter("a", calcular("a")), "A")
+        self.assertEqual(self.cache.obter("a", calcular("a")), "A")
+        self.cache.obter("b", calcular("b"))
+        self.cache.obter("a", calcular("a"))  # "a" fica mais recente que "b"
+        self.cache.obter("c", calcular("c"))  # descarta "b"
+        self.cache.obter("b", calcular("b"))
+
+        self.assertEqual(calculos, ["a", "b", "c", "b"])
+        snap = self.cache.snapshot()
+        self.assertEqual((snap["hits"], snap["misses"], snap["evictions"]), (2, 4, 2))
+        self.assertEqual(snap["hit_ratio"], 2 / 6)
+
+    def test_expira_pelo_ttl(self):
+        self.cache.guardar("a", 1)
+        self.relogio.agora = 9.9
+        self.assertEqual(self.cache.buscar("a"), 1)
+        self.relogio.agora = 10
+        self.assertIsNone(self.cache.buscar("a", None))
+        self.assertEqual(self.cache.snapshot()["expirations"], 1)
+
+    def test_desligados(self):
+        self.cache.guardar("a", 1)
+        with memo.desligados():
+            self.assertIsNone(self.cache.buscar("a", None))
+            self.cache.guardar("b", 2)
+        self.assertEqual(self.cache.buscar("a"), 1)
+        self.assertIsNone(self.cache.buscar("b", None))
+
+
+def _congelar_dia(dia):
+    class _Datetime(datetime_real):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(dia.year, dia.month, dia.day, 10)
+
+    return mock.patch.object(nlp_v2, "datetime", _Datetime)
+
+
+class InterpretacaoEmCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        nlp_v2.cache_interpretacao.limpar()
+
+    def test_texto_repetido_nao_passa_pelo_extrator(self):
+        primeira = nlp_v2.interpretar_mensagem("Reservar Sala A amanhã às 14h")
+        with mock.patch.object(nlp_v2.extrator, "extrair") as extrair:
+            segunda = nlp_v2.interpretar_mensagem("  reservar sala a amanhã às 14h ")
+        extrair.assert_not_called()
+
+        self.assertEqual(segunda["texto_original"], "  reservar sala a amanhã às 14h ")
+        self.assertEqual({**segunda, "texto_original": None}, {**primeira, "texto_original": None})
+        self.assertEqual(segunda, nlp_v2.interpretar_mensagem_sequencial("  reservar sala a amanhã às 14h "))
+
+        # alterar o resultado devolvido não altera o cache
+        segunda["dates"].append("lixo")
+        self.assertEqual(nlp_v2.interpretar_mensagem("reservar sala a amanhã às 14h")["dates"], primeira["dates"])
+
+    def test_datas_relativas_mudam_com_o_dia(self):
+        with _congelar_dia(datetime_real(2030, 1, 10)):
+            self.assertEqual(nlp_v2.interpretar_mensagem("horários amanhã")["date"], "2030-01-11")
+        with _congelar_dia(datetime_real(2030, 1, 11)):
+            self.assertEqual(nlp_v2.interpretar_mensagem("horários amanhã")["date"], "2030-01-12")
+        self.assertEqual(nlp_v2.cache_interpretacao.snapshot()["misses"], 2)
+
+
+class ClassificadorEmCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        intent_classifier.cache_intencoes.limpar()
+
+    def test_so_os_textos_novos_vao_ao_modelo(self):
+        modelo = mock.Mock()
+        modelo.predict.side_effect = lambda textos: [f"intent:{t}" for t in textos]
+        with mock.patch.object(intent_classifier.registry, "get_com_assinatura", return_value=("v1", modelo)):
+            intent_classifier.classify_intents(["oi", "cancelar"])
+            self.assertEqual(intent_classifier.classify_intents(["Oi ", "tchau", "cancelar"]),
+                             ["intent:oi", "intent:tchau", "intent:cancelar"])
+        self.assertEqual(modelo.predict.call_args_list[-1], mock.call(["tchau"]))
+
+        # modelo re-treinado: nova assinatura, nada do cache antigo vale
+        with mock.patch.object(intent_classifier.registry, "get_com_assinatura", return_value=("v2", modelo)):
+            intent_classifier.classify_intents(["oi"])
+        self.assertEqual(modelo.predict.call_args_list[-1], mock.call(["oi"]))
@@ -0,0 +1,105 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from bookingbot.services import clientes, metricas
+from bookingbot.services.whatsapp import WhatsAppGateway
+
+
+class MetricasTests(SimpleTestCase):
+
+    def setUp(self):
+        self.hist = metricas.Histograma("teste_seconds", "Teste.", ("stage", "result"), buckets=(0.1, 1))
+
+    def tearDown(self):
+        metricas.registro.pop("teste_seconds")
+
+    def test_formato_prometheus(self):
+        self.hist.observe(0.05, stage="a", result="ok")
+        self.hist.observe(0.5, stage="a", result="ok")
+        self.hist.observe(3, stage="a", result="ok")
+        texto = self.hist.exportar()
+        self.assertIn("# TYPE teste_seconds histogram", texto)
+        self.assertIn('teste_seconds_bucket{stage="a",result="ok",le="0.1"} 1', texto)
+        self.assertIn('teste_seconds_bucket{stage="a",result="ok",le="1"} 2', texto)
+        self.assertIn('teste_seconds_bucket{stage="a",result="ok",le="+Inf"} 3', texto)
+        self.assertIn('teste_seconds_sum{stage="a",result="ok"} 3.55', texto)
+        self.assertIn('teste_seconds_count{stage="a",result="ok"} 3', texto)
+
+    def test_medir_marca_erro(self):
+        with self.assertRaises(ValueError), metricas.medir(self.hist, stage="b"):
+            raise ValueError
+        self.assertEqual(self.hist.contagem(stage="b", result="error"), 1)
+
+    def test_etapa(self):
+        antes = metricas.etapas.contagem(stage="teste")
+
+        @metricas.etapa("teste")
+        def somar(a, b):
+            return a + b
+
+        self.assertEqual(somar(1, 2), 3)
+        self.assertEqual(metricas.etapas.contagem(stage="teste"), antes + 1)
+        with override_settings(METRICS_ENABLED=False):
+            self.assertIs(metricas.medir(self.hist), metricas._NADA)
+            somar(1, 2)
+        self.assertEqual(metricas.etapas.contagem(stage="teste"), antes + 1)
+
+    def test_gateway(self):
+        antes = metricas.whatsapp_segundos.contagem(result="error")
+        gateway = WhatsAppGateway("http://127.0.0.1:9/send", retries=0)
+        with self.assertLogs("bookingbot.services.whatsapp", "WARNING"):
+            self.assertIsNone(gateway.send("+5511999990001", "oi"))
+        self.assertEqual(metricas.whatsapp_segundos.contagem(result="error"), antes + 1)
+
+
+class EndpointMetricasTests(TestCase):
+
+    def setUp(self):
+        metricas.limpar()
+        clientes.cache.limpar()
+        cache.clear()
+
+    def post(self, texto="oi"):
+        return self.client.post(
+            "/webhook/", {"from": "+5511999990001", "body": texto}, content_type="application/json")
+
+    def test_webhook_por_etapa_e_consultas(self):
+        self.assertEqual(self.post().status_code, 200)
+        for etapa in ("cliente", "nlp", "intencao", "outbox"):
+            self.assertEqual(metricas.etapas.contagem(stage=etapa), 1, etapa)
+        self.assertEqual(metricas.requisicoes.contagem(view="whatsapp_webhook", status="200"), 1)
+        self.assertEqual(metricas.consultas_por_requisicao.contagem(view="whatsapp_webhook"), 1)
+        self.assertGreater(metricas.consultas_por_tabela.valor(view="whatsapp_webhook", table="bookingbot_customer"), 0)
+
+    async def test_webhook_asgi_conta_consultas_da_thread(self):
+        # sob ASGI a view síncrona roda numa thread (sync_to_async)
+        resp = await self.async_client.post(
+            "/webhook/", {"from": "+5511999990001", "body": "oi"}, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreater(
+            metricas.consultas_por_tabela.valor(view="whatsapp_webhook", table="bookingbot_outboundmessage"), 0)
+
+    @override_settings(METRICS_TOKEN="segredo")
+    def test_endpoint_com_token(self):
+        self.post()
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        resp = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer segredo")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
+        texto = resp.content.decode()
+        self.assertIn('bookingbot_stage_seconds_count{stage="nlp"} 1', texto)
+        self.assertIn('bookingbot_cache_requests_total{cache="clientes",result="miss"}', texto)
+        self.assertIn('bookingbot_intent_messages_total{layer="regras"}', texto)
+
+    def test_endpoint_sem_token_so_admin(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(User.objects.create_user("admin", password="x", is_staff=True))
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_desligado(self):
+        self.post()
+        self.assertEqual(metricas.etapas.contagem(stage="nlp"), 0)
+        self.assertEqual(metricas.requisicoes.contagem(view="whatsapp_webhook", status="200"), 0)
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
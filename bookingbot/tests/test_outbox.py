@@ -0,0 +1,95 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import TestCase
+from django.utils import timezone
+
+from bookingbot.models import OutboundMessage
+from bookingbot.services.outbox import (
+    destinatarios_prontos,
+    drenar_destinatario,
+    enfileirar_whatsapp,
+)
+from bookingbot.services.whatsapp import WhatsAppGateway
+
+
+class _GatewayTexto(BaseHTTPRequestHandler):
+    """Gateway que aceita a mensagem com 200 e corpo em texto puro."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.chamadas += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"OK")
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboxTests(TestCase):
+
+    def test_envia_em_ordem_por_destinatario(self):
+        enviadas = []
+        enfileirar_whatsapp("+5511999990001", "primeira")
+        enfileirar_whatsapp("+5511999990002", "outro")
+        enfileirar_whatsapp("+5511999990001", "segunda")
+
+        self.assertEqual(destinatarios_prontos(), ["+5511999990001", "+5511999990002"])
+
+        ok, erros = drenar_destinatario("+5511999990001", enviar=lambda n, m: enviadas.append(m))
+        self.assertEqual((ok, erros), (2, 0))
+        self.assertEqual(enviadas, ["primeira", "segunda"])
+
+    def test_falha_reagenda_e_bloqueia_as_seguintes(self):
+        enfileirar_whatsapp("+5511999990001", "primeira")
+        enfileirar_whatsapp("+5511999990001", "segunda")
+
+        def falha(numero, mensagem):
+            raise RuntimeError("gateway fora do ar")
+
+        ok, erros = drenar_destinatario("+5511999990001", enviar=falha)
+        self.assertEqual((ok, erros), (0, 1))
+
+        primeira, segunda = OutboundMessage.objects.order_by("id")
+        self.assertEqual(primeira.status, "pending")
+        self.assertEqual(primeira.attempts, 1)
+        self.assertGreater(primeira.next_attempt_at, timezone.now())
+        self.assertEqual(segunda.attempts, 0)
+        # a primeira ainda está em backoff, então ninguém está pronto
+        self.assertEqual(destinatarios_prontos(), [])
+
+    def test_desiste_apos_max_tentativas(self):
+        enfileirar_whatsapp("+5511999990001", "primeira")
+        enfileirar_whatsapp("+5511999990001", "segunda")
+
+        def falha(numero, mensagem):
+            if mensagem == "primeira":
+                raise RuntimeError("número inválido")
+
+        ok, erros = drenar_destinatario("+5511999990001", enviar=falha, max_tentativas=1)
+        self.assertEqual((ok, erros), (1, 1))
+        self.assertEqual(
+            list(OutboundMessage.objects.values_list("status", flat=True)),
+            ["failed", "sent"],
+        )
+
+    def test_200_em_texto_puro_conta_como_enviada(self):
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _GatewayTexto)
+        servidor.chamadas = 0
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        gateway = WhatsAppGateway(f"http://127.0.0.1:{servidor.server_port}/send", retries=0)
+        self.addCleanup(gateway.close)
+
+        enfileirar_whatsapp("+5511999990001", "primeira")
+        enfileirar_whatsapp("+5511999990001", "segunda")
+        enviar = lambda n, m: gateway.send(n, m, raise_on_error=True)
+        self.assertEqual(drenar_destinatario("+5511999990001", enviar=enviar), (2, 0))
+        # nada volta para a fila: drenar de novo não reenvia
+        self.assertEqual(drenar_destinatario("+5511999990001", enviar=enviar), (0, 0))
+        self.assertEqual(servidor.chamadas, 2)
+        self.assertEqual(set(OutboundMessage.objects.values_list("status", "attempts")), {("sent", 1)})
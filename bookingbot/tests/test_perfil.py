@@ -0,0 +1,118 @@
+import json
+import pstats
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from bookingbot.models import Customer
+from bookingbot.services import clientes, perfil
+from bookingbot.services.nlp_v2 import interpretar_mensagem
+
+
+class PerfilMiddlewareTests(TestCase):
+
+    def setUp(self):
+        clientes.cache.limpar()
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.destino = Path(self.dir.name)
+
+    def post(self, **headers):
+        return self.client.post(
+            "/webhook/", {"from": "+5511999990001", "body": "oi"}, content_type="application/json", headers=headers)
+
+    def arquivos(self):
+        return sorted(p.name for p in self.destino.iterdir())
+
+    def test_desligado_por_padrao(self):
+        with override_settings(PROFILING_DIR=self.dir.name):
+            resp = self.post()
+        self.assertNotIn("X-Profile-Id", resp)
+        self.assertEqual(self.arquivos(), [])
+
+    def test_amostra_grava_perfil_e_consultas(self):
+        Customer.objects.create(phone="+5511999990001")  # upsert cai no SELECT
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.dir.name, PROFILING_SLOW_QUERY_MS=0):
+            resp = self.post()
+        ident = resp["X-Profile-Id"]
+        self.assertTrue(ident.endswith("-whatsapp_webhook"))
+        self.assertEqual(self.arquivos(), [f"{ident}.prof", f"{ident}.sql.json"])
+
+        with open(self.destino / f"{ident}.sql.json", encoding="utf-8") as f:
+            log = json.load(f)
+        self.assertEqual(log["status"], 200)
+        self.assertTrue(log["consultas"])
+        selects = [c for c in log["consultas"] if c["sql"].startswith("SELECT")]
+        self.assertTrue(selects)
+        # limite 0 ms: toda SELECT ganha o plano
+        self.assertTrue(all(c["explain"] for c in selects))
+        # os valores (telefone) ficam fora do arquivo, mas chegaram ao EXPLAIN
+        self.assertTrue(all(set(c["params"]) <= {"?"} for c in log["consultas"] if c["params"]))
+        self.assertNotIn("99999", json.dumps(log))
+        self.assertFalse(any("EXPLAIN falhou" in linha for c in selects for linha in c["explain"]))
+
+    def test_parametros_no_log_se_ligado(self):
+        Customer.objects.create(phone="+5511999990001")
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.dir.name, PROFILING_LOG_PARAMS=True):
+            ident = self.post()["X-Profile-Id"]
+        with open(self.destino / f"{ident}.sql.json", encoding="utf-8") as f:
+            self.assertIn("+5511999990001", f.read())
+
+    def test_cabecalho_assinado(self):
+        with override_settings(PROFILING_SECRET="segredo", PROFILING_DIR=self.dir.name):
+            self.assertNotIn("X-Profile-Id", self.post())
+            self.assertNotIn("X-Profile-Id", self.post(**{"X-Profile": "forjado"}))
+            self.assertNotIn("X-Profile-Id", self.post(**{"X-Profile": perfil.gerar_token("outro")}))
+            resp = self.post(**{"X-Profile": perfil.gerar_token()})
+        self.assertIn("X-Profile-Id", resp)
+        self.assertEqual(len(self.arquivos()), 2)
+
+    def test_amostragem_e_rotacao(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.dir.name,
+                               PROFILING_PROFILER="amostragem", PROFILING_MAX_DUMPS=2):
+            idents = [self.post()["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual(self.arquivos(), sorted(f"{i}{ext}" for i in idents[1:] for ext in (".stacks", ".sql.json")))
+
+    def test_relatorio(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.dir.name):
+            self.post()
+            self.post()
+        saida = StringIO()
+        call_command("relatorio_perfis", dir=self.dir.name, top=5, view="whatsapp_webhook", stdout=saida)
+        texto = saida.getvalue()
+        self.assertIn("cProfile: 2 requisições", texto)
+        self.assertIn("Consultas: 2 requisições", texto)
+        self.assertIn("bookingbot_customer", texto)
+
+    async def apost(self):
+        resp = await self.async_client.post(
+            "/webhook/", {"from": "+5511999990001", "body": "oi"}, content_type="application/json")
+        return resp["X-Profile-Id"]
+
+    async def test_asgi_perfila_a_thread_da_view(self):
+        # sob ASGI a view síncrona roda fora do event loop; o perfil tem de segui-la
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.dir.name):
+            ident = await self.apost()
+        funcoes = {nome for _, _, nome in pstats.Stats(str(self.destino / f"{ident}.prof")).stats}
+        self.assertIn("processar_mensagem", funcoes)
+        self.assertIn("interpretar_mensagem", funcoes)
+        with open(self.destino / f"{ident}.sql.json", encoding="utf-8") as f:
+            self.assertTrue(json.load(f)["consultas"])
+
+    async def test_asgi_amostragem_pega_a_view(self):
+        def devagar(texto):
+            time.sleep(0.05)
+            return interpretar_mensagem(texto)
+
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.dir.name, PROFILING_PROFILER="amostragem"), \
+                mock.patch("bookingbot.services.atendimento.interpretar_mensagem", devagar):
+            ident = await self.apost()
+        pilhas = (self.destino / f"{ident}.stacks").read_text(encoding="utf-8")
+        self.assertIn("(processar_mensagem);", pilhas)
@@ -0,0 +1,43 @@
+from django.test import TestCase, override_settings
+
+from bookingbot.models import Resource
+from bookingbot.services.recursos import indice_recursos, normalizar
+
+
+class IndiceRecursosTests(TestCase):
+
+    def setUp(self):
+        indice_recursos.invalidar()
+        self.sala_b = Resource.objects.create(name="Sala B", slug="sala-b")
+        self.estudio = Resource.objects.create(name="Estúdio Grande", slug="estudio-grande")
+
+    def tearDown(self):
+        indice_recursos.invalidar()
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar("  ESTÚDIO-Grande "), "estudio grande")
+
+    def test_busca_sem_consultas_no_caminho_quente(self):
+        indice_recursos.buscar("aquece o índice")
+        with self.assertNumQueries(0):
+            self.assertEqual(indice_recursos.buscar("Quero o estudio grande amanhã"), self.estudio)
+            self.assertEqual(indice_recursos.buscar("reservar a SALA B às 14h"), self.sala_b)
+            self.assertEqual(indice_recursos.padrao(), self.sala_b)
+
+    def test_palavra_inteira_e_apelidos(self):
+        self.assertIsNone(indice_recursos.buscar("sala bonita"))
+        # apelido padrão de nlp_v2.RECURSOS_MAP
+        self.assertEqual(indice_recursos.buscar("sala de ensaio hoje"), self.sala_b)
+
+    @override_settings(RESOURCE_ALIASES={"estudião": "estudio-grande"})
+    def test_apelidos_configurados(self):
+        indice_recursos.invalidar()
+        self.assertEqual(indice_recursos.buscar("pode ser no estudião?"), self.estudio)
+
+    def test_sinais_invalidam_o_indice(self):
+        self.assertIsNone(indice_recursos.buscar("sala c"))
+        sala_c = Resource.objects.create(name="Sala C", slug="sala-c")
+        self.assertEqual(indice_recursos.buscar("sala c"), sala_c)
+
+        sala_c.delete()
+        self.assertIsNone(indice_recursos.buscar("sala c"))
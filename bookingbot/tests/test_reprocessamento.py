@@ -0,0 +1,91 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from bookingbot.services.nlp_v2 import interpretar_mensagem
+from bookingbot.services.reprocessamento import LinhasPuladas, ler_mensagens, reprocessar
+
+
+FRASES = [
+    "Reservar Sala A amanhã às 14h",
+    "cancelar dia 10/12/2030 às 9h",
+    "horários disponíveis amanhã",
+    "oi, tudo bem?",
+]
+
+
+class ReprocessamentoTests(SimpleTestCase):
+
+    def test_le_jsonl_e_pula_linhas_invalidas(self):
+        arquivo = io.StringIO(
+            '{"id": 0, "body": "reservar amanhã"}\n'
+            "não é json\n"
+            "\n"
+            '{"text": "cancelar"}\n'
+            '{"from": "+55"}\n'
+        )
+        invalidas = LinhasPuladas()
+        mensagens = list(ler_mensagens(arquivo, invalidas=invalidas))
+        self.assertEqual(mensagens, [
+            (1, {"texto": "reservar amanhã", "id": 0, "hoje": None}),
+            (4, {"texto": "cancelar", "id": None, "hoje": None}),
+        ])
+        self.assertEqual((invalidas.total, invalidas.primeiras), (2, [2, 5]))
+
+    def test_guarda_so_as_primeiras_linhas_puladas(self):
+        invalidas = LinhasPuladas(limite=3)
+        list(ler_mensagens(io.StringIO("lixo\n" * 1000), invalidas=invalidas))
+        self.assertEqual((invalidas.total, invalidas.primeiras), (1000, [1, 2, 3]))
+
+    def test_le_csv_com_campo_escolhido(self):
+        arquivo = io.StringIO("message_id,mensagem\nm1,reservar amanhã\nm2,\"ver\nhorários\"\nm3,cancelar\n")
+        mensagens = list(ler_mensagens(arquivo, "csv", campo="mensagem"))
+        self.assertEqual([m[1]["id"] for m in mensagens], ["m1", "m2", "m3"])
+        self.assertEqual(mensagens[1][1]["texto"], "ver\nhorários")
+        self.assertEqual(mensagens[2][0], 5)
+
+    def test_datas_relativas_pela_data_de_envio(self):
+        arquivo = io.StringIO(
+            '{"body": "reservar amanhã às 14h", "timestamp": 1736510400}\n'
+            '{"body": "reservar amanhã às 14h", "created_at": "2025-01-10T01:00:00Z"}\n'
+            '{"body": "toda sexta às 9h por 2 semanas", "date": "2025-01-06"}\n'
+            '{"body": "reservar hoje às 14h", "timestamp": "lixo"}\n'
+        )
+        resultados = list(reprocessar(ler_mensagens(arquivo)))
+        # 12:00 UTC e 01:00 UTC são 09:00 de 10/01 e 22:00 de 09/01 em São Paulo
+        self.assertEqual([r["data_referencia"] for r in resultados], ["2025-01-10", "2025-01-09", "2025-01-06", None])
+        self.assertEqual(resultados[0]["nlp_v2"]["dates"], ["2025-01-11"])
+        self.assertEqual(resultados[1]["nlp_v2"]["dates"], ["2025-01-10"])
+        self.assertEqual(resultados[2]["nlp_v2"]["dates"], ["2025-01-10", "2025-01-17"])
+        self.assertEqual(resultados[3]["nlp_v2"]["dates"], interpretar_mensagem("reservar hoje às 14h")["dates"])
+
+        arquivo = io.StringIO("quando,mensagem\n2025-01-10 10:00,cancelar amanhã às 9h\n")
+        [(_, registro)] = ler_mensagens(arquivo, "csv", campo="mensagem", campo_data="quando")
+        self.assertEqual(str(registro["hoje"]), "2025-01-10")
+
+    def test_pool_mantem_a_ordem_e_o_resultado_do_nlp_v2(self):
+        mensagens = [(i, {"texto": FRASES[i % len(FRASES)], "id": i}) for i in range(50)]
+        sequencial = list(reprocessar(iter(mensagens), processos=1, tamanho_bloco=7))
+        paralelo = list(reprocessar(iter(mensagens), processos=2, tamanho_bloco=7))
+
+        self.assertEqual(paralelo, sequencial)
+        self.assertEqual([r["linha"] for r in paralelo], list(range(50)))
+        esperado = interpretar_mensagem(FRASES[1])
+        self.assertEqual(paralelo[1]["nlp_v2"]["dates"], esperado["dates"])
+        self.assertEqual(paralelo[1]["nlp_v2"]["intent"], "cancelar_reserva")
+
+    def test_comando_grava_um_json_por_mensagem(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            entrada, saida = Path(pasta) / "msgs.jsonl", Path(pasta) / "saida.jsonl"
+            entrada.write_text("".join(json.dumps({"body": f}) + "\n" for f in FRASES), encoding="utf-8")
+
+            call_command("reprocessar_mensagens", str(entrada), saida=str(saida), processos=1, stderr=io.StringIO())
+
+            resultados = [json.loads(l) for l in saida.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual([r["texto"] for r in resultados], FRASES)
+        self.assertEqual(resultados[0]["nlp_v2"]["intent"], "criar_reserva")
+        self.assertIn("intent", resultados[0]["classificador"])
@@ -0,0 +1,211 @@
+import importlib
+import io
+import threading
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from bookingbot.models import Booking, Customer, OutboundMessage, Resource
+from bookingbot.services import clientes
+from bookingbot.services.disponibilidade import motor
+from bookingbot.services.nlp_v2 import expandir_recorrencia, interpretar_mensagem
+from bookingbot.services.recursos import indice_recursos
+from bookingbot.services.reservas import ConflitoDeHorario, criar_reserva, criar_reservas
+
+
+class CriarReservaConcorrenteTests(TransactionTestCase):
+    """Várias mensagens simultâneas para o mesmo horário: só uma reserva vale."""
+
+    TENTATIVAS = 200
+
+    def setUp(self):
+        self.resource = Resource.objects.create(name="Sala A", slug="sala-a")
+        self.customers = [
+            Customer.objects.create(phone=f"+55119999{i:05d}") for i in range(self.TENTATIVAS)
+        ]
+
+    def test_apenas_uma_reserva_vence(self):
+        barreira = threading.Barrier(self.TENTATIVAS)
+        resultados = []
+        lock = threading.Lock()
+
+        def reservar(customer):
+            try:
+                barreira.wait()
+                criar_reserva(customer, self.resource, date(2030, 1, 10), time(14), time(15))
+                resultado = "ok"
+            except ConflitoDeHorario:
+                resultado = "conflito"
+            except Exception as e:
+                resultado = repr(e)
+            finally:
+                connection.close()
+            with lock:
+                resultados.append(resultado)
+
+        threads = [threading.Thread(target=reservar, args=(c,)) for c in self.customers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(resultados.count("ok"), 1, resultados)
+        self.assertEqual(resultados.count("conflito"), self.TENTATIVAS - 1)
+        self.assertEqual(Booking.objects.filter(status="confirmed").count(), 1)
+
+    def test_horarios_vizinhos_nao_conflitam(self):
+        d = date(2030, 1, 10)
+        criar_reserva(self.customers[0], self.resource, d, time(14), time(15))
+        criar_reserva(self.customers[1], self.resource, d, time(15), time(16))
+        with self.assertRaises(ConflitoDeHorario):
+            criar_reserva(self.customers[2], self.resource, d, time(14, 30), time(15, 30))
+
+
+class ConstraintSobreposicaoTests(SimpleTestCase):
+    """0004: sobreposições que já existem são resolvidas antes da constraint."""
+
+    migracao = importlib.import_module("bookingbot.migrations.0004_booking_no_overlap")
+
+    def test_cancela_a_mais_nova_que_ainda_conflita(self):
+        # 1x2, 2x3 e 1x4: cai 2 (conflita com 1), 3 fica (2 já caiu), cai 4
+        pares = [(1, 2), (2, 3), (1, 4), (3, 4)]
+        self.assertEqual(self.migracao.reservas_a_cancelar(pares), [2, 4])
+        self.assertEqual(self.migracao.reservas_a_cancelar([]), [])
+
+    def test_mesma_expressao_da_constraint(self):
+        periodo = self.migracao.PERIODO
+        self.assertIn(periodo.format(t=""), self.migracao.CRIAR_CONSTRAINT)
+        self.assertIn(periodo.format(t="a."), self.migracao.SOBREPOSICOES)
+        self.assertIn(periodo.format(t="b."), self.migracao.SOBREPOSICOES)
+
+
+class RecorrenciaTests(SimpleTestCase):
+    SABADO = date(2026, 10, 17)
+
+    def test_toda_terca_por_dois_meses(self):
+        datas = expandir_recorrencia("toda terça às 19h por 2 meses", [], self.SABADO)
+        self.assertEqual(datas[0], date(2026, 10, 20))
+        self.assertEqual(datas[-1], date(2026, 12, 15))
+        self.assertEqual({d.weekday() for d in datas}, {1})
+        self.assertEqual(len(datas), 9)
+
+    def test_dias_prazo_e_inicio(self):
+        datas = expandir_recorrencia(
+            "todas as segundas e quartas às 10h durante 2 semanas a partir de 02/11/2026", [], self.SABADO)
+        self.assertEqual(datas, [date(2026, 11, 2), date(2026, 11, 4), date(2026, 11, 9), date(2026, 11, 11)])
+        datas = expandir_recorrencia("toda semana às 9h até 17/11/2026", [date(2026, 10, 20)], self.SABADO)
+        self.assertEqual(datas, [date(2026, 10, 20) + timedelta(weeks=k) for k in range(5)])
+
+    def test_sem_recorrencia(self):
+        self.assertIsNone(expandir_recorrencia("reservar segunda às 10h", [], self.SABADO))
+        resultado = interpretar_mensagem("reservar sala a toda sexta às 9h")
+        self.assertTrue(resultado["recurring"])
+        self.assertEqual(len(resultado["dates"]), 4)
+        self.assertFalse(interpretar_mensagem("marcar depois de amanhã às 10h")["recurring"])
+        self.assertEqual(len(interpretar_mensagem("marcar depois de amanhã às 10h")["dates"]), 1)
+
+    def test_datas_listadas(self):
+        self.assertFalse(interpretar_mensagem("reservar hoje ou amanhã às 14h")["multiple_dates"])
+        self.assertTrue(interpretar_mensagem("reservar hoje e amanhã às 14h")["multiple_dates"])
+        self.assertTrue(interpretar_mensagem("reservar sexta, sábado e domingo às 10h")["multiple_dates"])
+        self.assertTrue(interpretar_mensagem("reservar toda sexta às 9h")["multiple_dates"])
+
+
+class ReservasEmLoteTests(TestCase):
+
+    def setUp(self):
+        motor.invalidar()
+        cache.clear()
+        clientes.cache.limpar()
+        indice_recursos.invalidar()
+        self.sala = Resource.objects.create(name="Sala A", slug="sala-a")
+        self.customer = Customer.objects.create(phone="+5511999990001")
+        self.datas = [date(2030, 1, 1) + timedelta(weeks=k) for k in range(6)]
+
+    def tearDown(self):
+        clientes.cache.limpar()
+
+    def test_conflitos_numa_consulta(self):
+        criar_reserva(self.customer, self.sala, self.datas[2], time(18, 30), time(19, 30))
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True):
+                reservas, conflitos = criar_reservas(
+                    self.customer, self.sala, self.datas, time(19), time(20), ocupadas={self.datas[4]})
+        self.assertEqual(conflitos, [self.datas[2], self.datas[4]])
+        self.assertEqual([b.date for b in reservas], [d for i, d in enumerate(self.datas) if i not in (2, 4)])
+        self.assertTrue(all(b.pk for b in reservas))
+        selects = [q for q in consultas.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+        # agendas em memória atualizadas sem post_save do bulk_create
+        self.assertEqual(motor.livres(self.sala, self.datas[0], time(19), time(20)), [])
+
+    def post(self, phone, body):
+        return self.client.post("/webhook/", {"from": phone, "body": body}, content_type="application/json")
+
+    def test_webhook_consultas_constantes(self):
+        self.post("+5511999990009", "reservar sala a")  # carrega o índice de recursos
+
+        def consultas(phone, body):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.post(phone, body)
+            return resp.json(), len(ctx.captured_queries)
+
+        curta, n_curta = consultas("+5511999990002", "reservar sala a toda terça às 8h por 4 semanas a partir de 01/01/2030")
+        longa, n_longa = consultas("+5511999990003", "reservar sala a toda terça às 10h por 20 semanas a partir de 01/01/2030")
+        self.assertEqual(curta["status"], "confirmed")
+        self.assertEqual(len(curta["booking_ids"]), 4)
+        self.assertEqual(len(longa["booking_ids"]), 20)
+        self.assertEqual(n_curta, n_longa, (curta, longa))
+
+    def test_webhook_lista_conflitos(self):
+        resp = self.post("+5511999990002", "reservar sala a toda terça às 19h por 3 semanas a partir de 01/01/2030").json()
+        outra = self.post("+5511999990003", "reservar sala a toda terça às 19h por 5 semanas a partir de 01/01/2030").json()
+        self.assertEqual(len(resp["booking_ids"]), 3)
+        self.assertEqual(outra["status"], "partial")
+        self.assertEqual(len(outra["booking_ids"]), 2)
+        self.assertEqual(outra["conflicts"], sorted(
+            str(b.date) for b in Booking.objects.filter(pk__in=resp["booking_ids"])))
+        aviso = OutboundMessage.objects.filter(phone="+5511999990003").get().body
+        self.assertIn("Já ocupadas", aviso)
+
+    def test_webhook_limite_de_datas(self):
+        with self.settings(BOOKING_MAX_OCCURRENCES=3):
+            resp = self.post("+5511999990002", "reservar sala a toda terça às 19h por 2 meses").json()
+        self.assertEqual(resp["status"], "too_many_dates")
+        self.assertFalse(Booking.objects.exists())
+
+
+    def test_webhook_ou_nao_reserva_varias_datas(self):
+        resp = self.post("+5511999990002", "reservar sala a dia 10/01/2030 ou 12/01/2030 às 14h").json()
+        self.assertEqual(resp["status"], "confirmed")
+        self.assertEqual(list(Booking.objects.values_list("date", flat=True)), [date(2030, 1, 10)])
+
+        resp = self.post("+5511999990003", "reservar sala a dia 10/01/2030 e 12/01/2030 às 16h").json()
+        self.assertEqual(len(resp["booking_ids"]), 2)
+
+    def test_webhook_descarta_ocorrencias_passadas(self):
+        agora = datetime(2030, 1, 1, 9, 0)
+        with mock.patch("bookingbot.services.atendimento.timezone.localtime", return_value=agora):
+            resp = self.post("+5511999990002", "reservar sala a toda terça às 8h por 3 semanas a partir de 01/01/2030").json()
+            self.assertEqual([str(b.date) for b in Booking.objects.filter(pk__in=resp["booking_ids"]).order_by("date")],
+                             ["2030-01-08", "2030-01-15"])
+            resp = self.post("+5511999990002", "reservar sala a dia 10/12/2029 e 17/12/2029 às 8h").json()
+        self.assertEqual(resp["status"], "past_dates")
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+class BenchmarkReservasTests(TestCase):
+
+    def test_recusa_banco_com_dados_reais(self):
+        sala = Resource.objects.create(name="Sala A", slug="sala-a")
+        customer = Customer.objects.create(phone="+5511999990001")
+        criar_reserva(customer, sala, date(2030, 1, 10), time(14), time(15))
+        with self.assertRaisesMessage(CommandError, "--i-know"):
+            call_command("benchmark_reservas", reservas=10, stdout=io.StringIO())
+        self.assertFalse(Resource.objects.filter(slug__startswith="bench-").exists())
@@ -0,0 +1,100 @@
+import json
+import tempfile
+import warnings
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from bookingbot.ia import intent_classifier, train_model
+
+
+class TreinoTests(SimpleTestCase):
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        self.artefato = self.pasta / "model.joblib"
+        self.manifesto = self.pasta / "model_manifest.json"
+
+    def treinar(self, **opcoes):
+        return train_model.train(
+            artifact_path=self.artefato, manifest_path=self.manifesto, n_jobs=1, **opcoes)
+
+    def registry(self):
+        return intent_classifier.ModelRegistry(self.artefato, manifest_path=self.manifesto, check_interval=0)
+
+    def test_artefato_unico_com_manifesto_versionado(self):
+        manifesto = self.treinar()
+        texts, labels = train_model.load_dataset()
+
+        self.assertEqual(manifesto["versao"], 1)
+        self.assertEqual(manifesto["dados"]["sha256"], train_model.hash_dados(texts, labels))
+        self.assertEqual(manifesto["dados"]["exemplos"], len(texts))
+        self.assertEqual(set(manifesto["validacao"]), {
+            "folds", "acuracia", "acuracia_desvio", "f1_macro", "f1_macro_desvio"})
+        self.assertEqual(manifesto["tamanho_bytes"], self.artefato.stat().st_size)
+        self.assertEqual(json.loads(self.manifesto.read_text(encoding="utf-8")), manifesto)
+        # só os dois arquivos finais (sem temporários da gravação atômica)
+        self.assertEqual(sorted(self.pasta.iterdir()), [self.artefato, self.manifesto])
+
+        self.assertEqual(self.treinar(validar_modelo=False)["versao"], 2)
+
+    def test_limite_de_features(self):
+        manifesto = self.treinar(max_features=300, validar_modelo=False)
+        self.assertEqual(manifesto["n_features"], 300)
+
+    def test_registry_carrega_o_artefato(self):
+        self.treinar(validar_modelo=False)
+        modelo = self.registry().get()
+        self.assertEqual(modelo.predict(["Quero reservar uma sala de ensaio amanhã às 14h"])[0], "criar_reserva")
+
+    def test_artefato_corrompido_vai_para_o_log(self):
+        self.treinar(validar_modelo=False)
+        registry = self.registry()
+        modelo = registry.get()
+        self.artefato.write_bytes(b"corrompido")
+        with self.assertLogs("bookingbot.ia.intent_classifier", "ERROR") as logs:
+            self.assertIs(registry.get(), modelo)  # mantém o modelo que já estava carregado
+        self.assertIn("model.joblib", logs.output[0])
+        self.assertIn("Traceback", logs.output[0])
+
+    def test_artefato_sem_compressao_e_mapeado_em_memoria(self):
+        self.treinar(validar_modelo=False, compressao=0)
+        registry = self.registry()
+        self.assertEqual(registry._mmap_mode(), "r")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # joblib avisa se mmap for ignorado
+            self.assertIsNotNone(registry.get())
+
+    def test_treino_incremental_com_sgd(self):
+        self.treinar(modelo="sgd", max_features=2 ** 12, validar_modelo=False)
+        novos = self.pasta / "novos.jsonl"
+        novos.write_text(
+            json.dumps({"text": "preciso cancelar a reserva de quinta", "label": "cancelar_reserva"}) + "\n"
+            + json.dumps({"text": "tem sala livre sexta de manhã?", "label": "consultar_disponibilidade"}) + "\n",
+            encoding="utf-8",
+        )
+        manifesto = train_model.train_incremental(novos, self.artefato, self.manifesto)
+
+        self.assertEqual(manifesto["versao"], 2)
+        self.assertEqual(manifesto["incremental"][0]["exemplos"], 2)
+        self.assertEqual(manifesto["compressao"], 3)
+        self.assertIsNotNone(self.registry().get())
+
+        novos.write_text(json.dumps({"text": "oi", "label": "rotulo_novo"}) + "\n", encoding="utf-8")
+        with self.assertRaises(ValueError):
+            train_model.train_incremental(novos, self.artefato, self.manifesto)
+
+    def test_incremental_exige_modelo_sgd(self):
+        self.treinar(validar_modelo=False)
+        with self.assertRaises(ValueError):
+            train_model.train_incremental(train_model.DATASET_PATH, self.artefato, self.manifesto)
+
+    def test_registry_usa_o_par_antigo_sem_artefato(self):
+        registry = intent_classifier.ModelRegistry(
+            self.artefato, intent_classifier.MODEL_PATH, intent_classifier.VECTORIZER_PATH, check_interval=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            modelo = registry.get()
+        self.assertEqual(len(modelo.predict(["quero cancelar", "oi"])), 2)
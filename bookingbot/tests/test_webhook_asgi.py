@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+
+from bookingbot.models import Booking, OutboundMessage, Resource
+from bookingbot.services import clientes
+from bookingbot.services.disponibilidade import motor
+from bookingbot.services.recursos import indice_recursos
+
+
+class WebhookAsgiTests(TransactionTestCase):
+    # /webhook/ pelo handler ASGI (async_client), como o uvicorn do Procfile serve
+
+    def setUp(self):
+        indice_recursos.invalidar()
+        motor.invalidar()
+        cache.clear()
+        clientes.cache.limpar()
+        self.sala = Resource.objects.create(name="Sala A", slug="sala-a")
+        self.dia = date.today() + timedelta(days=1)
+
+    def tearDown(self):
+        indice_recursos.invalidar()
+        motor.invalidar()
+        cache.clear()
+        clientes.cache.limpar()
+
+    async def post(self, texto, phone="+5511999990001"):
+        resp = await self.async_client.post(
+            "/webhook/", {"from": phone, "body": texto}, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    async def test_reserva_e_conflito(self):
+        data = await self.post("reservar sala a amanhã às 15h")
+        self.assertEqual(data["status"], "confirmed")
+
+        data = await self.post("reservar sala a amanhã às 15h", phone="+5511999990002")
+        self.assertEqual(data["status"], "busy")
+
+        self.assertEqual(await Booking.objects.filter(resource=self.sala, date=self.dia).acount(), 1)
+        self.assertEqual(await OutboundMessage.objects.acount(), 2)
+
+    async def test_disponibilidade_e_cancelamento(self):
+        await self.post("reservar sala a amanhã às 10h")
+
+        data = await self.post("horários disponíveis amanhã")
+        self.assertEqual(data["slots"], {"Sala A": ["10:00 - 11:00"]})
+
+        data = await self.post("cancelar amanhã às 10h")
+        self.assertEqual(data["status"], "canceled")
+        self.assertFalse(await Booking.objects.filter(status="confirmed").aexists())
+
+    async def test_recorrente(self):
+        data = await self.post("reservar sala a toda quinta às 18h por 3 semanas a partir de 03/01/2030")
+        self.assertEqual(data["status"], "confirmed")
+        self.assertEqual(len(data["booking_ids"]), 3)
+
+        data = await self.post("reservar sala a toda quinta às 18h por 4 semanas a partir de 03/01/2030", phone="+5511999990002")
+        self.assertEqual(data["status"], "partial")
+        self.assertEqual(len(data["conflicts"]), 3)
+        self.assertEqual(await Booking.objects.filter(status="confirmed").acount(), 4)
+
+    async def test_sem_telefone(self):
+        resp = await self.async_client.post("/webhook/", {"body": "oi"}, content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
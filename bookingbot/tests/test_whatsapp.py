@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bookingbot.services.whatsapp import AsyncWhatsAppGateway, WhatsAppGateway
+
+
+class _Gateway(BaseHTTPRequestHandler):
+    """
+    Gateway falso: responde 200 com o payload recebido, 400 para 'erro',
+    o status pedido para '502'/'503' e 200 em texto puro para 'texto'.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, body))
+        to = body.get("to")
+        if to == "texto":
+            data, status, content_type = b"queued", 200, "text/plain"
+        else:
+            status = 400 if to == "erro" else int(to) if to in ("502", "503") else 200
+            data, content_type = json.dumps({"ok": status == 200, "path": self.path}).encode(), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class WhatsAppGatewayTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Gateway)
+        cls.server.requests = []
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests.clear()
+
+    def test_send_conta_chamadas_e_erros(self):
+        gw = WhatsAppGateway(self.base + "/send", token="t", retries=0)
+        self.assertEqual(gw.send("+5511", "oi"), {"ok": True, "path": "/send"})
+        self.assertIsNone(gw.send("erro", "oi"))
+        with self.assertRaises(Exception):
+            gw.send("erro", "oi", raise_on_error=True)
+
+        stats = gw.stats.snapshot()
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["errors"], 2)
+        gw.close()
+
+    def test_send_many_sem_lote_envia_em_paralelo(self):
+        gw = WhatsAppGateway(self.base + "/send", pool_size=4, retries=0)
+        msgs = [(f"+55{i}", f"msg {i}") for i in range(10)]
+        self.assertEqual(len(gw.send_many(msgs)), 10)
+        self.assertEqual(len(self.server.requests), 10)
+        gw.close()
+
+    def test_send_many_usa_endpoint_de_lote(self):
+        gw = WhatsAppGateway(self.base + "/send", batch_url=self.base + "/batch", retries=0)
+        gw.send_many([("+551", "a"), ("+552", "b")])
+        self.assertEqual(len(self.server.requests), 1)
+        path, body = self.server.requests[0]
+        self.assertEqual(path, "/batch")
+        self.assertEqual([m["to"] for m in body["messages"]], ["+551", "+552"])
+        gw.close()
+
+    def test_2xx_sem_json_conta_como_enviado(self):
+        gw = WhatsAppGateway(self.base + "/send", retries=0)
+        self.assertEqual(gw.send("texto", "oi", raise_on_error=True), {})
+        self.assertEqual(gw.stats.snapshot()["errors"], 0)
+        gw.close()
+
+        async def enviar():
+            agw = AsyncWhatsAppGateway(self.base + "/send", retries=0)
+            try:
+                return await agw.send("texto", "oi", raise_on_error=True)
+            finally:
+                await agw.aclose()
+
+        self.assertEqual(asyncio.run(enviar()), {})
+
+    def test_repete_so_429_e_503(self):
+        gw = WhatsAppGateway(self.base + "/send", retries=2, backoff_factor=0)
+        with self.assertRaises(Exception):
+            gw.send("503", "oi", raise_on_error=True)
+        self.assertEqual(len(self.server.requests), 3)
+
+        self.server.requests.clear()
+        with self.assertRaises(Exception):
+            gw.send("502", "oi", raise_on_error=True)
+        # o 502 pode ter vindo depois da entrega: não repete
+        self.assertEqual(len(self.server.requests), 1)
+        gw.close()
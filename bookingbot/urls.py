@@ -5,4 +5,9 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('webhook/', views.whatsapp_webhook, name='whatsapp_webhook'),
     path('api/bookings/', views.BookingListCreate.as_view(), name='api_bookings'),
+    path('api/bookings/export.<str:formato>', views.exportar_reservas, name='api_bookings_export'),
+    path('api/cache/availability/', views.estatisticas_cache_disponibilidade, name='api_availability_cache'),
+    path('api/nlp/intents/', views.estatisticas_intencao, name='api_intent_stats'),
+    path('api/nlp/cache/', views.estatisticas_cache_nlp, name='api_nlp_cache'),
+    path('metrics', views.metricas_prometheus, name='metrics'),
 ]
@@ -23,6 +23,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "bookingbot.middleware.PerfilMiddleware",
+    "bookingbot.middleware.MetricasMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,6 +57,13 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database - default sqlite, você pode trocar para PostgreSQL com DATABASE_URL
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
 DATABASES = {"default": dj_database_url.parse(DATABASE_URL)}
+if DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+    # testes usam arquivo: o SQLite em memória compartilhada trava por tabela
+    # e não espera o busy timeout, o que quebra os testes de concorrência
+    DATABASES["default"]["TEST"] = {"NAME": str(BASE_DIR / "test_db.sqlite3")}
+    # escritas concorrentes esperam a vez (busy timeout) em vez de falhar com
+    # "database is locked"; o padrão de 5s estoura com muitas reservas simultâneas
+    DATABASES["default"].setdefault("OPTIONS", {})["timeout"] = int(os.getenv("SQLITE_TIMEOUT", "30"))
 
 # Password validation (padrão)
 AUTH_PASSWORD_VALIDATORS = [
@@ -76,5 +85,93 @@ USE_GOOGLE_CALENDAR = os.getenv("USE_GOOGLE_CALENDAR", "False").lower() in ("1",
 # Configs custom
 WHATSAPP_API_URL = os.getenv("WHATSAPP_API_URL")
 WHATSAPP_API_TOKEN = os.getenv("WHATSAPP_API_TOKEN")
+WHATSAPP_API_BATCH_URL = os.getenv("WHATSAPP_API_BATCH_URL")  # opcional, se o gateway aceitar lote
+WHATSAPP_POOL_SIZE = int(os.getenv("WHATSAPP_POOL_SIZE", "10"))
+WHATSAPP_CONNECT_TIMEOUT = float(os.getenv("WHATSAPP_CONNECT_TIMEOUT", "3.05"))
+WHATSAPP_READ_TIMEOUT = float(os.getenv("WHATSAPP_READ_TIMEOUT", "10"))
+WHATSAPP_RETRIES = int(os.getenv("WHATSAPP_RETRIES", "2"))
 GOOGLE_CALENDAR_ID = os.getenv("GOOGLE_CALENDAR_ID", "primary")
 GOOGLE_SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE", "client_secret.json")
+GOOGLE_API_ROOT_URL = os.getenv("GOOGLE_API_ROOT_URL", "https://www.googleapis.com/")
+GOOGLE_FREEBUSY_CACHE_TIMEOUT = int(os.getenv("GOOGLE_FREEBUSY_CACHE_TIMEOUT", "60"))
+# reserva que falha na sincronização espera base, 2x base... (segundos) antes de voltar à fila
+GOOGLE_SYNC_BACKOFF_BASE = int(os.getenv("GOOGLE_SYNC_BACKOFF_BASE", "60"))
+GOOGLE_SYNC_BACKOFF_MAX = int(os.getenv("GOOGLE_SYNC_BACKOFF_MAX", "21600"))
+
+# Outbox de WhatsApp (comando processar_outbox)
+WHATSAPP_OUTBOX_WORKERS = int(os.getenv("WHATSAPP_OUTBOX_WORKERS", "4"))
+WHATSAPP_OUTBOX_MAX_ATTEMPTS = int(os.getenv("WHATSAPP_OUTBOX_MAX_ATTEMPTS", "8"))
+WHATSAPP_OUTBOX_BACKOFF_BASE = int(os.getenv("WHATSAPP_OUTBOX_BACKOFF_BASE", "5"))
+WHATSAPP_OUTBOX_BACKOFF_MAX = int(os.getenv("WHATSAPP_OUTBOX_BACKOFF_MAX", "3600"))
+WHATSAPP_OUTBOX_LEASE = int(os.getenv("WHATSAPP_OUTBOX_LEASE", "60"))
+
+# Índice de recursos (services/recursos.py)
+# Apelidos extras -> nome/slug do Resource; None usa nlp_v2.RECURSOS_MAP
+RESOURCE_ALIASES = None
+RESOURCE_INDEX_TTL = int(os.getenv("RESOURCE_INDEX_TTL", "300"))
+
+# Agendas de horários livres em memória (services/disponibilidade.py)
+AVAILABILITY_TTL = int(os.getenv("AVAILABILITY_TTL", "300"))
+
+# Reservas em várias datas / recorrentes ("toda terça às 19h por 2 meses"):
+# máximo de datas por mensagem
+BOOKING_MAX_OCCURRENCES = int(os.getenv("BOOKING_MAX_OCCURRENCES", "52"))
+
+# Classificador de intenção (services/intencao.py): abaixo desta confiança do
+# modelo o bot pede esclarecimento em vez de executar uma ação
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.3"))
+# Criar/cancelar reserva pelo modelo exige muito mais confiança; abaixo disso
+# o bot confirma o que entendeu (o modelo atual não chega lá: sempre pergunta)
+INTENT_ACTION_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_ACTION_CONFIDENCE_THRESHOLD", "0.9"))
+
+# Cache das interpretações de mensagens repetidas (services/memo.py), por processo
+NLP_CACHE_SIZE = int(os.getenv("NLP_CACHE_SIZE", "4096"))  # itens por cache; 0 desliga
+NLP_CACHE_TTL = int(os.getenv("NLP_CACHE_TTL", "3600"))  # segundos
+
+# Cache (locmem por padrão). Com vários workers use um backend compartilhado,
+# ex.: REDIS_URL=redis://localhost:6379/0 (requer o pacote redis), para que a
+# invalidação de um worker valha para todos.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bookingbot"}}
+
+# Cache de disponibilidade por (dia, recurso) (services/cache_disponibilidade.py)
+AVAILABILITY_CACHE = "default"
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv("AVAILABILITY_CACHE_TIMEOUT", "600"))
+
+# Deduplicação do webhook por id da mensagem (services/dedupe.py)
+WEBHOOK_DEDUPE_TTL = int(os.getenv("WEBHOOK_DEDUPE_TTL", "172800"))  # segundos
+WEBHOOK_DEDUPE_CACHE_SIZE = int(os.getenv("WEBHOOK_DEDUPE_CACHE_SIZE", "10000"))
+
+# Clientes do webhook (services/clientes.py): telefone E.164 -> id do Customer.
+# DDI dos números recebidos sem código do país ("" desliga); LRU por processo,
+# opcionalmente apoiado num cache do Django compartilhado entre workers
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "55")
+CUSTOMER_CACHE = os.getenv("CUSTOMER_CACHE") or None  # ex.: "default"
+CUSTOMER_CACHE_SIZE = int(os.getenv("CUSTOMER_CACHE_SIZE", "10000"))
+CUSTOMER_CACHE_TTL = int(os.getenv("CUSTOMER_CACHE_TTL", "3600"))  # segundos
+
+# Métricas (services/metricas.py, GET /metrics no formato do Prometheus).
+# Sem METRICS_TOKEN, /metrics exige um usuário admin logado.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Perfil sob demanda (services/perfil.py): fração das requisições sorteadas
+# e/ou segredo do cabeçalho assinado (python manage.py token_perfil). Sem
+# nenhum dos dois o middleware fica desligado.
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_SECRET = os.getenv("PROFILING_SECRET")
+PROFILING_HEADER = "X-Profile"
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", "3600"))  # segundos
+PROFILING_PROFILER = os.getenv("PROFILING_PROFILER", "cprofile")  # ou "amostragem"
+PROFILING_SAMPLE_INTERVAL = float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.001"))  # segundos
+PROFILING_DIR = os.getenv("PROFILING_DIR", str(BASE_DIR / "perfis"))
+PROFILING_MAX_DUMPS = int(os.getenv("PROFILING_MAX_DUMPS", "200"))
+PROFILING_SLOW_QUERY_MS = float(os.getenv("PROFILING_SLOW_QUERY_MS", "50"))
+# parâmetros das consultas no .sql.json (dados de clientes); desligado, só o EXPLAIN os usa
+PROFILING_LOG_PARAMS = os.getenv("PROFILING_LOG_PARAMS", "False").lower() in ("1", "true", "yes")
+
+# Exportação de reservas (/api/bookings/export.ndjson|csv): linhas por bloco lido do banco
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))